@@ -23,6 +23,7 @@ from src.api.auth_routes import router as auth_router
 from src.api.backtest_routes import router as backtest_router
 from src.api.chat_routes import router as chat_router
 from src.api.dashboard_routes import router as dashboard_router
+from src.api.ingest_routes import router as ingest_router
 from src.api.journal_routes import router as journal_router
 from src.api.market_data_routes import router as market_router
 from src.api.owner_ops import router as owner_router
@@ -37,15 +38,24 @@ from src.api.assets_routes import router as assets_router
 from src.api.signal_routes import router as signal_router
 
 # --- Imports Core ---
+from src.core.backtest_jobs import backtest_jobs
 from src.core.logger import logger
 from src.core.middleware import register_middleware
 from src.core.producer import signal_producer_task
-from src.core.stream_manager import StreamManager
+from src.core.stream_manager import stream_manager
 from src.core.subscription_scheduler import start_scheduler
 from src.core.training_scheduler import training_scheduler_task
+from src.database.cache_manager import cache_invalidation_task
 from src.database.database import close_db_connection, init_db_indexes
 from src.database.redis_client import redis_client
-from src.database.socket_manager import manager, redis_connector_task
+from src.database.signal_bus import signal_mirror_task
+from src.database.socket_manager import (
+    DEFAULT_POLICY,
+    handle_stream_message,
+    manager,
+    presence_task,
+    redis_connector_task,
+)
 
 # Load environment variables
 dotenv.load_dotenv()
@@ -102,9 +112,12 @@ async def lifespan(app: FastAPI):
     tasks: List[asyncio.Task] = [
         asyncio.create_task(signal_producer_task()),
         asyncio.create_task(redis_connector_task()),
+        asyncio.create_task(presence_task()),
+        asyncio.create_task(cache_invalidation_task()),
+        asyncio.create_task(signal_mirror_task()),
         asyncio.create_task(start_scheduler()),
         asyncio.create_task(training_scheduler_task()),
-        asyncio.create_task(StreamManager().start_consumer()),
+        asyncio.create_task(stream_manager.start_consumer()),
         asyncio.create_task(run_watcher()),  # <-- Watcher digabung ke sini
     ]
 
@@ -120,6 +133,8 @@ async def lifespan(app: FastAPI):
         await asyncio.gather(*tasks, return_exceptions=True)
         logger.info("✅ Background tasks cancelled")
 
+        backtest_jobs.shutdown()
+
         try:
             await close_db_connection()
             logger.info("🔒 Database Connection Closed")
@@ -181,6 +196,7 @@ app.include_router(portfolio_router)
 app.include_router(subscription_router)
 app.include_router(assets_router)
 app.include_router(signal_router)
+app.include_router(ingest_router)
 
 
 # --- 3. Global Endpoints ---
@@ -221,16 +237,33 @@ async def root():
 
 
 @app.websocket("/ws/market/{symbol}")
-async def websocket_endpoint(websocket: WebSocket, symbol: str):
-    await manager.connect(websocket, symbol)
+async def websocket_endpoint(
+    websocket: WebSocket, symbol: str, policy: str = DEFAULT_POLICY
+):
+    await manager.connect(websocket, symbol, policy)
     try:
         while True:
             await websocket.receive_text()
-    except WebSocketDisconnect:
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: socket sudah ditutup server (klien lambat)
         logger.info(f"❌ WS Disconnected: {symbol}")
+    finally:
         manager.disconnect(websocket, symbol)
 
 
+@app.websocket("/ws/stream")
+async def websocket_stream(websocket: WebSocket, policy: str = DEFAULT_POLICY):
+    """Satu socket untuk banyak simbol (subscribe/unsubscribe via pesan)."""
+    await manager.connect(websocket, policy=policy)
+    try:
+        while True:
+            await handle_stream_message(websocket, await websocket.receive_text())
+    except (WebSocketDisconnect, RuntimeError):
+        logger.info("❌ WS Stream Disconnected")
+    finally:
+        manager.disconnect(websocket)
+
+
 @app.get("/health")
 def health_check():
     try:
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.database.database import db, ensure_market_data_collection  # noqa: E402
+
+BATCH_SIZE = 5000
+
+
+async def migrate():
+    """
+    Ubah market_data (collection biasa) menjadi time-series collection.
+    Collection lama di-rename lalu bar OHLCV-nya disalin; tick mentah
+    (tanpa field open/high/low/close) tidak ikut karena sudah diganti bar.
+    """
+    print(f"🚀 Memulai migrasi market_data di database: {db.name}")
+    infos = await db.list_collections(filter={"name": "market_data"})
+    info = next(iter(await infos.to_list(length=1)), None)
+
+    if info is not None and info.get("type") == "timeseries":
+        print("✅ market_data sudah berupa time-series collection.")
+        return
+
+    legacy_name = None
+    if info is not None:
+        legacy_name = f"market_data_legacy_{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+        await db.market_data.rename(legacy_name)
+        print(f"📦 Collection lama dipindah ke: {legacy_name}")
+
+    await ensure_market_data_collection(db)
+    print("📊 Time-series collection market_data dibuat.")
+
+    if legacy_name is None:
+        return
+
+    cursor = db[legacy_name].find(
+        {"open": {"$exists": True}, "timestamp": {"$type": "date"}}, {"_id": 0}
+    )
+    batch, count = [], 0
+    async for doc in cursor:
+        doc.setdefault("timeframe", "1m")
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            await db.market_data.insert_many(batch, ordered=False)
+            count += len(batch)
+            batch = []
+            print(f"   ... {count} bar disalin")
+    if batch:
+        await db.market_data.insert_many(batch, ordered=False)
+        count += len(batch)
+
+    print(f"\n✨ Migrasi SELESAI. {count} bar disalin.")
+    print(f"   Hapus {legacy_name} setelah data diverifikasi.")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
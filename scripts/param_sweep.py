@@ -0,0 +1,86 @@
+"""
+Sweep parameter strategi (sl_mult, tp_ratio, min_confidence) untuk banyak
+simbol sekaligus, disebar ke semua core CPU.
+
+Contoh:
+    python scripts/param_sweep.py BBCA.JK EURUSD=X BTC-USD --period 2y \
+        --sl-mult 1.5 2 3 --tp-ratio 1.5 2 3 --min-confidence 50 60 70 --out sweep.csv
+"""
+import argparse
+import csv
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from src.core.param_sweep import (  # noqa: E402
+    DEFAULT_GRID,
+    DEFAULT_RANK_BY,
+    MIN_TRADES,
+    SWEEP_WORKERS,
+    run_sweep,
+)
+
+COLUMNS = [
+    "rank", "symbol", "sl_mult", "tp_ratio", "min_confidence", "total_return_percent",
+    "win_rate", "profit_factor", "max_drawdown", "total_trades", "final_balance",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep backtest")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--period", default="2y")
+    parser.add_argument("--interval", default="1h")
+    parser.add_argument("--balance", type=float, default=100000000)
+    parser.add_argument("--sl-mult", type=float, nargs="+", default=DEFAULT_GRID["sl_mult"])
+    parser.add_argument("--tp-ratio", type=float, nargs="+", default=DEFAULT_GRID["tp_ratio"])
+    parser.add_argument("--min-confidence", type=float, nargs="+", default=DEFAULT_GRID["min_confidence"])
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS)
+    parser.add_argument("--rank-by", default=DEFAULT_RANK_BY)
+    parser.add_argument("--min-trades", type=int, default=MIN_TRADES)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", default="param_sweep.csv")
+    args = parser.parse_args()
+
+    grid = {"sl_mult": args.sl_mult, "tp_ratio": args.tp_ratio, "min_confidence": args.min_confidence}
+
+    def write_table(result, table):
+        # Tabel ranking ditulis ulang setiap simbol selesai (aman untuk run semalaman)
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(table)
+        status = result.get("error") or f"{result['bars']} bar, {result['elapsed_ms']} ms"
+        print(f"✅ {result['symbol']}: {status} -> {len(table)} baris di {args.out}")
+
+    summary = run_sweep(
+        args.symbols,
+        grid,
+        period=args.period,
+        interval=args.interval,
+        initial_balance=args.balance,
+        workers=args.workers,
+        rank_by=args.rank_by,
+        min_trades=args.min_trades,
+        on_result=write_table,
+    )
+
+    print(f"\n🏆 Top {args.top} dari {len(summary['table'])} ({summary['combinations']} kombinasi/simbol)")
+    for row in summary["table"][: args.top]:
+        print(
+            f"{row['rank']:>3}. {row['symbol']:<10} sl={row['sl_mult']:<4} tp={row['tp_ratio']:<4} "
+            f"conf>={row['min_confidence']:<4} return={row['total_return_percent']:>8}% "
+            f"wr={row['win_rate']:>6}% pf={row['profit_factor']:>6} dd={row['max_drawdown']:>6}% "
+            f"trades={row['total_trades']}"
+        )
+    for symbol, error in summary["errors"].items():
+        print(f"❌ {symbol}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import random
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from src.core.stream_manager import StreamManager, _trim_args  # noqa: E402
+from src.database.redis_client import redis_client  # noqa: E402
+
+# Stream terpisah agar benchmark tidak mengganggu consumer produksi
+BENCH_STREAM = "bench:market_ticks_stream"
+DURATION = float(os.getenv("BENCH_DURATION", "5"))
+SYMBOLS = [f"SYM{i}" for i in range(200)]
+
+
+def make_ticks(n):
+    return [
+        {"symbol": random.choice(SYMBOLS), "price": round(random.uniform(1, 1000), 4), "volume": 1}
+        for _ in range(n)
+    ]
+
+
+async def bench_single():
+    """Baseline: satu XADD (satu round trip) per tick."""
+    ticks = make_ticks(1000)
+    sent = 0
+    deadline = time.perf_counter() + DURATION
+    while time.perf_counter() < deadline:
+        for tick in ticks:
+            await redis_client.xadd(BENCH_STREAM, tick, **_trim_args())
+        sent += len(ticks)
+    return sent
+
+
+async def bench_batched(manager: StreamManager, batch_size: int):
+    """publish_ticks: XADD dalam pipeline."""
+    ticks = make_ticks(batch_size)
+    sent = 0
+    deadline = time.perf_counter() + DURATION
+    while time.perf_counter() < deadline:
+        sent += await manager.publish_ticks(ticks, stream=BENCH_STREAM)
+    return sent
+
+
+async def run_benchmark():
+    await redis_client.connect()
+    if not redis_client.redis:
+        print("❌ Redis tidak tersedia (cek REDIS_URL)")
+        return
+
+    manager = StreamManager(consumer_name="bench")
+    print(f"📈 Sustained tick ingestion into Redis ({DURATION:.0f}s per skenario)")
+
+    try:
+        sent = await bench_single()
+        print(f"   XADD per tick          : {sent / DURATION:>12,.0f} ticks/sec")
+
+        for batch_size in (100, 1000, 5000):
+            sent = await bench_batched(manager, batch_size)
+            print(f"   publish_ticks({batch_size:>5})   : {sent / DURATION:>12,.0f} ticks/sec")
+
+        length = await redis_client.redis.xlen(BENCH_STREAM)
+        print(f"   Stream length after trim: {length:,}")
+    finally:
+        await redis_client.delete(BENCH_STREAM)
+        await redis_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime, timezone
 
 from bson import ObjectId
@@ -5,11 +6,23 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
 from src.api.auth import get_current_user
+from src.core.alert_engine import notify_alert_changed
+from src.core.formula_evaluator import formula_fire_mask
+from src.database.data_loader import fetch_data_async
 from src.database.database import alerts_collection, fix_id
 
 router = APIRouter(prefix="/alerts", tags=["Alerts System"])
 
 
+# Validasi Formula Sederhana (Security): minimal satu keyword yang dikenal
+FORMULA_KEYWORDS = ["RSI", "MACD", "CLOSE", "OPEN", "VOLUME", "SMA", ">", "<", "AND", "OR", "=="]
+
+
+def _validate_formula(condition: str) -> None:
+    if not any(k in condition.upper() for k in FORMULA_KEYWORDS):
+        raise HTTPException(400, "Formula tidak valid atau tidak didukung.")
+
+
 class AlertModel(BaseModel):
     symbol: str
     type: str  # 'PRICE' atau 'FORMULA'
@@ -26,25 +39,12 @@ async def create_alert(alert: AlertModel, user: dict = Depends(get_current_user)
     new_alert["status"] = "ACTIVE"
     new_alert["created_at"] = datetime.now(timezone.utc)
 
-    # Validasi Formula Sederhana (Security)
     if alert.type == "FORMULA":
-        allowed_keywords = [
-            "RSI",
-            "MACD",
-            "CLOSE",
-            "OPEN",
-            "VOLUME",
-            "SMA",
-            ">",
-            "<",
-            "AND",
-            "OR",
-            "==",
-        ]
-        if not any(k in alert.condition.upper() for k in allowed_keywords):
-            raise HTTPException(400, "Formula tidak valid atau tidak didukung.")
-
-    await alerts_collection.insert_one(new_alert)
+        _validate_formula(alert.condition)
+
+    result = await alerts_collection.insert_one(new_alert)
+    # Indeks alert di watcher ikut diperbarui tanpa menunggu rebuild
+    await notify_alert_changed(result.inserted_id)
     return {"status": "success", "message": "Alert created"}
 
 
@@ -55,6 +55,38 @@ async def get_my_alerts(user: dict = Depends(get_current_user)):
     return [fix_id(a) for a in alerts]
 
 
+@router.get("/history")
+async def formula_alert_history(
+    symbol: str,
+    condition: str,
+    period: str = "3mo",
+    interval: str = "1h",
+    user: dict = Depends(get_current_user),
+):
+    """
+    Kapan formula ini akan terpicu di masa lalu (satu pass vektor atas semua bar).
+    Contoh: /alerts/history?symbol=BBCA.JK&condition=RSI < 30 AND CLOSE > SMA20
+    """
+    valid_periods = ["1mo", "3mo", "6mo", "1y", "2y"]
+    if period not in valid_periods:
+        raise HTTPException(400, f"Period harus salah satu dari {valid_periods}")
+    _validate_formula(condition)
+
+    # fetch_data_async sudah menjalankan enrich_data
+    df = await fetch_data_async(symbol, period=period, interval=interval)
+    if df.empty:
+        raise HTTPException(404, "Data historis tidak ditemukan")
+
+    fired = await asyncio.to_thread(formula_fire_mask, condition, df)
+    return {
+        "symbol": symbol,
+        "condition": condition,
+        "bars": len(df),
+        "count": int(fired.sum()),
+        "fired_at": [str(ts) for ts in df.index[fired]],
+    }
+
+
 @router.delete("/{alert_id}")
 async def delete_alert(alert_id: str, user: dict = Depends(get_current_user)):
     try:
@@ -68,4 +100,6 @@ async def delete_alert(alert_id: str, user: dict = Depends(get_current_user)):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Alert not found")
 
+    await notify_alert_changed(obj_id)
+
     return {"status": "success", "message": "Alert deleted"}
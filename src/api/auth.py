@@ -52,6 +52,22 @@ def deserialize_user(user: Dict[str, Any]) -> Dict[str, Any]:
     return deserialized
 
 
+async def get_user_by_api_key(api_key: str) -> Optional[Dict[str, Any]]:
+    """Identitas user dari cache/Mongo (tanpa rate limiting). None jika tidak ada."""
+    hashed_key = hash_api_key(api_key)
+    cache_key = f"auth:user:{hashed_key}"
+
+    async def load_user():
+        found = await users_collection.find_one({"api_key_hash": hashed_key})
+        # Jangan cache field yang cepat berubah (rate limiting fields)
+        # agar cache tetap valid lebih lama untuk identitas.
+        return serialize_user(found) if found else None
+
+    # get_or_compute: hanya satu request yang membaca Mongo saat cache expired
+    user = await SmartCache.get_or_compute(cache_key, 600, load_user)
+    return deserialize_user(user) if user else None
+
+
 async def get_current_user(
     request: Request,
     api_key_h: str = Security(api_key_header),
@@ -66,19 +82,7 @@ async def get_current_user(
         )
 
     # 1. Cari User Info (Identity) di Cache atau Mongo
-    hashed_key = hash_api_key(api_key)
-    cache_key = f"auth:user:{hashed_key}"
-
-    user = await SmartCache.get(cache_key)
-    if user:
-        user = deserialize_user(user)
-    else:
-        user = await users_collection.find_one({"api_key_hash": hashed_key})
-        if user:
-            # Jangan cache field yang cepat berubah (rate limiting fields)
-            # agar cache tetap valid lebih lama untuk identitas.
-            cached_data = serialize_user(user)
-            await SmartCache.set(cache_key, cached_data, ttl=600)
+    user = await get_user_by_api_key(api_key)
 
     if not user:
         raise HTTPException(status_code=403, detail="Invalid API Key")
@@ -1,50 +1,196 @@
+import asyncio
+import json
 import traceback
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 
-from src.api.auth import get_current_user
-from src.core.backtest_engine import run_backtest_simulation
+from src.api.auth import api_key_header_name, get_current_user, get_user_by_api_key
+from src.core.backtest_jobs import backtest_jobs, get_cached_backtest, submit_backtest
+from src.core.downsample import downsample_points
+from src.core.job_queue import FINAL_STATUSES, JOB_CANCELLED, JOB_DONE, QueueFull
 from src.core.logger import logger
+from src.core.monte_carlo import MAX_PATHS, monte_carlo
 
 router = APIRouter(prefix="/backtest", tags=["Backtest Playground"])
 
+VALID_PERIODS = ["1mo", "3mo", "6mo", "1y", "2y", "5y"]
+# Batas tunggu /backtest/run (mode sinkron) sebelum menyarankan polling job
+RUN_TIMEOUT = 300
+# Interval cek progress untuk WebSocket job
+JOB_WS_POLL_INTERVAL = 0.5
+# Jumlah trade / titik equity per baris NDJSON
+STREAM_CHUNK_SIZE = 1000
+# Field list besar yang dikirim terpisah di mode stream
+STREAM_LIST_FIELDS = ("trades", "equity_curve")
+# Duplikat legacy yang tidak ikut di mode stream
+STREAM_SKIP_FIELDS = ("equity_curve_raw", "trades_log")
+
+
+def _validate_period(period: str) -> None:
+    if period not in VALID_PERIODS:
+        raise HTTPException(400, f"Period harus salah satu dari {VALID_PERIODS}")
+
+
+def _error_status(err_msg: str):
+    """(status_code, detail) untuk pesan error backtest."""
+    # Model belum dilatih → 503 Service Unavailable
+    if "belum dilatih" in err_msg:
+        return 503, f"Model AI belum tersedia untuk simbol ini. {err_msg}"
+    # Aset tidak terdaftar → 404
+    if "tidak terdaftar" in err_msg:
+        return 404, f"Aset tidak dikenal: {err_msg}"
+    return 400, err_msg
+
+
+def _raise_for_error(err_msg: str):
+    status_code, detail = _error_status(err_msg)
+    raise HTTPException(status_code=status_code, detail=detail)
+
+
+def _downsample(result: dict, points: int) -> dict:
+    """
+    Kurva equity di-downsample (LTTB) ke ``points`` titik; index yang sama
+    dipakai untuk ``equity_curve_raw``. Hasil cache/job tidak diubah.
+    """
+    curve = result.get("equity_curve") or []
+    if not points or points >= len(curve):
+        return result
+    sampled = downsample_points(
+        [{**p, "_i": i} for i, p in enumerate(curve)], "balance", points
+    )
+    idx = [p.pop("_i") for p in sampled]
+    shaped = {**result, "equity_curve": sampled, "equity_points_total": len(curve)}
+    raw = result.get("equity_curve_raw")
+    if raw and len(raw) == len(curve):
+        shaped["equity_curve_raw"] = [raw[i] for i in idx]
+    return shaped
+
+
+async def _shape(result: dict, points: int, mc_paths: int) -> dict:
+    """Downsample equity + (opsional) bootstrap Monte Carlo atas PnL trade."""
+    shaped = _downsample(result, points)
+    if mc_paths:
+        pnl = [t["pnl"] for t in result.get("trades") or [] if t.get("pnl") is not None]
+        balance = result.get("initial_balance") or result.get("balance")
+        report = await asyncio.to_thread(monte_carlo, pnl, balance, mc_paths)
+        shaped = {**shaped, "monte_carlo": report}
+    return shaped
+
+
+def _ndjson(payload: dict) -> str:
+    return json.dumps(payload, default=str) + "\n"
+
+
+def _result_lines(result: dict):
+    """Summary dulu (semua field skalar), lalu trade & equity per chunk."""
+    summary = {
+        k: v
+        for k, v in result.items()
+        if k not in STREAM_LIST_FIELDS and k not in STREAM_SKIP_FIELDS
+    }
+    summary["counts"] = {k: len(result.get(k) or []) for k in STREAM_LIST_FIELDS}
+    yield _ndjson({"type": "summary", "data": summary})
+    for field in STREAM_LIST_FIELDS:
+        items = result.get(field) or []
+        for start in range(0, len(items), STREAM_CHUNK_SIZE):
+            yield _ndjson({"type": field, "data": items[start : start + STREAM_CHUNK_SIZE]})
+    yield _ndjson({"type": "end"})
+
+
+async def _stream_job(job, points: int, mc_paths: int = 0):
+    """Progress job selama berjalan, lalu hasil (atau error) sebagai NDJSON."""
+    last = None
+    while job.status not in FINAL_STATUSES:
+        state = (job.status, job.progress, job.stage)
+        if state != last:
+            yield _ndjson({"type": "progress", "status": job.status, "progress": job.progress, "stage": job.stage})
+            last = state
+        try:
+            await asyncio.wait_for(job.done.wait(), JOB_WS_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        job = backtest_jobs.get(job.id) or job
+
+    if job.status == JOB_DONE:
+        for line in _result_lines(await _shape(job.result, points, mc_paths)):
+            yield line
+        return
+    if job.status == JOB_CANCELLED:
+        status_code, detail = 409, "Backtest dibatalkan"
+    else:
+        status_code, detail = _error_status(job.error or "Backtest gagal")
+    yield _ndjson({"type": "error", "status_code": status_code, "detail": detail})
+
+
+def _stream_response(lines) -> StreamingResponse:
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+def _submit(symbol: str, period: str, balance: int, user: dict):
+    try:
+        return submit_backtest(symbol, period, balance, user)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e)) from e
+
+
+def _get_owned_job(job_id: str, user: dict):
+    job = backtest_jobs.get(job_id)
+    if job is None or str(user["_id"]) not in job.owners:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 
 @router.get("/run")
 async def run_backtest(
     symbol: str,
     period: str = "2y",
     balance: int = 100000000,
+    refresh: bool = False,
+    points: int = Query(0, ge=0, description="Downsample equity curve (LTTB); 0 = semua titik"),
+    stream: bool = False,
+    monte_carlo_paths: int = Query(
+        0, ge=0, le=MAX_PATHS, description="Jumlah path bootstrap Monte Carlo; 0 = nonaktif"
+    ),
     user: dict = Depends(get_current_user),
 ):
     """
     Menjalankan simulasi strategi AI pada data historis.
     Contoh: /backtest/run?symbol=BBCA.JK&period=2y
+    Dijalankan sebagai job di worker process lalu ditunggu; event loop tetap bebas.
+    Hasil untuk model + data yang sama diambil dari cache (``refresh=true`` untuk bypass).
+    ``stream=true``: NDJSON (progress, summary, lalu chunk trade & equity).
+    ``monte_carlo_paths=N``: interval kepercayaan return, drawdown, profit factor
+    dan risk of ruin dari N path bootstrap PnL trade (field ``monte_carlo``).
     """
     # Validasi input
-    valid_periods = ["1mo", "3mo", "6mo", "1y", "2y", "5y"]
-    if period not in valid_periods:
-        raise HTTPException(400, f"Period harus salah satu dari {valid_periods}")
+    _validate_period(period)
+    if not refresh:
+        cached = await get_cached_backtest(symbol, period, balance)
+        if cached is not None:
+            result = await _shape({**cached, "cached": True}, points, monte_carlo_paths)
+            if stream:
+                return _stream_response(_result_lines(result))
+            return result
+
+    job, _ = _submit(symbol, period, balance, user)
+    if stream:
+        return _stream_response(_stream_job(job, points, monte_carlo_paths))
 
     try:
-        result = await run_backtest_simulation(symbol, period, balance)
-
-        if result.get("error"):
-            err_msg = result["error"]
-            # Model belum dilatih → 503 Service Unavailable
-            if "belum dilatih" in err_msg:
-                raise HTTPException(
-                    status_code=503,
-                    detail=f"Model AI belum tersedia untuk simbol ini. {err_msg}",
-                )
-            # Aset tidak terdaftar → 404
-            if "tidak terdaftar" in err_msg:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Aset tidak dikenal: {err_msg}",
-                )
-            raise HTTPException(status_code=400, detail=err_msg)
+        await backtest_jobs.wait(job, timeout=RUN_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Backtest masih berjalan. Pantau lewat /backtest/jobs/{job.id}",
+        )
 
-        return result
+    try:
+        if job.status == JOB_CANCELLED:
+            raise HTTPException(status_code=409, detail="Backtest dibatalkan")
+        if job.status != JOB_DONE:
+            _raise_for_error(job.error or "Backtest gagal")
+        return await _shape(job.result, points, monte_carlo_paths)
 
     except HTTPException:
         raise
@@ -52,3 +198,72 @@ async def run_backtest(
         logger.error("Backtest Error for %s: %s", symbol, e)
         logger.error(traceback.format_exc())
         raise HTTPException(500, "Backtest Error: %s" % e) from e
+
+
+@router.post("/jobs", status_code=202)
+async def create_backtest_job(
+    symbol: str,
+    period: str = "2y",
+    balance: int = 100000000,
+    user: dict = Depends(get_current_user),
+):
+    """Submit backtest ke antrian; request identik yang masih aktif digabung."""
+    _validate_period(period)
+    job, coalesced = _submit(symbol, period, balance, user)
+    return {"job_id": job.id, "status": job.status, "coalesced": coalesced}
+
+
+@router.get("/jobs/{job_id}")
+async def get_backtest_job(
+    job_id: str,
+    points: int = Query(0, ge=0),
+    user: dict = Depends(get_current_user),
+):
+    """Status, progress (0-100) dan hasil (jika selesai, equity opsional di-downsample)."""
+    data = _get_owned_job(job_id, user).to_dict()
+    if "result" in data:
+        data["result"] = _downsample(data["result"], points)
+    return data
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_backtest_job(job_id: str, user: dict = Depends(get_current_user)):
+    job = _get_owned_job(job_id, user)
+    if not backtest_jobs.cancel(job, str(user["_id"])):
+        raise HTTPException(status_code=409, detail=f"Job sudah {job.status}")
+    return {"status": "success", "message": "Cancellation requested"}
+
+
+@router.websocket("/jobs/{job_id}/ws")
+async def backtest_job_ws(websocket: WebSocket, job_id: str):
+    """
+    Update progress job via WebSocket (auth: header X-API-Key atau ``api_key``).
+    Mengirim status setiap kali berubah; pesan terakhir berisi hasil.
+    """
+    api_key = websocket.headers.get(api_key_header_name) or websocket.query_params.get(
+        "api_key"
+    )
+    user = await get_user_by_api_key(api_key) if api_key else None
+    job = backtest_jobs.get(job_id)
+    if not user or job is None or str(user["_id"]) not in job.owners:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    last = None
+    try:
+        while True:
+            job = backtest_jobs.get(job_id)
+            state = (job.status, job.progress, job.stage)
+            if state != last:
+                await websocket.send_json(job.to_dict())
+                last = state
+            if job.status in FINAL_STATUSES:
+                break
+            try:
+                await asyncio.wait_for(job.done.wait(), JOB_WS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 
 from src.api.auth import get_current_user
 from src.database.database import fix_id, signals_collection
@@ -9,8 +10,44 @@ from src.database.signal_bus import signal_bus
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 
+async def _open_trades():
+    open_cursor = (
+        signals_collection.find({"status": "OPEN"}).sort("created_at", -1).limit(10)
+    )
+    open_trades = await open_cursor.to_list(length=10)
+    return [fix_id(t) for t in open_trades]
+
+
 @router.get("/all")
-async def get_dashboard_overview(user: dict = Depends(get_current_user)):
+async def get_dashboard_overview(
+    since: Optional[int] = Query(None, ge=0),
+    user: dict = Depends(get_current_user),
+):
+    """
+    Snapshot sinyal untuk dashboard.
+
+    Dengan ``since=<seq>`` (mulai dari 0, lalu pakai ``seq`` dari respons
+    sebelumnya), hanya simbol yang berubah yang dikirim. ``full: true``
+    berarti klien tertinggal dan ``items`` adalah snapshot lengkap yang
+    harus menggantikan state lokal.
+    """
+    if since is not None:
+        delta = await signal_bus.get_changes_since(since)
+        return {
+            "status": "ok",
+            "server_time": datetime.now(timezone.utc),
+            "seq": delta["seq"],
+            "full": delta["full"],
+            "signals": {
+                "total": len(delta["signals"]),
+                "items": [
+                    {"symbol": symbol, **data}
+                    for symbol, data in delta["signals"].items()
+                ],
+            },
+            "open_trades": await _open_trades(),
+        }
+
     signals = await signal_bus.get_all_signals()
 
     items = []
@@ -29,11 +66,6 @@ async def get_dashboard_overview(user: dict = Depends(get_current_user)):
     priority = {"BUY": 0, "SELL": 1, "HOLD": 2}
     items.sort(key=lambda x: priority.get(str(x.get("Action", "HOLD")).upper(), 3))
 
-    open_cursor = (
-        signals_collection.find({"status": "OPEN"}).sort("created_at", -1).limit(10)
-    )
-    open_trades = await open_cursor.to_list(length=10)
-
     return {
         "status": "ok",
         "server_time": datetime.now(timezone.utc),
@@ -42,5 +74,5 @@ async def get_dashboard_overview(user: dict = Depends(get_current_user)):
             "counts": counts,
             "items": items[:50],
         },
-        "open_trades": [fix_id(t) for t in open_trades],
+        "open_trades": await _open_trades(),
     }
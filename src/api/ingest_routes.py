@@ -0,0 +1,89 @@
+import json
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+from src.api.auth import api_key_header_name, get_current_user, get_user_by_api_key
+from src.api.roles import UserRole, check_permission
+from src.core.logger import logger
+from src.core.stream_manager import stream_manager
+
+# Batas tick per request HTTP / pesan WebSocket
+MAX_TICKS_PER_REQUEST = 10_000
+
+
+# --- Models ---
+class TickModel(BaseModel):
+    symbol: str = Field(..., min_length=1, max_length=32)
+    price: float = Field(..., gt=0)
+    volume: float = Field(0, ge=0)
+
+
+class TickBatchModel(BaseModel):
+    ticks: List[TickModel] = Field(..., max_length=MAX_TICKS_PER_REQUEST)
+
+
+_tick_list = TypeAdapter(List[TickModel])
+
+router = APIRouter(prefix="/ingest", tags=["Market Data Ingestion"])
+
+
+def _can_ingest(user: dict) -> bool:
+    # Feed handler memakai API key akun admin/owner (juga bebas limit harian)
+    return check_permission(user.get("role", ""), UserRole.ADMIN)
+
+
+def verify_feeder(user: dict = Depends(get_current_user)) -> dict:
+    if not _can_ingest(user):
+        raise HTTPException(status_code=403, detail="Access Denied.")
+    return user
+
+
+@router.post("/ticks")
+async def ingest_ticks(data: TickBatchModel, user: dict = Depends(verify_feeder)):
+    """Terima tick dalam jumlah besar lalu XADD ke stream secara pipeline."""
+    accepted = await stream_manager.publish_ticks(t.model_dump() for t in data.ticks)
+    return {"status": "ok", "accepted": accepted}
+
+
+@router.websocket("/ws")
+async def ingest_ticks_ws(websocket: WebSocket):
+    """
+    Ingestion via WebSocket untuk feed handler yang mengirim terus-menerus.
+    Auth: header X-API-Key atau query ``api_key``. Setiap pesan berupa array
+    tick (atau {"ticks": [...]}); server membalas {"accepted": n}.
+    """
+    api_key = websocket.headers.get(api_key_header_name) or websocket.query_params.get(
+        "api_key"
+    )
+    user = await get_user_by_api_key(api_key) if api_key else None
+    if (
+        not user
+        or user.get("subscription_status") != "active"
+        or not _can_ingest(user)
+    ):
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                payload = json.loads(raw)
+                if isinstance(payload, dict):
+                    payload = payload.get("ticks", [])
+                ticks = _tick_list.validate_python(payload)
+            except (ValueError, ValidationError) as e:
+                await websocket.send_json({"error": str(e)[:200]})
+                continue
+
+            if len(ticks) > MAX_TICKS_PER_REQUEST:
+                await websocket.send_json({"error": "Too many ticks in one message"})
+                continue
+
+            accepted = await stream_manager.publish_ticks(t.model_dump() for t in ticks)
+            await websocket.send_json({"accepted": accepted})
+    except WebSocketDisconnect:
+        logger.info("❌ Ingest WS Disconnected: %s", user.get("email"))
@@ -13,7 +13,9 @@ from pydantic import BaseModel
 from src.api.auth import get_current_user
 from src.api.roles import UserRole, check_permission
 from src.core.logger import logging
+from src.core.stream_manager import stream_manager
 from src.database.database import db
+from src.database.presence import cluster_presence
 from src.database.signal_bus import signal_bus
 from src.ml.llm_analyst import LLMAnalyst
 
@@ -191,6 +193,18 @@ async def restart_bot_logic(user: dict = Depends(verify_owner)):
     }
 
 
+@router.get("/stream/metrics")
+async def get_stream_metrics(user: dict = Depends(verify_owner)):
+    """Throughput, latensi ACK, dan lag consumer tick stream (proses ini)."""
+    return await stream_manager.get_metrics()
+
+
+@router.get("/ws/cluster")
+async def get_ws_cluster(user: dict = Depends(verify_owner)):
+    """Jumlah koneksi WebSocket per node dan pendengar per simbol (seluruh cluster)."""
+    return await cluster_presence()
+
+
 @router.post("/files/validate-fix")
 async def validate_and_fix_code(
     data: FileWriteModel, user: dict = Depends(verify_owner)
@@ -1,5 +1,3 @@
-import asyncio
-
 from fastapi import APIRouter, Depends, Query
 
 from src.api.auth import get_current_user
@@ -10,6 +8,12 @@ from src.database.signal_bus import signal_bus
 router = APIRouter(prefix="/search", tags=["Search"])
 
 
+def _signal_status(active_signal):
+    if active_signal and isinstance(active_signal, dict):
+        return active_signal.get("Action", "HOLD")
+    return "Idle"
+
+
 @router.get("/")
 async def search_assets(
     q: str = Query(..., min_length=2), user: dict = Depends(get_current_user)
@@ -20,7 +24,7 @@ async def search_assets(
     Contoh: q=BBCA -> Returns BBCA.JK info + Active Signal status
     """
     query = q.upper()
-    results = []
+    candidates = []
 
     # 1. Coba dari database MongoDB
     try:
@@ -33,22 +37,11 @@ async def search_assets(
 
     if db_assets:
         for asset in db_assets:
-            symbol = asset.get("symbol", "")
-            active_signal = await signal_bus.get_signal(symbol)
-            if asyncio.iscoroutine(active_signal):
-                active_signal = await active_signal
-
-            status = "Idle"
-            if active_signal and isinstance(active_signal, dict):
-                status = active_signal.get("Action", "HOLD")
-
-            results.append(
+            candidates.append(
                 {
-                    "symbol": symbol,
+                    "symbol": asset.get("symbol", ""),
                     "category": asset.get("category", "UNKNOWN"),
                     "type": asset.get("type", "unknown"),
-                    "status": status,
-                    "has_signal": bool(active_signal),
                 }
             )
     else:
@@ -56,22 +49,24 @@ async def search_assets(
         for category, items in ASSETS.items():
             for symbol, info in items.items():
                 if query in symbol:
-                    active_signal = await signal_bus.get_signal(symbol)
-                    if asyncio.iscoroutine(active_signal):
-                        active_signal = await active_signal
+                    candidates.append(
+                        {"symbol": symbol, "category": category, "type": info["type"]}
+                    )
 
-                    status = "Idle"
-                    if active_signal and isinstance(active_signal, dict):
-                        status = active_signal.get("Action", "HOLD")
+    candidates = candidates[:10]
 
-                    results.append(
-                        {
-                            "symbol": symbol,
-                            "category": category,
-                            "type": info["type"],
-                            "status": status,
-                            "has_signal": bool(active_signal),
-                        }
-                    )
+    # 3. Status sinyal untuk semua kandidat dalam satu HMGET
+    signals = await signal_bus.get_signals(c["symbol"] for c in candidates)
+
+    results = []
+    for candidate in candidates:
+        active_signal = signals.get(candidate["symbol"])
+        results.append(
+            {
+                **candidate,
+                "status": _signal_status(active_signal),
+                "has_signal": bool(active_signal),
+            }
+        )
 
-    return results[:10]
+    return results
@@ -3,6 +3,7 @@ from datetime import datetime
 
 from fastapi import APIRouter, WebSocket
 
+from src.core.bar_aggregator import TIMEFRAMES, bars_pipeline
 from src.core.logger import logger
 from src.database.database import db
 
@@ -10,22 +11,27 @@ router = APIRouter(prefix="/simulation", tags=["Time Travel"])
 
 
 @router.websocket("/replay/{symbol:path}")
-async def replay_market_data(websocket: WebSocket, symbol: str, date: str):
+async def replay_market_data(
+    websocket: WebSocket, symbol: str, date: str, timeframe: str = "1m"
+):
     """
     WebSocket endpoint.
-    Client connect -> Server kirim data per menit dari tanggal tertentu.
-    Format date: YYYY-MM-DD
+    Client connect -> Server kirim data per candle dari tanggal tertentu.
+    Format date: YYYY-MM-DD, timeframe: 1m / 5m / 1h
     """
     await websocket.accept()
 
     try:
-        # 1. Ambil data historis dari DB
+        if timeframe not in TIMEFRAMES:
+            await websocket.send_text(f"Invalid timeframe. Use one of {list(TIMEFRAMES)}")
+            await websocket.close()
+            return
+
+        # 1. Ambil bar historis dari DB (fragmen per consumer digabung di Mongo)
         start_dt = datetime.strptime(date, "%Y-%m-%d")
 
-        cursor = (
-            db.market_data.find({"symbol": symbol, "timestamp": {"$gte": start_dt}})
-            .sort("timestamp", 1)
-            .limit(1000)
+        cursor = db.market_data.aggregate(
+            bars_pipeline(symbol, timeframe, start_dt, limit=1000)
         )  # Batasi 1000 candle
 
         history_data = await cursor.to_list(length=1000)
@@ -15,6 +15,7 @@ from src.core.bandarmology import Bandarmology
 
 # --- 1. DATA & ASSETS ---
 from src.core.config_assets import ASSETS, get_asset_info
+from src.core.execution import PULLBACK_ATR, TP_RATIO, sl_atr_mult
 from src.core.forex_engine import ForexEngine
 from src.core.logger import logger
 from src.core.rl_environment import TradingEnvironment as TradingEnv
@@ -358,15 +359,11 @@ async def get_detailed_signal(symbol, asset_info=None, custom_balance=None):
         current_price = last_row_dict.get("Close", 0.0)
         atr = last_row_dict.get("ATR_14", current_price * 0.01)
 
-        # Dynamic Risk Multiplier
-        sl_mult = 2.0  # Default Stock
-        if asset_type == "forex":
-            sl_mult = 1.5
-        elif asset_type == "crypto":
-            sl_mult = 3.0  # Crypto lebih volatile
+        # Dynamic Risk Multiplier (Crypto lebih volatile), sama dengan backtest
+        sl_mult = sl_atr_mult(asset_type)
 
         sl_pips = atr * sl_mult
-        tp_pips = sl_pips * 2.0  # Risk Reward 1:2
+        tp_pips = sl_pips * TP_RATIO  # Risk Reward 1:2
 
         entry_price = current_price
         order_type = "MARKET"
@@ -375,7 +372,7 @@ async def get_detailed_signal(symbol, asset_info=None, custom_balance=None):
         ema_20 = last_row_dict.get("SMA_20", current_price)
         dist_to_ema = abs(current_price - ema_20)
 
-        if dist_to_ema > (atr * 0.8):
+        if dist_to_ema > (atr * PULLBACK_ATR):
             order_type = "LIMIT"
             entry_price = (current_price + ema_20) / 2
             reasons.append("Pullback Entry")
@@ -403,7 +400,7 @@ async def get_detailed_signal(symbol, asset_info=None, custom_balance=None):
         win_prob = confidence / 100.0
 
         lot_size, mm_note = calculate_kelly_lot(
-            user_balance, win_prob, 2.0, sl_dist, info
+            user_balance, win_prob, TP_RATIO, sl_dist, info
         )
         reasons.append(f"MM: {mm_note}")
 
@@ -0,0 +1,206 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+from src.core.formula_evaluator import compile_formula
+from src.core.logger import logger
+from src.core.trigger_engine import SIDE_ABOVE, SIDE_BELOW, LevelBook
+from src.database.database import alerts_collection
+from src.database.redis_client import redis_client
+
+# Channel notifikasi "alert berubah" (payload: _id alert) dari alert_routes
+ALERT_SYNC_CHANNEL = "alerts:sync"
+# Batas dokumen saat rebuild dari Mongo
+REBUILD_LIMIT = 100_000
+
+
+class AlertEngine:
+    """
+    Indeks in-memory alert ACTIVE per simbol. Alert PRICE disimpan di
+    ``LevelBook`` (ABOVE -> above, BELOW -> below) sehingga harga baru cukup
+    dibisect; formula di-compile sekali. Alert yang terpicu langsung keluar
+    dari indeks dan ditulis ke Mongo per batch lewat ``flush``.
+    """
+
+    def __init__(self):
+        self.prices: Dict[str, LevelBook] = defaultdict(LevelBook)
+        self.formulas: Dict[str, Dict[Any, tuple]] = defaultdict(dict)
+        self.alerts: Dict[Any, dict] = {}
+        # Variabel formula terakhir per simbol (RSI, SMA20, VOLUME dari bar)
+        self.env: Dict[str, dict] = {}
+        self._pending: List[UpdateOne] = []
+
+    def __len__(self) -> int:
+        return len(self.alerts)
+
+    # --- Sinkronisasi indeks ---
+    def add(self, alert: dict) -> None:
+        self.discard(alert["_id"])
+        if alert.get("status") != "ACTIVE":
+            return
+        symbol = alert["symbol"]
+        if alert.get("type") == "PRICE":
+            side = _price_side(alert)
+            if side is None:
+                return
+            self.prices[symbol].add(side, float(alert["target_price"]), alert["_id"])
+        elif alert.get("type") == "FORMULA":
+            self.formulas[symbol][alert["_id"]] = (alert, compile_formula(alert["condition"]))
+        else:
+            return
+        self.alerts[alert["_id"]] = alert
+
+    def discard(self, alert_id) -> None:
+        alert = self.alerts.pop(alert_id, None)
+        if alert is None:
+            return
+        symbol = alert["symbol"]
+        if alert.get("type") == "PRICE":
+            book = self.prices[symbol]
+            book.remove(_price_side(alert), float(alert["target_price"]), alert_id)
+            if not len(book):
+                del self.prices[symbol]
+        else:
+            formulas = self.formulas[symbol]
+            formulas.pop(alert_id, None)
+            if not formulas:
+                del self.formulas[symbol]
+
+    def load(self, alerts) -> None:
+        self.prices = defaultdict(LevelBook)
+        self.formulas = defaultdict(dict)
+        self.alerts = {}
+        for alert in alerts:
+            self.add(alert)
+
+    async def rebuild(self) -> int:
+        cursor = alerts_collection.find({"status": "ACTIVE"})
+        self.load(await cursor.to_list(length=REBUILD_LIMIT))
+        logger.info("🔔 Alert index rebuilt: %d active alerts", len(self.alerts))
+        return len(self.alerts)
+
+    async def sync_alert(self, alert_id) -> None:
+        """Muat ulang satu alert (create/delete dari API)."""
+        alert = await alerts_collection.find_one({"_id": alert_id})
+        if alert is None:
+            self.discard(alert_id)
+        else:
+            self.add(alert)
+
+    # --- Evaluasi ---
+    def evaluate(self, symbol: str, price: float, env: Optional[dict] = None) -> List[dict]:
+        """
+        Alert yang terpicu oleh harga ``price`` (dan variabel ``env`` bila ada).
+        Tanpa I/O; hasil tulis Mongo menunggu ``flush``.
+        """
+        if env is not None:
+            self.env[symbol] = env
+
+        triggered = []
+        book = self.prices.get(symbol)
+        if book is not None:
+            triggered.extend(self.alerts[i] for i in book.triggered(price, price))
+
+        formulas = self.formulas.get(symbol)
+        if formulas:
+            variables = {**self.env.get(symbol, {}), "CLOSE": price}
+            triggered.extend(alert for alert, fn in formulas.values() if fn(variables))
+
+        if triggered:
+            now = datetime.now(timezone.utc)
+            for alert in triggered:
+                logger.info("🚨 ALERT TRIGGERED: %s - %s", symbol, alert.get("note", ""))
+                self.discard(alert["_id"])
+                self._pending.append(
+                    UpdateOne(
+                        {"_id": alert["_id"], "status": "ACTIVE"},
+                        {"$set": {"status": "TRIGGERED", "triggered_at": now}},
+                    )
+                )
+        return triggered
+
+    async def flush(self) -> int:
+        """Tulis semua alert yang terpicu dengan satu bulk_write."""
+        if not self._pending:
+            return 0
+        ops, self._pending = self._pending, []
+        try:
+            await alerts_collection.bulk_write(ops, ordered=False)
+        except Exception:
+            # Coba lagi di flush berikutnya (update ber-filter status -> idempoten)
+            self._pending = ops + self._pending
+            raise
+        return len(ops)
+
+    async def process_messages(self, messages) -> int:
+        """Handler batch tick dari ``market_ticks_stream``."""
+        for _message_id, data in messages:
+            try:
+                symbol = data["symbol"]
+                price = float(data["price"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if symbol in self.prices or symbol in self.formulas:
+                self.evaluate(symbol, price)
+        return await self.flush()
+
+    async def listen_sync(self) -> None:
+        """Subscribe ALERT_SYNC_CHANNEL lalu rebuild (tidak ada create yang terlewat)."""
+        while True:
+            pubsub = None
+            try:
+                await redis_client.connect()
+                redis_conn = redis_client.redis
+                if not redis_conn:
+                    await asyncio.sleep(1)
+                    continue
+
+                pubsub = redis_conn.pubsub()
+                await pubsub.subscribe(ALERT_SYNC_CHANNEL)
+                await self.rebuild()
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        await self.sync_alert(ObjectId(message["data"]))
+                    except InvalidId:
+                        logger.warning("Invalid alert id on %s: %r", ALERT_SYNC_CHANNEL, message["data"])
+                    except Exception as e:
+                        logger.error("Alert Engine Sync Error: %s", e)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Alert Engine Sync Listener Error: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+
+def _price_side(alert: dict) -> Optional[str]:
+    condition = str(alert.get("condition", "")).upper()
+    if condition == "ABOVE":
+        return SIDE_ABOVE
+    if condition == "BELOW":
+        return SIDE_BELOW
+    return None
+
+
+async def notify_alert_changed(alert_id) -> None:
+    """Beritahu alert engine (proses watcher) bahwa alert berubah."""
+    try:
+        await redis_client.publish(ALERT_SYNC_CHANNEL, str(alert_id))
+    except Exception as e:
+        logger.error("Alert Sync Publish Error: %s", e)
+
+
+alert_engine = AlertEngine()
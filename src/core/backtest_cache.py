@@ -0,0 +1,172 @@
+import hashlib
+import io
+import json
+import os
+import time
+from typing import Dict, Optional
+
+import msgpack
+import pandas as pd
+
+from src.core.execution import EXECUTION_VERSION
+from src.core.logger import logger
+from src.database.redis_client import redis_client
+
+RESULT_PREFIX = "backtest:result:"
+CURRENT_PREFIX = "backtest:current:"
+# Field hasil worker berisi hash model + fingerprint data (dibuang sebelum disajikan)
+CACHE_META = "_cache"
+# Umur entry hasil backtest
+RESULT_TTL = int(os.getenv("BACKTEST_CACHE_TTL", "86400"))
+# Selama ini fingerprint data terakhir dianggap masih berlaku (tanpa fetch ulang)
+DATA_TTL = int(os.getenv("BACKTEST_DATA_TTL", "900"))
+# Kurva equity sepanjang ini disimpan sebagai Parquet (key terpisah)
+PARQUET_MIN_ROWS = 1000
+
+# path -> (mtime, size, sha256): hash model hanya dihitung ulang saat file berubah
+_model_hashes: Dict[str, tuple] = {}
+
+
+def model_hash(path: str) -> str:
+    """SHA-256 artefak model (di-memo per mtime + ukuran file)."""
+    stat = os.stat(path)
+    cached = _model_hashes.get(path)
+    if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    _model_hashes[path] = (stat.st_mtime, stat.st_size, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def data_fingerprint(df: pd.DataFrame, symbol: str, interval: str) -> str:
+    """Fingerprint data historis: simbol, interval, bar pertama & terakhir, jumlah baris."""
+    raw = json.dumps(
+        [symbol, interval, str(df.index[0]), str(df.index[-1]), len(df)] if len(df) else [symbol, interval, 0]
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cache_key(model_sha: str, fingerprint: str, params: dict) -> str:
+    raw = json.dumps([model_sha, fingerprint, params, EXECUTION_VERSION], sort_keys=True, default=str)
+    return RESULT_PREFIX + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _current_key(symbol: str, interval: str, period: str) -> str:
+    return f"{CURRENT_PREFIX}{symbol}:{interval}:{period}"
+
+
+def _pack(result: dict) -> Dict[str, bytes]:
+    """
+    Hasil -> payload Redis. Kurva equity panjang disimpan sebagai Parquet;
+    ``equity_curve_raw`` (duplikat) dibangun ulang saat dibaca.
+    """
+    result = dict(result)
+    curve = result.get("equity_curve") or []
+    payload = {}
+    if len(curve) >= PARQUET_MIN_ROWS:
+        try:
+            buffer = io.BytesIO()
+            pd.DataFrame(curve, columns=["date", "balance"]).to_parquet(buffer, index=False)
+            payload["equity"] = buffer.getvalue()
+            result["equity_curve"] = None
+            result.pop("equity_curve_raw", None)
+        except ImportError:
+            # Engine Parquet (pyarrow) tidak tersedia: simpan inline
+            pass
+    payload["result"] = msgpack.packb(result, use_bin_type=True)
+    return payload
+
+
+def _unpack(packed: bytes, equity: Optional[bytes]) -> dict:
+    result = msgpack.unpackb(packed, raw=False)
+    if result.get("equity_curve") is None and equity is not None:
+        frame = pd.read_parquet(io.BytesIO(equity))
+        curve = frame.to_dict("records")
+        result["equity_curve"] = curve
+        result["equity_curve_raw"] = [{"time": p["date"], "value": p["balance"]} for p in curve]
+    return result
+
+
+async def lookup(symbol: str, interval: str, period: str, model_sha: str, params: dict) -> Optional[dict]:
+    """
+    Hasil cache tanpa fetch data: fingerprint diambil dari run terakhir
+    (berlaku ``DATA_TTL`` detik). Model yang berubah -> hash beda -> miss.
+    """
+    try:
+        current = await redis_client.get(_current_key(symbol, interval, period))
+        if not current:
+            return None
+        current = json.loads(current)
+        if current["model"] != model_sha or time.time() - current["checked_at"] > DATA_TTL:
+            return None
+
+        key = cache_key(model_sha, current["data"], params)
+        packed = await redis_client.get_bytes(key)
+        if not packed:
+            return None
+        equity = await redis_client.get_bytes(f"{key}:equity")
+        return _unpack(packed, equity)
+    except Exception as e:
+        logger.error("Backtest Cache Get Error: %s", e)
+        return None
+
+
+async def store(symbol: str, interval: str, period: str, params: dict, result: dict) -> Optional[str]:
+    """
+    Simpan hasil worker (wajib berisi ``CACHE_META``). Jika model atau data
+    berubah sejak run terakhir, semua entry lama simbol ini dihapus.
+    """
+    meta = result.pop(CACHE_META, None)
+    if not meta:
+        return None
+    try:
+        current_key = _current_key(symbol, interval, period)
+        key = cache_key(meta["model"], meta["data"], params)
+        previous = await redis_client.get(current_key)
+        previous = json.loads(previous) if previous else {}
+
+        keys = [key]
+        stale = []
+        if (previous.get("model"), previous.get("data")) == (meta["model"], meta["data"]):
+            keys = list(dict.fromkeys(previous.get("keys", []) + [key]))
+        else:
+            stale = previous.get("keys", [])
+
+        payload = _pack(result)
+        batch = redis_client.batch()
+        for old in stale:
+            batch.delete(old, f"{old}:equity")
+        if "equity" not in payload:
+            batch.delete(f"{key}:equity")
+        await batch.execute()
+
+        await redis_client.set_bytes(key, payload["result"], ex=RESULT_TTL)
+        if "equity" in payload:
+            await redis_client.set_bytes(f"{key}:equity", payload["equity"], ex=RESULT_TTL)
+        # Pointer hidup selama entry; kesegaran fingerprint dicek lewat checked_at
+        pointer = {"model": meta["model"], "data": meta["data"], "keys": keys, "checked_at": time.time()}
+        await redis_client.set(current_key, json.dumps(pointer), ex=RESULT_TTL)
+        if stale:
+            logger.info("♻️ Backtest cache %s invalidated (%d entry)", symbol, len(stale))
+        return key
+    except Exception as e:
+        logger.error("Backtest Cache Set Error: %s", e)
+        return None
+
+
+async def invalidate(symbol: str, interval: str, period: str) -> int:
+    """Buang semua hasil cache simbol (misal setelah model dilatih ulang)."""
+    current_key = _current_key(symbol, interval, period)
+    previous = await redis_client.get(current_key)
+    keys = json.loads(previous).get("keys", []) if previous else []
+    batch = redis_client.batch()
+    for key in keys:
+        batch.delete(key, f"{key}:equity")
+    batch.delete(current_key)
+    await batch.execute()
+    return len(keys)
+
@@ -0,0 +1,44 @@
+import asyncio
+
+from src.core import backtest_cache
+from src.core.backtest_engine import BACKTEST_INTERVAL, find_model_path, run_backtest_sync
+from src.core.config_assets import get_asset_info
+from src.core.job_queue import JobQueue
+
+
+def _params(symbol: str, period: str, balance: int) -> dict:
+    return {"symbol": symbol, "period": period, "initial_balance": balance}
+
+
+async def get_cached_backtest(symbol: str, period: str, balance: int):
+    """Hasil backtest dari cache (model & fingerprint data sama), atau None."""
+    info = get_asset_info(symbol)
+    model_path = find_model_path(symbol, info) if info else None
+    if model_path is None:
+        return None
+    model_sha = await asyncio.to_thread(backtest_cache.model_hash, model_path)
+    return await backtest_cache.lookup(
+        symbol, BACKTEST_INTERVAL, period, model_sha, _params(symbol, period, balance)
+    )
+
+
+async def _cache_result(job) -> None:
+    params = job.params
+    await backtest_cache.store(
+        params["symbol"], BACKTEST_INTERVAL, params["period"], params, job.result
+    )
+
+
+def submit_backtest(symbol: str, period: str, balance: int, user: dict):
+    """Submit backtest sebagai job; request identik yang masih aktif digabung."""
+    return backtest_jobs.submit(
+        "backtest",
+        run_backtest_sync,
+        _params(symbol, period, balance),
+        str(user["_id"]),
+        user.get("role", "free"),
+        on_done=_cache_result,
+    )
+
+
+backtest_jobs = JobQueue()
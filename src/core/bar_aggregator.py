@@ -0,0 +1,221 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# Timeframe -> durasi bar (detik)
+TIMEFRAMES: Dict[str, int] = {"1m": 60, "5m": 300, "1h": 3600}
+# Pub/Sub fragmen bar live: candle:{symbol}:{timeframe}
+CANDLE_CHANNEL_PREFIX = "candle:"
+
+
+def candle_channel(symbol: str, timeframe: str) -> str:
+    return f"{CANDLE_CHANNEL_PREFIX}{symbol}:{timeframe}"
+
+
+def _to_datetime(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def _to_timestamp(dt: datetime) -> float:
+    # Mongo mengembalikan datetime naive (UTC)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class BarAggregator:
+    """
+    Membangun bar OHLCV per simbol & timeframe dari tick di memory.
+
+    Hanya bar yang sudah selesai dikembalikan untuk disimpan. Bila beberapa
+    consumer menerima tick simbol yang sama, masing-masing menghasilkan
+    *fragmen* bar untuk bucket yang sama; fragmen digabung saat dibaca
+    (lihat ``bars_pipeline``), sehingga penulisan tetap insert-only.
+    """
+
+    def __init__(self, timeframes: Optional[Dict[str, int]] = None, grace: float = 2.0):
+        self.timeframes = timeframes or TIMEFRAMES
+        # Tunggu sebentar setelah bucket berakhir untuk tick yang terlambat
+        self.grace = grace
+        self._bars: Dict[Tuple[str, str], dict] = {}
+        # Bar yang berubah sejak pop_updates() terakhir (untuk streaming live)
+        self._touched: set = set()
+
+    def __len__(self) -> int:
+        return len(self._bars)
+
+    def add_tick(self, symbol: str, price: float, volume: float, ts: float) -> List[dict]:
+        """Masukkan satu tick; kembalikan bar yang selesai karenanya."""
+        completed = []
+        for timeframe, seconds in self.timeframes.items():
+            start = int(ts // seconds) * seconds
+            key = (symbol, timeframe)
+            bar = self._bars.get(key)
+            self._touched.add(key)
+
+            if bar is None or start > bar["start"]:
+                if bar is not None:
+                    completed.append(self._finalize(bar))
+                self._bars[key] = self._new_bar(symbol, timeframe, start, price, volume, ts)
+            elif start == bar["start"]:
+                if ts < bar["open_ts"]:
+                    bar["open"], bar["open_ts"] = price, ts
+                if ts >= bar["close_ts"]:
+                    bar["close"], bar["close_ts"] = price, ts
+                bar["high"] = max(bar["high"], price)
+                bar["low"] = min(bar["low"], price)
+                bar["volume"] += volume
+                bar["ticks"] += 1
+            else:
+                # Tick terlambat untuk bucket yang sudah ditutup: simpan sebagai fragmen
+                late = self._new_bar(symbol, timeframe, start, price, volume, ts)
+                completed.append(self._finalize(late))
+        return completed
+
+    def flush_expired(self, now: float) -> List[dict]:
+        """Tutup bar yang bucket-nya sudah lewat (simbol yang berhenti tick)."""
+        completed = []
+        for key, bar in list(self._bars.items()):
+            if bar["start"] + self.timeframes[bar["timeframe"]] + self.grace <= now:
+                completed.append(self._finalize(bar))
+                del self._bars[key]
+        return completed
+
+    def flush_all(self) -> List[dict]:
+        """Tutup semua bar (dipakai saat shutdown); bar ditandai partial."""
+        completed = [self._finalize(bar, partial=True) for bar in self._bars.values()]
+        self._bars.clear()
+        return completed
+
+    def pop_updates(self) -> List[dict]:
+        """Bar terbentuk yang berubah sejak panggilan terakhir (partial)."""
+        updates = [
+            self._finalize(self._bars[key], partial=True)
+            for key in self._touched
+            if key in self._bars
+        ]
+        self._touched.clear()
+        return updates
+
+    def snapshot(self) -> List[dict]:
+        """Bar yang sedang terbentuk (partial) untuk snapshot / streaming."""
+        return [self._finalize(bar, partial=True) for bar in self._bars.values()]
+
+    def restore(self, doc: dict) -> None:
+        """Muat kembali bar terbentuk dari snapshot (dokumen ``market_bars_live``)."""
+        key = (doc["symbol"], doc["timeframe"])
+        if doc["timeframe"] not in self.timeframes or key in self._bars:
+            return
+        self._bars[key] = {
+            "symbol": doc["symbol"],
+            "timeframe": doc["timeframe"],
+            "start": int(_to_timestamp(doc["timestamp"])),
+            "open": doc["open"],
+            "high": doc["high"],
+            "low": doc["low"],
+            "close": doc["close"],
+            "volume": doc["volume"],
+            "ticks": doc["ticks"],
+            "open_ts": _to_timestamp(doc["open_time"]),
+            "close_ts": _to_timestamp(doc["close_time"]),
+        }
+
+    @staticmethod
+    def _new_bar(symbol, timeframe, start, price, volume, ts) -> dict:
+        return {
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "start": start,
+            "open": price,
+            "high": price,
+            "low": price,
+            "close": price,
+            "volume": volume,
+            "ticks": 1,
+            "open_ts": ts,
+            "close_ts": ts,
+        }
+
+    @staticmethod
+    def _finalize(bar: dict, partial: bool = False) -> dict:
+        doc = {
+            "symbol": bar["symbol"],
+            "timeframe": bar["timeframe"],
+            "timestamp": _to_datetime(bar["start"]),
+            "open": bar["open"],
+            "high": bar["high"],
+            "low": bar["low"],
+            "close": bar["close"],
+            "volume": bar["volume"],
+            "ticks": bar["ticks"],
+            # Waktu tick pertama/terakhir, dipakai untuk menggabung fragmen
+            "open_time": _to_datetime(bar["open_ts"]),
+            "close_time": _to_datetime(bar["close_ts"]),
+        }
+        if partial:
+            doc["partial"] = True
+        return doc
+
+
+def bars_pipeline(symbol: str, timeframe: str, start: datetime, limit: int = 1000) -> list:
+    """
+    Aggregation pipeline Mongo yang menggabungkan fragmen bar per bucket:
+    open dari tick paling awal, close dari tick paling akhir.
+    """
+    return [
+        {"$match": {"symbol": symbol, "timeframe": timeframe, "timestamp": {"$gte": start}}},
+        {
+            "$group": {
+                "_id": "$timestamp",
+                "open": {"$top": {"sortBy": {"open_time": 1}, "output": "$open"}},
+                "close": {"$bottom": {"sortBy": {"close_time": 1}, "output": "$close"}},
+                "high": {"$max": "$high"},
+                "low": {"$min": "$low"},
+                "volume": {"$sum": "$volume"},
+            }
+        },
+        {"$sort": {"_id": 1}},
+        {"$limit": limit},
+        {
+            "$project": {
+                "_id": 0,
+                "timestamp": "$_id",
+                "open": 1,
+                "high": 1,
+                "low": 1,
+                "close": 1,
+                "volume": 1,
+            }
+        },
+    ]
+
+
+def encode_fragment(bar: dict, consumer: str, closed: bool) -> list:
+    """
+    Fragmen bar ringkas untuk Pub/Sub:
+    [consumer, t, open, high, low, close, volume, open_ts, close_ts, closed]
+    """
+    return [
+        consumer,
+        int(bar["timestamp"].timestamp()),
+        bar["open"],
+        bar["high"],
+        bar["low"],
+        bar["close"],
+        bar["volume"],
+        bar["open_time"].timestamp(),
+        bar["close_time"].timestamp(),
+        1 if closed else 0,
+    ]
+
+
+def recent_bars_pipeline(symbol: str, timeframe: str, limit: int, now: float) -> list:
+    """N bar terakhir (urut naik) hasil gabungan fragmen, untuk snapshot chart."""
+    seconds = TIMEFRAMES[timeframe]
+    # Batas bawah waktu agar hanya bucket time-series yang relevan yang dibaca
+    start = _to_datetime(now - seconds * (limit + 1) * 2)
+    pipeline = bars_pipeline(symbol, timeframe, start, limit=limit)
+    # Ambil yang terbaru dulu, lalu kembalikan ke urutan naik
+    sort_index = pipeline.index({"$sort": {"_id": 1}})
+    pipeline[sort_index] = {"$sort": {"_id": -1}}
+    pipeline.insert(sort_index + 2, {"$sort": {"_id": 1}})
+    return pipeline
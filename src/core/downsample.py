@@ -0,0 +1,45 @@
+import numpy as np
+
+# Batas bawah resolusi yang masuk akal (titik pertama + terakhir + 1 bucket)
+MIN_POINTS = 3
+
+
+def lttb_indices(y, threshold: int, x=None) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: index ``threshold`` titik yang menjaga
+    bentuk kurva (puncak/lembah tetap ada). Titik pertama & terakhir selalu
+    ikut. Per bucket luas segitiga dihitung vektor dengan NumPy.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < MIN_POINTS:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    every = (n - 2) / (threshold - 2)
+    bounds = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    bounds[-1] = n - 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = bounds[i], bounds[i + 1]
+        next_end = bounds[i + 2] if i + 2 < len(bounds) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_points(points: list, value_key: str, threshold: int) -> list:
+    """Downsample list dict (misal equity curve) berdasarkan ``value_key``."""
+    if not points or threshold >= len(points):
+        return points
+    idx = lttb_indices([p[value_key] for p in points], threshold)
+    return [points[i] for i in idx]
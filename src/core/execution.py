@@ -0,0 +1,212 @@
+import numpy as np
+
+from src.core.vector_backtest import ACTION_BUY, ACTION_SELL, equity_from_trades, summarize
+
+# CONFIG BIAYA (Simulasi Real Market) - sama untuk watcher & backtest
+SPREAD_PIPS = 2  # Spread rata-rata (Forex)
+COMMISSION_PCT = 0.1  # Komisi Saham (0.1% per transaksi)
+COMMISSION_FX = 7.0  # Komisi Forex ($7 per lot round turn)
+PIP_SIZE = 0.0001  # Asumsi pair 4 digit
+FX_CONTRACT_SIZE = 100000  # 1 Lot Standar = 100.000 Unit ($10 per pip)
+
+# Level order ala get_detailed_signal: SL = ATR x multiplier, TP = SL x rasio
+SL_ATR_MULT = {"forex": 1.5, "crypto": 3.0}
+DEFAULT_SL_ATR_MULT = 2.0  # Saham
+TP_RATIO = 2.0  # Risk Reward 1:2
+# Jarak close ke SMA20 (x ATR) yang membuat entry menjadi LIMIT pullback
+PULLBACK_ATR = 0.8
+# Backtest: order limit yang tidak terisi dibatalkan, posisi ditutup paksa di close
+LIMIT_EXPIRY_BARS = 24
+MAX_HOLD_BARS = 500
+
+EXIT_TP, EXIT_SL, EXIT_TIMEOUT = "TP Hit", "SL Hit", "Timeout"
+# Naikkan jika aturan eksekusi/biaya berubah (ikut key cache hasil backtest)
+EXECUTION_VERSION = 1
+
+
+def sl_atr_mult(asset_type: str) -> float:
+    return SL_ATR_MULT.get(asset_type, DEFAULT_SL_ATR_MULT)
+
+
+def order_levels(is_buy, close, atr, sma20=None, sl_mult: float = DEFAULT_SL_ATR_MULT, tp_ratio: float = TP_RATIO):
+    """
+    Entry/SL/TP seperti get_detailed_signal (skalar atau array). Jika close
+    terlalu jauh dari SMA20, entry = LIMIT di tengah close dan SMA20.
+    Return (entry, sl, tp, is_limit).
+    """
+    close = np.asarray(close, dtype=float)
+    atr = np.asarray(atr, dtype=float)
+    entry = close
+    is_limit = np.zeros(close.shape, dtype=bool)
+    if sma20 is not None:
+        sma20 = np.asarray(sma20, dtype=float)
+        is_limit = np.abs(close - sma20) > atr * PULLBACK_ATR
+        entry = np.where(is_limit, (close + sma20) / 2, close)
+
+    direction = np.where(is_buy, 1.0, -1.0)
+    sl_dist = atr * sl_mult
+    return entry, entry - direction * sl_dist, entry + direction * sl_dist * tp_ratio, is_limit
+
+
+def limit_filled(is_buy, entry, high, low):
+    """Order limit terisi jika harga menjemput entry (BUY: Low <= entry, SELL: High >= entry)."""
+    return np.where(is_buy, low <= entry, high >= entry)
+
+
+def exit_hits(is_buy, tp, sl, high, low):
+    """(tp_hit, sl_hit) per bar dari High/Low."""
+    if is_buy:
+        return high >= tp, low <= sl
+    return low <= tp, high >= sl
+
+
+def check_exit(is_buy: bool, tp: float, sl: float, high: float, low: float):
+    """
+    Aturan exit satu bar (watcher): TP dicek lebih dulu, lalu SL.
+    Return (exit_price, exit_reason) atau (None, None).
+    """
+    tp_hit, sl_hit = exit_hits(is_buy, tp, sl, high, low)
+    if tp_hit:
+        return tp, EXIT_TP
+    if sl_hit:
+        return sl, EXIT_SL
+    return None, None
+
+
+def first_exit(is_buy: bool, tp: float, sl: float, high: np.ndarray, low: np.ndarray):
+    """
+    Sentuhan pertama TP/SL atas array High/Low (vektor, aturan sama dengan
+    ``check_exit``). Return (offset bar, exit_price, reason) atau (-1, None, None).
+    """
+    tp_hit, sl_hit = exit_hits(is_buy, tp, sl, high, low)
+    touched = np.flatnonzero(tp_hit | sl_hit)
+    if not len(touched):
+        return -1, None, None
+    j = touched[0]
+    return (j, tp, EXIT_TP) if tp_hit[j] else (j, sl, EXIT_SL)
+
+
+def net_pnl(entry, exit_price, is_buy, lot_size, asset_type: str, contract_size: float = FX_CONTRACT_SIZE):
+    """
+    PnL bersih setelah biaya (skalar -> float, array -> array):
+    - Saham IDX: selisih x lot x 100 - komisi beli + jual (COMMISSION_PCT).
+    - Lainnya: (selisih - spread) x contract_size x lot - COMMISSION_FX x lot.
+    """
+    direction = np.where(is_buy, 1.0, -1.0)
+    diff = (np.asarray(exit_price, dtype=float) - entry) * direction
+    if asset_type == "stock_indo":
+        commission = (np.asarray(entry, dtype=float) * lot_size * 100) * (COMMISSION_PCT / 100)
+        pnl = diff * lot_size * 100 - commission * 2
+    else:
+        pnl = (diff - SPREAD_PIPS * PIP_SIZE) * contract_size * lot_size - COMMISSION_FX * lot_size
+    return float(pnl) if np.ndim(pnl) == 0 else pnl
+
+
+def simulate_trades(
+    high, low, close, atr, actions,
+    sl_mult: float = DEFAULT_SL_ATR_MULT,
+    tp_ratio: float = TP_RATIO,
+    sma20=None,
+    confidence=None,
+    min_confidence: float = 0,
+    max_hold: int = MAX_HOLD_BARS,
+    limit_expiry: int = LIMIT_EXPIRY_BARS,
+):
+    """
+    Eksekusi sinyal BUY/SELL atas array OHLC dengan aturan watcher: order
+    MARKET terisi di close bar sinyal, order LIMIT di bar pertama yang
+    menjemput entry (maks ``limit_expiry`` bar), lalu exit di sentuhan
+    TP/SL pertama (maks ``max_hold`` bar, sisanya ditutup di close).
+    Satu posisi sekaligus; pencarian fill/exit per trade memakai slice vektor.
+    """
+    high, low, close, atr = (np.asarray(a, dtype=float) for a in (high, low, close, atr))
+    actions = np.asarray(actions)
+    n = len(close)
+
+    signal = ((actions == ACTION_BUY) | (actions == ACTION_SELL)) & (atr > 0)
+    if confidence is not None:
+        signal &= np.asarray(confidence) >= min_confidence
+    is_buy = actions == ACTION_BUY
+    entry, sl, tp, is_limit = order_levels(is_buy, close, atr, sma20, sl_mult, tp_ratio)
+
+    trades = {k: [] for k in ("signals", "entries", "exits", "direction", "entry_price", "exit_price", "reason")}
+    free_from = 0
+    for i in np.flatnonzero(signal):
+        if i < free_from or i >= n - 1:
+            continue
+
+        opened = i
+        if is_limit[i]:
+            end = min(n, i + 1 + limit_expiry)
+            filled = np.flatnonzero(limit_filled(is_buy[i], entry[i], high[i + 1 : end], low[i + 1 : end]))
+            if not len(filled):
+                free_from = end
+                continue
+            opened = i + 1 + filled[0]
+            if opened >= n - 1:
+                break
+
+        end = min(n, opened + 1 + max_hold)
+        offset, price, reason = first_exit(is_buy[i], tp[i], sl[i], high[opened + 1 : end], low[opened + 1 : end])
+        if offset < 0:
+            closed, price, reason = end - 1, close[end - 1], EXIT_TIMEOUT
+        else:
+            closed = opened + 1 + offset
+
+        trades["signals"].append(i)
+        trades["entries"].append(opened)
+        trades["exits"].append(closed)
+        trades["direction"].append(1 if is_buy[i] else -1)
+        trades["entry_price"].append(entry[i])
+        trades["exit_price"].append(price)
+        trades["reason"].append(reason)
+        free_from = closed + 1
+
+    return {
+        "signals": np.asarray(trades["signals"], dtype=np.int64),
+        "entries": np.asarray(trades["entries"], dtype=np.int64),
+        "exits": np.asarray(trades["exits"], dtype=np.int64),
+        "direction": np.asarray(trades["direction"], dtype=np.int8),
+        "entry_price": np.asarray(trades["entry_price"], dtype=float),
+        "exit_price": np.asarray(trades["exit_price"], dtype=float),
+        "reason": trades["reason"],
+    }
+
+
+def run_execution_backtest(
+    high, low, close, atr, actions, info: dict, initial_balance: float,
+    lot_size: float = 1,
+    sma20=None,
+    sl_mult: float = None,
+    tp_ratio: float = TP_RATIO,
+    confidence=None,
+    min_confidence: float = 0,
+) -> dict:
+    """
+    Backtest dengan model eksekusi watcher: ``simulate_trades`` + PnL bersih
+    biaya, kurva equity realized per bar dan metrik ringkasan.
+    """
+    asset_type = info.get("type")
+    if sl_mult is None:
+        sl_mult = sl_atr_mult(asset_type)
+    trades = simulate_trades(
+        high, low, close, atr, actions, sl_mult, tp_ratio, sma20, confidence, min_confidence
+    )
+    raw_pnl = net_pnl(
+        trades["entry_price"],
+        trades["exit_price"],
+        trades["direction"] == 1,
+        lot_size,
+        asset_type,
+        info.get("lot_multiplier", FX_CONTRACT_SIZE),
+    )
+    balance = equity_from_trades(len(close), trades["exits"], raw_pnl, initial_balance)
+    equity = np.round(balance, 2)
+    pnl = np.round(raw_pnl, 2)
+    return {
+        **trades,
+        "pnl": pnl,
+        "balance": balance,
+        "equity": equity,
+        "stats": summarize(equity, pnl, initial_balance),
+    }
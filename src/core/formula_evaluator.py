@@ -1,6 +1,10 @@
 
 import ast
 import operator as op
+import re
+from functools import lru_cache, reduce
+
+import numpy as np
 
 # Supported operators
 operators = {
@@ -19,58 +23,214 @@ operators = {
     ast.Not: op.not_,
 }
 
+# Formula unik yang disimpan hasil kompilasinya
+FORMULA_CACHE_SIZE = 4096
+# Pangkat hanya boleh dengan eksponen konstanta kecil (cegah 9**9**9**9)
+MAX_POW_EXPONENT = 10
+
+
+def _normalize(expr):
+    # Pre-process expression to handle 'AND', 'OR', 'NOT' which are not standard in Python eval body if not properly parsed
+    # Case insensitive replacement for common logical operators
+    expr = re.sub(r'\bAND\b', 'and', expr, flags=re.IGNORECASE)
+    expr = re.sub(r'\bOR\b', 'or', expr, flags=re.IGNORECASE)
+    expr = re.sub(r'\bNOT\b', 'not', expr, flags=re.IGNORECASE)
+    return expr
+
+
+def _always_false(variables):
+    return False
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def compile_formula(expr):
+    """
+    Compile formula sekali menjadi closure ``fn(variables)``.
+    Regex + ast.parse hanya dijalankan saat formula pertama kali dilihat;
+    formula tidak valid menjadi closure yang selalu False.
+    """
+    try:
+        fn = _compile(ast.parse(_normalize(expr), mode='eval').body)
+    except Exception:
+        return _always_false
+
+    def evaluate(variables):
+        try:
+            return fn(variables)
+        except Exception:
+            return False
+
+    return evaluate
+
+
 def safe_eval(expr, variables):
     """
     Safely evaluate a boolean or arithmetic expression with variables.
     """
-    try:
-        # Pre-process expression to handle 'AND', 'OR', 'NOT' which are not standard in Python eval body if not properly parsed
-        # Case insensitive replacement for common logical operators
-        import re
-        expr = re.sub(r'\bAND\b', 'and', expr, flags=re.IGNORECASE)
-        expr = re.sub(r'\bOR\b', 'or', expr, flags=re.IGNORECASE)
-        expr = re.sub(r'\bNOT\b', 'not', expr, flags=re.IGNORECASE)
-
-        tree = ast.parse(expr, mode='eval')
-        return _eval(tree.body, variables)
-    except Exception as e:
-        # In production, we might want to log this
-        return False
-
-def _eval(node, variables):
-    # Use ast.Constant for Python 3.8+; fallback to ast.Num/ast.Str for older versions
+    return compile_formula(expr)(variables)
+
+
+def _pow_exponent(node):
+    """Eksponen ``**`` yang diizinkan: konstanta numerik dengan |nilai| <= MAX_POW_EXPONENT."""
+    value = node.value if isinstance(node, ast.Constant) else None
+    if (
+        isinstance(node, ast.UnaryOp)
+        and isinstance(node.op, ast.USub)
+        and isinstance(node.operand, ast.Constant)
+    ):
+        value = node.operand.value
+        value = -value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or abs(value) > MAX_POW_EXPONENT:
+        raise TypeError("Exponent must be a small numeric constant")
+    return float(value)
+
+
+def _compile(node):
+    """Ubah node AST menjadi closure (dievaluasi rekursif saat dipanggil)."""
     if isinstance(node, ast.Constant):
-        return node.value
-    elif hasattr(ast, 'Num') and isinstance(node, ast.Num):
-        return node.n
-    elif hasattr(ast, 'Str') and isinstance(node, ast.Str):
-        return node.s
+        value = node.value
+        return lambda variables: value
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+        # Basis float: overflow jadi error (-> False), bukan bilangan bulat raksasa
+        base, exponent = _compile(node.left), _pow_exponent(node.right)
+        return lambda variables: float(base(variables)) ** exponent
     elif isinstance(node, ast.BinOp):
-        return operators[type(node.op)](_eval(node.left, variables), _eval(node.right, variables))
+        fn, left, right = operators[type(node.op)], _compile(node.left), _compile(node.right)
+        return lambda variables: fn(left(variables), right(variables))
     elif isinstance(node, ast.UnaryOp):
-        return operators[type(node.op)](_eval(node.operand, variables))
+        fn, operand = operators[type(node.op)], _compile(node.operand)
+        return lambda variables: fn(operand(variables))
     elif isinstance(node, ast.Compare):
-        left = _eval(node.left, variables)
-        for operation, right_node in zip(node.ops, node.comparators):
-            right = _eval(right_node, variables)
-            if not operators[type(operation)](left, right):
-                return False
-            left = right
-        return True
+        first = _compile(node.left)
+        chain = [(operators[type(o)], _compile(c)) for o, c in zip(node.ops, node.comparators)]
+
+        def compare(variables):
+            left = first(variables)
+            for fn, right_fn in chain:
+                right = right_fn(variables)
+                if not fn(left, right):
+                    return False
+                left = right
+            return True
+
+        return compare
     elif isinstance(node, ast.BoolOp):
+        values = [_compile(v) for v in node.values]
         if isinstance(node.op, ast.And):
-            return all(_eval(value, variables) for value in node.values)
-        elif isinstance(node.op, ast.Or):
-            return any(_eval(value, variables) for value in node.values)
+            return lambda variables: all(v(variables) for v in values)
+        return lambda variables: any(v(variables) for v in values)
     elif isinstance(node, ast.Name):
         # Case-insensitive variable lookup
+        var_name, raw_name = node.id.upper(), node.id
+
+        def lookup(variables):
+            if var_name in variables:
+                return variables[var_name]
+            raise NameError(f"Variable {raw_name} not found")
+
+        return lookup
+    else:
+        raise TypeError(f"Unsupported node type: {type(node)}")
+
+
+# --- Versi vektor: satu formula dievaluasi atas kolom array (NumPy) ---
+
+# Variabel formula -> kolom DataFrame hasil enrich_data (sama dengan check_alerts)
+FORMULA_COLUMNS = {"CLOSE": "Close", "RSI": "RSI_14", "VOLUME": "Volume", "SMA20": "SMA_20"}
+# Nilai jika kolom tidak ada
+FORMULA_DEFAULTS = {"RSI": 50.0, "SMA20": 0.0}
+
+# Operator yang tidak bisa dipakai langsung pada array
+_vector_operators = {**operators, ast.Not: np.logical_not}
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def compile_vector_formula(expr):
+    """
+    Compile formula menjadi fungsi ``fn(columns) -> ndarray bool`` di mana
+    ``columns`` berisi array per variabel (CLOSE, RSI, ...). Satu panggilan =
+    satu pass vektor atas semua simbol atau semua bar. Formula tidak valid
+    atau variabel yang tidak ada menghasilkan semua False.
+    """
+    try:
+        fn = _compile_vector(ast.parse(_normalize(expr), mode='eval').body)
+    except Exception:
+        fn = None
+
+    def evaluate(columns):
+        size = len(next(iter(columns.values()))) if columns else 0
+        if fn is None:
+            return np.zeros(size, dtype=bool)
+        try:
+            with np.errstate(all='ignore'):
+                result = np.asarray(fn(columns))
+            return np.broadcast_to(result.astype(bool), (size,)).copy()
+        except Exception:
+            return np.zeros(size, dtype=bool)
+
+    return evaluate
+
+
+def evaluate_formula(expr, columns):
+    """Mask bool per baris; ``columns`` = {VARIABEL: array} (case-insensitive)."""
+    columns = {k.upper(): np.asarray(v, dtype=float) for k, v in columns.items()}
+    return compile_vector_formula(expr)(columns)
+
+
+def formula_columns(df):
+    """Kolom variabel formula dari DataFrame OHLCV yang sudah di-enrich."""
+    columns = {}
+    for var, col in FORMULA_COLUMNS.items():
+        if col in df.columns:
+            columns[var] = df[col].to_numpy(dtype=float)
+        elif var in FORMULA_DEFAULTS:
+            columns[var] = np.full(len(df), FORMULA_DEFAULTS[var])
+    return columns
+
+
+def formula_fire_mask(expr, df):
+    """Bar saat formula berubah False -> True (kapan alert akan terpicu)."""
+    mask = evaluate_formula(expr, formula_columns(df))
+    previous = np.concatenate(([False], mask[:-1]))
+    return mask & ~previous
+
+
+def _compile_vector(node):
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda columns: value
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+        base, exponent = _compile_vector(node.left), _pow_exponent(node.right)
+        return lambda columns: np.float_power(base(columns), exponent)
+    elif isinstance(node, ast.BinOp):
+        fn, left, right = operators[type(node.op)], _compile_vector(node.left), _compile_vector(node.right)
+        return lambda columns: fn(left(columns), right(columns))
+    elif isinstance(node, ast.UnaryOp):
+        fn, operand = _vector_operators[type(node.op)], _compile_vector(node.operand)
+        return lambda columns: fn(operand(columns))
+    elif isinstance(node, ast.Compare):
+        operands = [_compile_vector(node.left)] + [_compile_vector(c) for c in node.comparators]
+        fns = [operators[type(o)] for o in node.ops]
+
+        def compare(columns):
+            values = [f(columns) for f in operands]
+            return reduce(
+                np.logical_and,
+                (fn(values[i], values[i + 1]) for i, fn in enumerate(fns)),
+            )
+
+        return compare
+    elif isinstance(node, ast.BoolOp):
+        values = [_compile_vector(v) for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return lambda columns: reduce(combine, (v(columns) for v in values))
+    elif isinstance(node, ast.Name):
         var_name = node.id.upper()
-        if var_name in variables:
-            return variables[var_name]
-        raise NameError(f"Variable {node.id} not found")
+        return lambda columns: columns[var_name]
     else:
         raise TypeError(f"Unsupported node type: {type(node)}")
 
+
 if __name__ == "__main__":
     # Test cases
     vars = {'CLOSE': 51000, 'RSI': 25, 'VOLUME': 1000, 'SMA20': 50000}
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.core.logger import logger
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINAL_STATUSES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# Worker process untuk job CPU-bound (backtest dsb., di luar event loop)
+MAX_WORKERS = int(os.getenv("BACKTEST_WORKERS", "2"))
+# Job aktif (antri + berjalan) maksimal; lebih dari ini ditolak (HTTP 429)
+MAX_PENDING_JOBS = int(os.getenv("BACKTEST_MAX_PENDING", "100"))
+MAX_JOBS_PER_USER = int(os.getenv("BACKTEST_MAX_JOBS_PER_USER", "3"))
+# Slot worker yang boleh dipakai bersamaan oleh SATU user, per tier langganan
+# (total seluruh user tetap dibatasi jumlah worker pool)
+TIER_CONCURRENCY = {
+    "free": 1,
+    "premium": 2,
+    "enterprise": 4,
+    "admin": MAX_WORKERS,
+    "owner": MAX_WORKERS,
+}
+# Job selesai disimpan selama ini agar hasil bisa di-poll
+JOB_RETENTION = 600
+
+
+class QueueFull(Exception):
+    """Antrian job penuh (global atau per user)."""
+
+
+class JobCancelled(Exception):
+    """Dilempar callback progress di worker saat job dibatalkan."""
+
+
+class ProgressReporter:
+    """
+    Callable yang dikirim ke worker process: menulis progress ke dict
+    bersama (Manager) dan membatalkan job bila flag cancel diset.
+    """
+
+    def __init__(self, job_id: str, shared):
+        self.job_id = job_id
+        self.shared = shared
+
+    def __call__(self, percent: int, stage: str) -> None:
+        if self.shared.get(f"cancel:{self.job_id}"):
+            raise JobCancelled(self.job_id)
+        self.shared[self.job_id] = (percent, stage)
+
+
+def _run_in_worker(func: Callable, reporter: ProgressReporter, kwargs: dict):
+    try:
+        return func(progress=reporter, **kwargs)
+    except JobCancelled:
+        return {"cancelled": True}
+
+
+def job_key(kind: str, params: dict) -> str:
+    """Request identik -> key identik (untuk coalescing)."""
+    raw = json.dumps([kind, params], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class Job:
+    def __init__(self, kind: str, params: dict, key: str, tier: str, user_id: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.key = key
+        self.tier = tier
+        # User yang men-submit: slot konkurensinya yang dipakai job ini
+        self.user_id = user_id
+        self.owners: set = set()
+        self.status = JOB_QUEUED
+        self.progress = 0
+        self.stage = "queued"
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "stage": self.stage,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result and self.status == JOB_DONE:
+            data["result"] = self.result
+        return data
+
+
+class JobQueue:
+    """
+    Antrian job CPU-bound di ProcessPoolExecutor. Request identik yang masih
+    aktif digabung (satu job, banyak pemilik), konkurensi dibatasi per user
+    sesuai tier (job panjang satu user tidak memblokir user lain) dan secara
+    global oleh jumlah worker, progress & pembatalan lewat dict Manager yang dibagi dengan worker.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self.max_workers = max_workers
+        self.jobs: Dict[str, Job] = {}
+        self._active: Dict[str, Job] = {}
+        # user_id -> [semaphore, jumlah job yang memakainya]
+        self._user_slots: Dict[str, list] = {}
+        self._workers = asyncio.Semaphore(max_workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._shared = None
+
+    def _ensure_pool(self) -> None:
+        if self._pool is None:
+            # spawn: jangan fork proses yang sedang menjalankan event loop/thread
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._shared = self._manager.dict()
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def _acquire_user_slots(self, user_id: str, tier: str) -> asyncio.Semaphore:
+        entry = self._user_slots.get(user_id)
+        if entry is None:
+            limit = min(TIER_CONCURRENCY.get(tier, 1), self.max_workers)
+            entry = self._user_slots[user_id] = [asyncio.Semaphore(limit), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release_user_slots(self, user_id: str) -> None:
+        entry = self._user_slots.get(user_id)
+        if entry is not None:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                # Tidak ada job lagi: buang agar dict tidak tumbuh per user
+                del self._user_slots[user_id]
+
+    def _purge(self) -> None:
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [
+            j.id for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff
+        ]:
+            del self.jobs[job_id]
+
+    def submit(
+        self,
+        kind: str,
+        func: Callable,
+        params: dict,
+        user_id: str,
+        tier: str,
+        on_done: Optional[Callable[[Job], Awaitable[None]]] = None,
+    ):
+        """Return (job, coalesced). Raise QueueFull bila antrian penuh."""
+        self._purge()
+        key = job_key(kind, params)
+        job = self._active.get(key)
+        if job is not None:
+            job.owners.add(user_id)
+            return job, True
+
+        if len(self._active) >= MAX_PENDING_JOBS:
+            raise QueueFull("Antrian job penuh, coba lagi nanti.")
+        owned = sum(1 for j in self._active.values() if user_id in j.owners)
+        if owned >= MAX_JOBS_PER_USER:
+            raise QueueFull(f"Maksimal {MAX_JOBS_PER_USER} job aktif per user.")
+
+        self._ensure_pool()
+        job = Job(kind, params, key, tier, user_id)
+        job.owners.add(user_id)
+        self.jobs[job.id] = job
+        self._active[key] = job
+        job.task = asyncio.create_task(self._run(job, func, on_done))
+        return job, False
+
+    async def _run(self, job: Job, func: Callable, on_done=None) -> None:
+        reporter = ProgressReporter(job.id, self._shared)
+        user_slots = self._acquire_user_slots(job.user_id, job.tier)
+        try:
+            async with user_slots, self._workers:
+                job.status, job.stage, job.started_at = JOB_RUNNING, "starting", time.time()
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._pool, _run_in_worker, func, reporter, job.params
+                )
+            if isinstance(result, dict) and result.get("cancelled"):
+                job.status, job.stage = JOB_CANCELLED, "cancelled"
+            elif isinstance(result, dict) and result.get("error"):
+                job.status, job.error = JOB_FAILED, result["error"]
+                job.result = result
+            else:
+                job.result = result
+                if on_done is not None:
+                    # Hook dijalankan sebelum status DONE (hasil belum terlihat di poll)
+                    try:
+                        await on_done(job)
+                    except Exception as e:
+                        logger.error("Job %s on_done Error: %s", job.id, e)
+                job.status, job.progress, job.stage = JOB_DONE, 100, "done"
+        except asyncio.CancelledError:
+            job.status, job.stage = JOB_CANCELLED, "cancelled"
+        except Exception as e:
+            logger.error("Job %s (%s) Error: %s", job.id, job.kind, e)
+            job.status, job.error = JOB_FAILED, str(e)
+        finally:
+            self._release_user_slots(job.user_id)
+            job.finished_at = time.time()
+            self._active.pop(job.key, None)
+            if self._shared is not None:
+                self._shared.pop(job.id, None)
+                self._shared.pop(f"cancel:{job.id}", None)
+            job.done.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is not None and job.status == JOB_RUNNING and self._shared is not None:
+            job.progress, job.stage = self._shared.get(job.id, (job.progress, job.stage))
+        return job
+
+    def cancel(self, job: Job, user_id: str) -> bool:
+        """
+        Lepas kepemilikan user; job benar-benar dibatalkan bila tidak ada
+        pemilik lain (job gabungan tetap jalan untuk user lain).
+        """
+        if job.status in FINAL_STATUSES:
+            return False
+        job.owners.discard(user_id)
+        if job.owners:
+            return True
+        if job.status == JOB_QUEUED and job.task is not None:
+            job.task.cancel()
+        else:
+            # Sudah berjalan di worker: dibatalkan di checkpoint progress berikutnya
+            self._shared[f"cancel:{job.id}"] = True
+        return True
+
+    async def wait(self, job: Job, timeout: Optional[float] = None) -> Job:
+        await asyncio.wait_for(job.done.wait(), timeout)
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "active": len(self._active),
+            "running": sum(1 for j in self._active.values() if j.status == JOB_RUNNING),
+            "retained": len(self.jobs),
+        }
+
+    def shutdown(self) -> None:
+        for job in list(self._active.values()):
+            if job.task is not None:
+                job.task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
@@ -0,0 +1,102 @@
+import numpy as np
+
+from src.core.vector_backtest import PROFIT_FACTOR_CAP
+
+DEFAULT_PATHS = 10000
+MAX_PATHS = 100000
+CONFIDENCE = 0.95
+# Drawdown (%) yang dianggap ruin (akun tidak layak diteruskan)
+RUIN_DRAWDOWN = 50.0
+# Batas elemen matriks path x trade per chunk (~160 MB float64)
+MAX_CELLS = 20_000_000
+# Gate promosi
+MAX_RISK_OF_RUIN = 5.0
+
+
+def _interval(values: np.ndarray, confidence: float) -> dict:
+    tail = (1 - confidence) / 2 * 100
+    low, median, high = np.percentile(values, [tail, 50, 100 - tail])
+    return {
+        "mean": round(float(values.mean()), 2),
+        "low": round(float(low), 2),
+        "median": round(float(median), 2),
+        "high": round(float(high), 2),
+    }
+
+
+def _path_stats(samples: np.ndarray, initial_balance: float, ruin_drawdown: float):
+    """Metrik per path untuk matriks (path x trade) sekaligus."""
+    equity = initial_balance + np.cumsum(samples, axis=1)
+    start = np.full((len(samples), 1), float(initial_balance))
+    equity = np.hstack([start, equity])
+
+    peak = np.maximum.accumulate(equity, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(peak > 0, (peak - equity) / peak * 100, 100.0)
+    max_drawdown = drawdown.max(axis=1)
+
+    gross_profit = np.where(samples > 0, samples, 0).sum(axis=1)
+    gross_loss = -np.where(samples < 0, samples, 0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_factor = np.where(
+            gross_loss > 0, np.minimum(gross_profit / gross_loss, PROFIT_FACTOR_CAP), PROFIT_FACTOR_CAP
+        )
+
+    total_return = (equity[:, -1] - initial_balance) / initial_balance * 100
+    ruined = (max_drawdown >= ruin_drawdown) | (equity <= 0).any(axis=1)
+    return total_return, max_drawdown, profit_factor, ruined
+
+
+def monte_carlo(
+    pnl,
+    initial_balance: float,
+    n_paths: int = DEFAULT_PATHS,
+    confidence: float = CONFIDENCE,
+    ruin_drawdown: float = RUIN_DRAWDOWN,
+    seed=None,
+) -> dict:
+    """
+    Bootstrap urutan trade: ``n_paths`` path, masing-masing berisi trade yang
+    diambil ulang (dengan pengembalian) dari ``pnl``. Semua path dihitung
+    sebagai satu matriks NumPy (dipecah per chunk bila terlalu besar).
+    Return interval kepercayaan return %, max drawdown %, profit factor dan
+    risk of ruin (% path yang menyentuh ``ruin_drawdown``).
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    n_trades = len(pnl)
+    report = {
+        "paths": int(n_paths),
+        "trades": n_trades,
+        "confidence": confidence,
+        "ruin_drawdown": ruin_drawdown,
+    }
+    if n_trades == 0 or n_paths <= 0:
+        empty = {"mean": 0.0, "low": 0.0, "median": 0.0, "high": 0.0}
+        return {**report, "total_return_percent": empty, "max_drawdown": empty,
+                "profit_factor": empty, "risk_of_ruin": 0.0}
+
+    rng = np.random.default_rng(seed)
+    chunk = max(1, MAX_CELLS // n_trades)
+    parts = []
+    for start in range(0, n_paths, chunk):
+        size = min(chunk, n_paths - start)
+        samples = pnl[rng.integers(0, n_trades, size=(size, n_trades))]
+        parts.append(_path_stats(samples, initial_balance, ruin_drawdown))
+    total_return, max_drawdown, profit_factor, ruined = (np.concatenate(p) for p in zip(*parts))
+
+    return {
+        **report,
+        "total_return_percent": _interval(total_return, confidence),
+        "max_drawdown": _interval(max_drawdown, confidence),
+        "profit_factor": _interval(profit_factor, confidence),
+        "risk_of_ruin": round(float(ruined.mean() * 100), 2),
+    }
+
+
+def passes_monte_carlo(report: dict, max_risk_of_ruin: float = MAX_RISK_OF_RUIN) -> bool:
+    """Gate promosi: median return bootstrap positif dan risk of ruin kecil."""
+    return (
+        report["trades"] > 0
+        and report["total_return_percent"]["median"] > 0
+        and report["risk_of_ruin"] <= max_risk_of_ruin
+    )
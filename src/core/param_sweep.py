@@ -0,0 +1,161 @@
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.core.execution import run_execution_backtest
+from src.core.logger import logger
+
+# Grid default: sekitar nilai get_detailed_signal (sl_mult 1.5/2/3, RR 1:2, confidence >= 50)
+DEFAULT_GRID = {
+    "sl_mult": [1.5, 2.0, 3.0],
+    "tp_ratio": [1.5, 2.0, 3.0],
+    "min_confidence": [50, 60, 70],
+}
+SWEEP_PARAMS = tuple(DEFAULT_GRID)
+DEFAULT_RANK_BY = "total_return_percent"
+# Kombinasi dengan trade lebih sedikit dari ini ditaruh di bawah ranking
+MIN_TRADES = 5
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", os.cpu_count() or 1))
+
+
+def expand_grid(grid: dict = None) -> list:
+    """Semua kombinasi parameter grid (cartesian product) sebagai list dict."""
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    unknown = set(grid) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"Parameter sweep tidak dikenal: {sorted(unknown)}")
+    keys = list(SWEEP_PARAMS)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def sweep_arrays(high, low, close, atr, actions, confidence, info, combos, initial_balance, sma20=None) -> list:
+    """
+    Semua kombinasi atas array yang sama: aksi & confidence model dihitung
+    sekali oleh pemanggil, tiap kombinasi hanya menjalankan simulasi eksekusi.
+    """
+    rows = []
+    for params in combos:
+        sim = run_execution_backtest(
+            high, low, close, atr, actions, info, initial_balance,
+            sma20=sma20,
+            sl_mult=params["sl_mult"],
+            tp_ratio=params["tp_ratio"],
+            confidence=confidence,
+            min_confidence=params["min_confidence"],
+        )
+        rows.append({**params, **sim["stats"]})
+    return rows
+
+
+def sweep_symbol(symbol, combos, period="2y", interval="1h", initial_balance=100000000) -> dict:
+    """
+    Dijalankan di worker process: fetch + fitur + model sekali per simbol,
+    lalu seluruh grid disimulasikan di atas matriks yang sama.
+    """
+    # Import berat (pandas_ta, SB3) hanya di worker
+    from stable_baselines3 import PPO
+
+    from src.core.backtest_engine import find_model_path
+    from src.core.config_assets import get_asset_info
+    from src.core.vector_backtest import feature_columns, observation_matrix, predict_with_confidence
+    from src.database.data_loader import fetch_data
+    from src.feature.feature_enginering import enrich_data
+
+    info = get_asset_info(symbol)
+    if not info:
+        return {"symbol": symbol, "error": "Aset tidak terdaftar"}
+
+    df = fetch_data(symbol, period=period, interval=interval)
+    if df.empty:
+        return {"symbol": symbol, "error": "Data historis tidak ditemukan"}
+    df = enrich_data(df)
+    df.dropna(inplace=True)
+    if df.empty or "ATR_14" not in df.columns:
+        return {"symbol": symbol, "error": "Gagal melengkapi data fitur teknikal"}
+
+    model_path = find_model_path(symbol, info)
+    if model_path is None:
+        return {"symbol": symbol, "error": f"Model AI untuk {symbol} belum dilatih"}
+    model = PPO.load(model_path)
+
+    feature_cols = feature_columns(df)
+    if len(feature_cols) != model.observation_space.shape[0]:
+        return {"symbol": symbol, "error": "Model mismatch: jumlah fitur berbeda"}
+
+    started = time.perf_counter()
+    actions, confidence = predict_with_confidence(model, observation_matrix(df, feature_cols))
+    rows = sweep_arrays(
+        df["High"].to_numpy(dtype=float),
+        df["Low"].to_numpy(dtype=float),
+        df["Close"].to_numpy(dtype=float),
+        df["ATR_14"].to_numpy(dtype=float),
+        actions,
+        confidence,
+        info,
+        combos,
+        initial_balance,
+        sma20=df["SMA_20"].to_numpy(dtype=float) if "SMA_20" in df.columns else None,
+    )
+    return {
+        "symbol": symbol,
+        "bars": len(df),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "rows": [{"symbol": symbol, **row} for row in rows],
+    }
+
+
+def rank_results(rows: list, rank_by: str = DEFAULT_RANK_BY, min_trades: int = MIN_TRADES) -> list:
+    """Urutkan descending by ``rank_by``; baris dengan trade < min_trades di bawah."""
+    # max_drawdown disimpan positif: makin kecil makin baik
+    sign = 1 if rank_by == "max_drawdown" else -1
+    ranked = sorted(rows, key=lambda r: (r["total_trades"] < min_trades, sign * r[rank_by]))
+    return [{"rank": i + 1, **row} for i, row in enumerate(ranked)]
+
+
+def run_sweep(
+    symbols,
+    grid: dict = None,
+    period: str = "2y",
+    interval: str = "1h",
+    initial_balance: float = 100000000,
+    workers: int = SWEEP_WORKERS,
+    rank_by: str = DEFAULT_RANK_BY,
+    min_trades: int = MIN_TRADES,
+    on_result=None,
+) -> dict:
+    """
+    Sweep multi-simbol: satu task per simbol disebar ke ``workers`` process.
+    Setiap simbol yang selesai langsung digabung ke tabel ranking dan
+    ``on_result(hasil_simbol, tabel)`` dipanggil (streaming ke CSV/log).
+    """
+    combos = expand_grid(grid)
+    rows, errors = [], {}
+    ctx = multiprocessing.get_context("spawn")
+    logger.info(
+        "🧪 Param sweep: %d simbol x %d kombinasi, %d worker", len(symbols), len(combos), workers
+    )
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(sweep_symbol, symbol, combos, period, interval, initial_balance): symbol
+            for symbol in symbols
+        }
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"symbol": symbol, "error": str(e)}
+
+            if "error" in result:
+                errors[symbol] = result["error"]
+                logger.warning("⚠️ Sweep %s gagal: %s", symbol, result["error"])
+            else:
+                rows.extend(result["rows"])
+            table = rank_results(rows, rank_by, min_trades)
+            if on_result is not None:
+                on_result(result, table)
+
+    return {"combinations": len(combos), "table": rank_results(rows, rank_by, min_trades), "errors": errors}
@@ -1,11 +1,15 @@
-import os
-
 from stable_baselines3 import PPO
 
-from src.core.env import TradingEnv
+from src.core.backtest_cache import model_hash
+from src.core.config_assets import get_asset_info
+from src.core.monte_carlo import monte_carlo, passes_monte_carlo
 from src.core.trainer import deploy_model, train_candidate
+from src.core.walk_forward import oos_start, passes_walk_forward, run_walk_forward
 from src.database.data_loader import fetch_data
 
+# Saldo awal backtest validasi (sama dengan default /backtest/run)
+VALIDATION_BALANCE = 100000000
+
 
 def run_auto_optimization(symbol, target_win_rate=60.0):
     """
@@ -15,8 +19,15 @@ def run_auto_optimization(symbol, target_win_rate=60.0):
     report = {"symbol": symbol, "steps": [], "deployed": False, "final_stats": None}
 
     # --- STEP 1: TRAINING ---
+    # Kandidat dilatih hanya dengan data sebelum periode out-of-sample, lalu
+    # artefak yang sama divalidasi dan (jika lolos) dideploy.
     report["steps"].append("🚀 Starting Training (Candidate)...")
-    train_result = train_candidate(symbol)
+    df = fetch_data(symbol, period="2y", interval="1h").dropna()
+    cut = oos_start(df.index) if not df.empty else None
+    if cut is None:
+        report["steps"].append("❌ Training Failed: Data tidak cukup untuk walk-forward")
+        return report
+    train_result = train_candidate(symbol, df=df.iloc[:cut])
 
     if not train_result["success"]:
         report["steps"].append(f"❌ Training Failed: {train_result['error']}")
@@ -24,51 +35,52 @@ def run_auto_optimization(symbol, target_win_rate=60.0):
 
     report["steps"].append("✅ Training Finished. Model saved in candidates.")
 
-    # --- STEP 2: BACKTEST (VALIDATION) ---
-    report["steps"].append("📉 Running Validation Backtest...")
+    # --- STEP 2: WALK-FORWARD VALIDATION ---
+    # Model kandidat (file yang akan dideploy) dinilai per fold bulanan
+    # out-of-sample dengan policy vektor. Fold di-cache per hash model.
+    report["steps"].append("📉 Running Walk-Forward Validation...")
 
     try:
-        # Load Model Kandidat manual untuk ditest
-        model = PPO.load(train_result["path"])
-
-        # VALIDASI MANUAL (Quick Check)
-        # Kita gunakan data 6 bulan terakhir yang tidak dilihat saat training
-        df_val = fetch_data(symbol, period="6mo", interval="1h")
-
-        if df_val.empty:
-            raise ValueError("No validation data fetched")
-
-        env_val = TradingEnv(df_val)
-        obs, _ = env_val.reset()
-        done = False
-        wins = 0
-        total_actions = 0
-
-        # Simulasi Trading Cepat
-        while not done:
-            action, _ = model.predict(obs, deterministic=True)
-            obs, reward, terminated, truncated, info = env_val.step(action)
-            done = terminated or truncated
-
-            if action != 0:  # Jika Buy/Sell (bukan Hold)
-                total_actions += 1
-                if reward > 0:  # Profit
-                    wins += 1
-
-        # Kalkulasi Statistik Sederhana
-        final_balance = info.get("balance", 1000)
-        initial_balance = 1000
-        profit = final_balance - initial_balance
-        is_profitable = profit > 0
-
-        # Hitung Winrate
-        win_rate = (wins / total_actions * 100) if total_actions > 0 else 0.0
+        model_path = train_result["path"]
+        wf = run_walk_forward(
+            df,
+            get_asset_info(symbol),
+            symbol,
+            model=PPO.load(model_path),
+            config={"model": model_hash(model_path)},
+            initial_balance=VALIDATION_BALANCE,
+        )
+        stats = wf["stats"]
+        if not stats["folds"]:
+            raise ValueError("Data tidak cukup untuk walk-forward")
+
+        # Robustness: bootstrap urutan trade OOS (risk of ruin, CI return)
+        mc = monte_carlo(wf["pnl"], VALIDATION_BALANCE)
+
+        profit = stats["total_return"]
+        is_profitable = passes_walk_forward(wf) and passes_monte_carlo(mc)
+        win_rate = stats["win_rate"]
 
         report["final_stats"] = {
             "profit": round(profit, 2),
             "win_rate_est": round(win_rate, 2),
-            "trades": total_actions,
+            "trades": stats["total_trades"],
+            "profit_factor": stats["profit_factor"],
+            "max_drawdown": stats["max_drawdown"],
+            "folds": stats["folds"],
+            "profitable_folds": stats["profitable_folds"],
+            "risk_of_ruin": mc["risk_of_ruin"],
+            "return_ci": mc["total_return_percent"],
         }
+        report["walk_forward"] = wf["folds"]
+        report["monte_carlo"] = mc
+        report["steps"].append(
+            f"✅ Walk-forward: {stats['folds']} folds ({wf['computed']} computed, {wf['cached']} cached)"
+        )
+        report["steps"].append(
+            f"🎲 Monte Carlo: risk of ruin {mc['risk_of_ruin']}%, "
+            f"return {mc['total_return_percent']['low']}% .. {mc['total_return_percent']['high']}%"
+        )
 
     except Exception as e:
         report["steps"].append(f"❌ Backtest Error: {str(e)}")
@@ -1,10 +1,10 @@
 import asyncio
-import json
 from datetime import datetime, timezone
 
 from src.core.agent import get_detailed_signal
 from src.core.logger import logger
 from src.core.telegram_notifier import telegram_bot
+from src.core.trigger_engine import notify_signal_changed
 from src.database.database import assets_collection, signals_collection
 from src.database.redis_client import redis_client
 from src.database.signal_bus import signal_bus
@@ -12,18 +12,29 @@ from src.feature.market_schedule import is_market_open
 from src.feature.risk_manager import risk_manager
 
 CONCURRENCY_LIMIT = 5
+# Flush antrian Redis setiap N perintah agar frontend tidak menunggu satu siklus penuh
+SIGNAL_FLUSH_SIZE = 150
 
 
 async def save_signal_background(signal_data):
     """Saves the trading signal data to the database."""
     try:
-        await signals_collection.insert_one(signal_data)
+        result = await signals_collection.insert_one(signal_data)
         logger.info("💾 DB Async Save: %s", signal_data['symbol'])
+        # Trigger engine di watcher langsung memantau TP/SL sinyal baru
+        await notify_signal_changed(result.inserted_id)
     except Exception as e:
         logger.error("❌ DB Save Failed: %s", e)
 
 
-async def process_single(asset_info):
+async def process_single(asset_info, batch=None, previous=None, active_trades=None):
+    """
+    Proses satu aset.
+
+    Jika dipanggil dari siklus producer, ``batch`` menampung semua tulis Redis
+    (di-flush bersama), sedangkan ``previous`` / ``active_trades`` berisi hasil
+    prefetch HMGET/MGET sehingga tidak ada round trip per aset.
+    """
     allowed, reason = await risk_manager.can_trade()
 
     if not allowed:
@@ -42,9 +53,23 @@ async def process_single(asset_info):
     if not data or (isinstance(data, dict) and "error" in data) or "Action" not in data:
         return False
 
+    own_batch = batch is None
+    if own_batch:
+        batch = signal_bus.batch()
+
+    try:
+        return await _evaluate_signal(
+            symbol, category, data, batch, previous, active_trades
+        )
+    finally:
+        if own_batch or len(batch) >= SIGNAL_FLUSH_SIZE:
+            await batch.execute()
+
+
+async def _evaluate_signal(symbol, category, data, batch, previous, active_trades):
     # 1. Cek Jadwal Pasar
     if not is_market_open(category):
-        await signal_bus.update_signal(
+        batch.set_signal(
             symbol,
             {
                 "Symbol": symbol,
@@ -57,7 +82,10 @@ async def process_single(asset_info):
         return False
 
     # 2. Cek Perubahan Sinyal
-    old_data = await signal_bus.get_signal(symbol)
+    if previous is not None:
+        old_data = previous.get(symbol)
+    else:
+        old_data = await signal_bus.get_signal(symbol)
     is_new_signal = False
 
     if not old_data:
@@ -66,33 +94,24 @@ async def process_single(asset_info):
     elif old_data.get("Action") != data["Action"] and data["Action"] != "HOLD":
         is_new_signal = True
 
-    # 3. Selalu Update state terakhir di RAM (Signal Bus)
-    await signal_bus.update_signal(symbol, data)
+    # 3. Selalu Update state terakhir (HSET + publish signal:{symbol}/signal:all)
+    batch.set_signal(symbol, data)
 
     # 4. Eksekusi jika benar-benar ada sinyal baru (BUY / SELL)
     if is_new_signal:
         action_upper = data["Action"].upper()
         if "BUY" in action_upper or "SELL" in action_upper:
-            # Pastikan redis terkoneksi
-            if not redis_client.redis:
-                await redis_client.connect()
-            redis_conn = redis_client.redis
-
-            is_active = (
-                await redis_conn.get(f"active_trade:{symbol}") if redis_conn else None
-            )
+            active_key = f"active_trade:{symbol}"
+            if active_trades is not None:
+                is_active = active_trades.get(active_key)
+            else:
+                is_active = await redis_client.get(active_key)
 
             # Jika belum ada trade aktif untuk koin/saham ini
             if not is_active:
                 logger.info("🚨 NEW SIGNAL DETECTED: %s - %s", symbol, data['Action'])
 
-                # A. Broadcast ke Frontend (WebSocket via Redis Pub/Sub)
-                if redis_conn:
-                    try:
-                        await redis_conn.publish("signal:all", json.dumps(data))
-                        logger.info("🌐 Broadcasted %s to Frontend WS", symbol)
-                    except Exception as e:
-                        logger.error("Failed to publish to WS: %s", e)
+                # A. Broadcast ke Frontend sudah ikut di set_signal (signal:all)
 
                 # B. Broadcast ke Telegram
                 if telegram_bot:
@@ -115,8 +134,9 @@ async def process_single(asset_info):
                 asyncio.create_task(save_signal_background(new_signal))
 
                 # D. Set Flag Anti-Spam di Redis (Expire 1 Jam)
-                if redis_conn:
-                    await redis_conn.setex(f"active_trade:{symbol}", 3600, "OPEN")
+                batch.setex(active_key, 3600, "OPEN")
+                if active_trades is not None:
+                    active_trades[active_key] = "OPEN"
 
                 return True
 
@@ -127,11 +147,6 @@ async def signal_producer_task():
     logger.info("🚀 PRODUCER STARTED (DB Mode & Safety Limit)")
     sem = asyncio.Semaphore(CONCURRENCY_LIMIT)
 
-    async def bounded_process(asset):
-        async with sem:
-            await asyncio.sleep(0.1)
-            return await process_single(asset)
-
     while True:
         try:
             cursor = assets_collection.find({})
@@ -142,8 +157,24 @@ async def signal_producer_task():
                 await asyncio.sleep(60)
                 continue
 
+            # Prefetch state siklus: 1x HMGET + 1x MGET untuk semua aset
+            symbols = [asset["symbol"] for asset in assets]
+            previous = await signal_bus.get_signals(symbols)
+            active_trades = await redis_client.mget(
+                f"active_trade:{symbol}" for symbol in symbols
+            )
+            batch = signal_bus.batch()
+
+            async def bounded_process(asset):
+                async with sem:
+                    await asyncio.sleep(0.1)
+                    return await process_single(
+                        asset, batch, previous, active_trades
+                    )
+
             tasks = [bounded_process(asset) for asset in assets]
             await asyncio.gather(*tasks, return_exceptions=True)
+            await batch.execute()
 
             await asyncio.sleep(60)
 
@@ -1,78 +1,443 @@
-from datetime import datetime, timezone
 import asyncio
+import json
+import os
+import socket
+import time
+from collections import deque
+
+from pymongo import DeleteMany, UpdateOne
+
+from src.core.bar_aggregator import BarAggregator, candle_channel, encode_fragment
 from src.core.logger import logger
-from src.database.redis_client import redis_client
 from src.database.database import db
+from src.database.redis_client import redis_client
 
 STREAM_KEY = "market_ticks_stream"
 GROUP_NAME = "backend_workers"
-CONSUMER_NAME = "worker_1"
+# Identitas unik per proses agar consumer bisa ditambah secara horizontal
+CONSUMER_NAME = os.getenv(
+    "STREAM_CONSUMER_NAME", f"{socket.gethostname()}-{os.getpid()}"
+)
+
+# Ukuran batch XREADGROUP menyesuaikan beban (naik x2 saat batch penuh)
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = int(os.getenv("STREAM_MAX_BATCH", "5000"))
+BLOCK_MS = 2000
+# Maksimal batch yang sedang diproses (belum di-ACK) per consumer
+MAX_IN_FLIGHT_BATCHES = int(os.getenv("STREAM_MAX_IN_FLIGHT", "4"))
+# Pesan pending milik consumer yang crash diambil alih setelah idle selama ini
+CLAIM_MIN_IDLE_MS = int(os.getenv("STREAM_CLAIM_IDLE_MS", "60000"))
+CLAIM_INTERVAL = 30
+THROUGHPUT_WINDOW = 60
+# Trim stream saat XADD (approximate, murah). Retensi berbasis waktu (MINID)
+# dipakai jika STREAM_RETENTION_MS > 0, selain itu batas panjang (MAXLEN).
+# Consumer yang tertinggal lebih dari batas ini kehilangan tick tertua.
+STREAM_MAXLEN = int(os.getenv("STREAM_MAXLEN", "1000000"))
+STREAM_RETENTION_MS = int(os.getenv("STREAM_RETENTION_MS", "0"))
+# Jumlah XADD per pipeline saat publish batch
+PUBLISH_CHUNK_SIZE = 1000
+# Publish fragmen bar live ke candle:{symbol}:{tf} untuk chart WebSocket
+LIVE_CANDLES = os.getenv("STREAM_LIVE_CANDLES", "1") == "1"
+# Bar selesai + snapshot bar yang sedang terbentuk (market_bars_live) ditulis
+# tiap N detik, baru setelah itu tick di-ACK (0 = tiap batch). Harus jauh di
+# bawah CLAIM_MIN_IDLE_MS. Snapshot dipulihkan saat start (restore_bars), jadi
+# STREAM_CONSUMER_NAME sebaiknya stabil antar restart.
+BAR_SNAPSHOT_INTERVAL = float(os.getenv("BAR_SNAPSHOT_INTERVAL", "5"))
+
+
+def _trim_args() -> dict:
+    if STREAM_RETENTION_MS > 0:
+        return {"minid": int(time.time() * 1000) - STREAM_RETENTION_MS, "approximate": True}
+    return {"maxlen": STREAM_MAXLEN, "approximate": True}
+
+
+class StreamMetrics:
+    """Counter ringan untuk throughput, latensi ACK, dan error consumer."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.acked = 0
+        self.claimed = 0
+        self.invalid = 0
+        self.errors = 0
+        self.bars_written = 0
+        self.last_ack_latency_ms = 0.0
+        self.max_ack_latency_ms = 0.0
+        self.last_end_to_end_ms = 0.0
+        self._recent: deque = deque()
+
+    def record_ack(self, count: int, read_at: float, oldest_id: str) -> None:
+        now = time.time()
+        self.acked += count
+        self.last_ack_latency_ms = (now - read_at) * 1000
+        self.max_ack_latency_ms = max(self.max_ack_latency_ms, self.last_ack_latency_ms)
+        # ID stream = "<ms>-<seq>": umur pesan tertua sejak XADD sampai ACK
+        try:
+            self.last_end_to_end_ms = now * 1000 - int(oldest_id.split("-")[0])
+        except (ValueError, AttributeError):
+            pass
+        self._recent.append((now, count))
+        self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        while self._recent and self._recent[0][0] < now - THROUGHPUT_WINDOW:
+            self._recent.popleft()
+
+    def throughput(self) -> float:
+        now = time.time()
+        self._trim(now)
+        window = min(THROUGHPUT_WINDOW, max(now - self.started_at, 1e-6))
+        return sum(count for _, count in self._recent) / window
+
+    def snapshot(self) -> dict:
+        return {
+            "acked_total": self.acked,
+            "claimed_total": self.claimed,
+            "invalid_total": self.invalid,
+            "errors_total": self.errors,
+            "bars_written_total": self.bars_written,
+            "throughput_per_sec": round(self.throughput(), 2),
+            "last_ack_latency_ms": round(self.last_ack_latency_ms, 2),
+            "max_ack_latency_ms": round(self.max_ack_latency_ms, 2),
+            "last_end_to_end_ms": round(self.last_end_to_end_ms, 2),
+        }
 
 
 class StreamManager:
+    def __init__(self, consumer_name: str = CONSUMER_NAME):
+        self.consumer_name = consumer_name
+        self.batch_size = MIN_BATCH_SIZE
+        self.metrics = StreamMetrics()
+        self._window = asyncio.Semaphore(MAX_IN_FLIGHT_BATCHES)
+        self._in_flight: set = set()
+        self.aggregator = BarAggregator()
+        self._last_snapshot = 0.0
+        # Bar selesai & ID tick yang belum dipersist / di-ACK
+        self._completed: list = []
+        self._unacked: list = []
+        self._unacked_read_at = None
+        self._persist_lock = asyncio.Lock()
+
     async def publish_tick(self, symbol: str, price: float, volume: int):
         """
         Producer: Kirim data ke stream (sangat cepat, < 2ms)
         """
         data = {"symbol": symbol, "price": price, "volume": volume}
         # XADD key ID field string value string
-        await redis_client.xadd(STREAM_KEY, data)
+        await redis_client.xadd(STREAM_KEY, data, **_trim_args())
+
+    async def publish_ticks(self, ticks, stream: str = STREAM_KEY) -> int:
+        """
+        Producer batch: XADD dalam pipeline per PUBLISH_CHUNK_SIZE tick.
+        ``ticks``: iterable dict {symbol, price, volume}. Return jumlah terkirim.
+        """
+        sent = 0
+        chunk = []
+        for tick in ticks:
+            chunk.append(
+                {
+                    "symbol": tick["symbol"],
+                    "price": tick["price"],
+                    "volume": tick.get("volume") or 0,
+                }
+            )
+            if len(chunk) >= PUBLISH_CHUNK_SIZE:
+                sent += len(await redis_client.xadd_many(stream, chunk, **_trim_args()))
+                chunk = []
+        if chunk:
+            sent += len(await redis_client.xadd_many(stream, chunk, **_trim_args()))
+        return sent
 
     async def start_consumer(self):
         """
-        Consumer: Worker Background yang memproses data antrian
+        Consumer: Worker Background yang memproses data antrian.
+        Jalankan satu per proses; semua proses berbagi GROUP_NAME.
         """
         # 1. Buat Consumer Group (Hanya sekali)
         try:
             await redis_client.xgroup_create(STREAM_KEY, GROUP_NAME, mkstream=True)
-        except:
+        except Exception:
             pass  # Group sudah ada
 
-        print("🚀 Stream Consumer Started...")
+        logger.info("🚀 Stream Consumer Started: %s", self.consumer_name)
+        await self.restore_bars()
+        last_claim = 0.0
+
+        try:
+            while True:
+                try:
+                    # Tutup bar simbol yang berhenti mengirim tick
+                    await self.flush_bars(time.time())
+
+                    # 2. Ambil alih pesan pending dari consumer yang mati
+                    if time.monotonic() - last_claim >= CLAIM_INTERVAL:
+                        last_claim = time.monotonic()
+                        await self.recover_pending()
+
+                    # 3. Baca batch baru (XREADGROUP sudah block, tanpa sleep tambahan)
+                    await self._window.acquire()
+                    try:
+                        entries = await redis_client.xreadgroup(
+                            GROUP_NAME,
+                            self.consumer_name,
+                            {STREAM_KEY: ">"},
+                            count=self.batch_size,
+                            block=BLOCK_MS,
+                        )
+                    except BaseException:
+                        self._window.release()
+                        raise
+
+                    messages = [m for _stream, batch in entries or [] for m in batch]
+                    self._adapt_batch_size(len(messages))
+
+                    if not messages:
+                        self._window.release()
+                        continue
+
+                    # 4. Proses di background; window membatasi batch yang belum di-ACK
+                    task = asyncio.create_task(self._run_batch(messages, time.time()))
+                    self._in_flight.add(task)
+                    task.add_done_callback(self._in_flight.discard)
+
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.metrics.errors += 1
+                    logger.error("Stream Error: %s", e)
+                    await asyncio.sleep(1)
+        finally:
+            if self._in_flight:
+                await asyncio.wait(self._in_flight, timeout=5)
+            # Bar yang belum selesai disimpan sebagai fragmen partial, lalu ACK sisa tick
+            self._completed.extend(self.aggregator.flush_all())
+            await self.persist()
 
+    def _adapt_batch_size(self, received: int) -> None:
+        if received >= self.batch_size:
+            self.batch_size = min(self.batch_size * 2, MAX_BATCH_SIZE)
+        elif received < self.batch_size // 4:
+            self.batch_size = max(self.batch_size // 2, MIN_BATCH_SIZE)
+
+    async def _run_batch(self, messages, read_at: float):
+        try:
+            await self.process_messages(messages, read_at)
+        except Exception as e:
+            # Tidak di-ACK: pesan akan diambil ulang lewat XAUTOCLAIM
+            self.metrics.errors += 1
+            logger.error("Stream Batch Error: %s", e)
+        finally:
+            self._window.release()
+
+    async def recover_pending(self):
+        """XAUTOCLAIM pesan yang idle > CLAIM_MIN_IDLE_MS lalu proses ulang."""
+        start_id = "0-0"
         while True:
-            try:
-                # 2. Baca data dari stream
-                entries = await redis_client.xreadgroup(
-                    GROUP_NAME, CONSUMER_NAME, {STREAM_KEY: ">"}, count=10, block=2000
+            result = await redis_client.xautoclaim(
+                STREAM_KEY,
+                GROUP_NAME,
+                self.consumer_name,
+                CLAIM_MIN_IDLE_MS,
+                start_id=start_id,
+                count=self.batch_size,
+            )
+            if not result:
+                return
+            start_id, messages = result[0], result[1]
+            # Entry yang sudah dihapus dari stream dikembalikan sebagai None
+            messages = [m for m in messages if m and m[1]]
+            if messages:
+                self.metrics.claimed += len(messages)
+                logger.warning(
+                    "♻️ Reclaimed %d pending ticks for %s", len(messages), self.consumer_name
                 )
+                await self.process_messages(messages, time.time())
+            if start_id in ("0-0", b"0-0"):
+                return
+
+    async def process_messages(self, messages, read_at: float):
+        completed = []
+        batch_msg_ids = []
+
+        for message_id, data in messages:
+            batch_msg_ids.append(message_id)
+            try:
+                # Client Redis memakai decode_responses=True -> key berupa str
+                symbol = data["symbol"]
+                price = float(data["price"])
+                # Handle missing volume field gracefully just in case
+                volume = float(data.get("volume") or 0.0)
+                # Waktu tick = waktu XADD (ID stream "<ms>-<seq>")
+                ts = int(message_id.split("-")[0]) / 1000
+            except (KeyError, TypeError, ValueError, AttributeError):
+                # Pesan rusak tetap di-ACK agar tidak diklaim ulang selamanya
+                self.metrics.invalid += 1
+                continue
 
-                if not entries:
-                    await asyncio.sleep(0.1)
-                    continue
+            completed.extend(self.aggregator.add_tick(symbol, price, volume, ts))
 
-                batch_docs = []
-                batch_msg_ids = []
+        # 5. ACK ditunda sampai bar yang memuat tick ini dipersist (lihat persist)
+        self._completed.extend(completed)
+        self._unacked.extend(batch_msg_ids)
+        if self._unacked_read_at is None:
+            self._unacked_read_at = read_at
+        await self._publish_candles(completed, self.aggregator.pop_updates())
+        logger.debug("📥 Processed %d ticks, %d bars closed", len(batch_msg_ids), len(completed))
 
-                for stream, messages in entries:
-                    for message_id, data in messages:
-                        # 3. PROSES BERAT DI SINI (Simpan DB / Trigger AI)
-                        symbol = data[b"symbol"].decode("utf-8")
-                        price = float(data[b"price"])
+        if BAR_SNAPSHOT_INTERVAL <= 0:
+            await self.persist()
 
-                        # Handle missing volume field gracefully just in case
-                        volume_bytes = data.get(b"volume")
-                        volume = float(volume_bytes) if volume_bytes else 0.0
+    async def flush_bars(self, now: float):
+        """Tutup bar yang bucket-nya sudah lewat; persist tiap BAR_SNAPSHOT_INTERVAL."""
+        expired = self.aggregator.flush_expired(now)
+        self._completed.extend(expired)
+        await self._publish_candles(expired, [])
+
+        if now - self._last_snapshot >= BAR_SNAPSHOT_INTERVAL:
+            self._last_snapshot = now
+            await self.persist()
+
+    async def persist(self):
+        """
+        Tulis bar selesai + snapshot bar terbentuk, baru ACK tick yang sudah
+        tercakup. Tick yang sudah di-ACK selalu ada di Mongo (bar selesai atau
+        snapshot); yang belum diambil ulang lewat XAUTOCLAIM jika consumer crash.
+        """
+        async with self._persist_lock:
+            # Diambil tanpa await di antaranya: snapshot pasti memuat semua tick ``ids``
+            completed, self._completed = self._completed, []
+            ids, self._unacked = self._unacked, []
+            read_at, self._unacked_read_at = self._unacked_read_at, None
+            forming = self.aggregator.snapshot()
+
+            try:
+                await self._write_bars(completed)
+            except Exception:
+                self._completed[:0] = completed
+                self._requeue(ids, read_at)
+                raise
+            try:
+                await self.snapshot_bars(forming)
+            except Exception:
+                self._requeue(ids, read_at)
+                raise
 
-                        batch_docs.append({
-                            "symbol": symbol,
-                            "price": price,
-                            "volume": volume,
-                            "timestamp": datetime.now(timezone.utc)
-                        })
-                        batch_msg_ids.append(message_id)
+            if ids:
+                await redis_client.xack(STREAM_KEY, GROUP_NAME, *ids)
+                self.metrics.record_ack(len(ids), read_at, ids[0])
 
-                if batch_docs:
-                    # Simpan ke Mongo secara batch
-                    await db.market_data.insert_many(batch_docs)
+    def _requeue(self, ids, read_at) -> None:
+        self._unacked[:0] = ids
+        if read_at is not None:
+            self._unacked_read_at = read_at
 
-                    for doc in batch_docs:
-                        logger.info("📥 Processed: %s at %s", doc["symbol"], doc["price"])
+    async def restore_bars(self):
+        """Muat bar terbentuk dari snapshot consumer ini (tick-nya sudah di-ACK)."""
+        cursor = db.market_bars_live.find({"consumer": self.consumer_name})
+        docs = await cursor.to_list(length=None)
+        for doc in docs:
+            self.aggregator.restore(doc)
+        if docs:
+            logger.info("♻️ Restored %d forming bars for %s", len(docs), self.consumer_name)
 
-                    # 4. Acknowledge (Tandai sudah diproses) batch msg ids
-                    await redis_client.xack(STREAM_KEY, GROUP_NAME, *batch_msg_ids)
+    async def snapshot_bars(self, forming=None):
+        """
+        Upsert bar yang sedang terbentuk ke market_bars_live (satu doc per
+        simbol/timeframe per consumer); doc bar yang sudah tidak terbentuk dihapus.
+        """
+        if forming is None:
+            forming = self.aggregator.snapshot()
+        ops = [
+            UpdateOne(
+                {
+                    "symbol": bar["symbol"],
+                    "timeframe": bar["timeframe"],
+                    "consumer": self.consumer_name,
+                },
+                {"$set": {**bar, "consumer": self.consumer_name}},
+                upsert=True,
+            )
+            for bar in forming
+        ]
+        stale = {"consumer": self.consumer_name}
+        if forming:
+            stale["$nor"] = [{"symbol": b["symbol"], "timeframe": b["timeframe"]} for b in forming]
+        ops.append(DeleteMany(stale))
+        await db.market_bars_live.bulk_write(ops, ordered=False)
+
+    async def _publish_candles(self, closed, forming):
+        """Satu pipeline PUBLISH per batch: bar selesai lalu bar yang berubah."""
+        if not LIVE_CANDLES or not (closed or forming):
+            return
+        try:
+            batch = redis_client.batch()
+            for bars, is_closed in ((closed, True), (forming, False)):
+                for bar in bars:
+                    fragment = encode_fragment(bar, self.consumer_name, is_closed)
+                    batch.publish(
+                        candle_channel(bar["symbol"], bar["timeframe"]),
+                        json.dumps(fragment),
+                    )
+            await batch.execute()
+        except Exception as e:
+            # Streaming chart bersifat best-effort; jangan tahan ACK
+            logger.error("Live Candle Publish Error: %s", e)
+
+    async def _write_bars(self, bars):
+        if not bars:
+            return
+        await db.market_data.insert_many(bars, ordered=False)
+        self.metrics.bars_written += len(bars)
+
+    async def get_metrics(self) -> dict:
+        """Metrik consumer lokal + lag/pending grup dari Redis."""
+        group_info = {}
+        try:
+            for group in await redis_client.xinfo_groups(STREAM_KEY):
+                if group.get("name") == GROUP_NAME:
+                    group_info = {
+                        "consumers": group.get("consumers"),
+                        "pending": group.get("pending"),
+                        "lag": group.get("lag"),
+                    }
+        except Exception as e:
+            logger.error("Stream Metrics Error: %s", e)
+
+        return {
+            "consumer": self.consumer_name,
+            "batch_size": self.batch_size,
+            "in_flight_batches": len(self._in_flight),
+            **self.metrics.snapshot(),
+            "group": group_info,
+        }
+
+
+# Ukuran baca follower (XREAD tanpa consumer group)
+FOLLOW_READ_COUNT = 1000
+FOLLOW_BLOCK_MS = 1000
+
+
+async def follow_stream(handler, stream: str = STREAM_KEY) -> None:
+    """
+    Ikuti stream dengan XREAD biasa (bukan consumer group): setiap follower
+    melihat semua tick mulai saat dipanggil tanpa mengambil jatah consumer
+    bar. ``handler(messages)`` dipanggil per batch.
+    """
+    last_id = f"{int(time.time() * 1000)}-0"
+    while True:
+        try:
+            response = await redis_client.xread(
+                {stream: last_id}, count=FOLLOW_READ_COUNT, block=FOLLOW_BLOCK_MS
+            )
+            for _stream, messages in response or []:
+                if messages:
+                    last_id = messages[-1][0]
+                    await handler(messages)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Stream Follower Error (%s): %s", stream, e)
+            await asyncio.sleep(1)
 
-            except Exception as e:
-                logger.error("Stream Error: %s", e)
-                await asyncio.sleep(1)
 
+stream_manager = StreamManager()
@@ -13,25 +13,29 @@ CANDIDATE_DIR = "models/candidates"
 PRODUCTION_DIR = "models"
 
 
-def train_candidate(symbol, total_timesteps=20000, save_path=None):
+def train_on_frame(df, total_timesteps=20000):
+    """Latih PPO baru di atas DataFrame yang sudah di-enrich (tanpa simpan)."""
+    env = TradingEnv(df)
+    model = PPO("MlpPolicy", env, verbose=0, device=device)
+    model.learn(total_timesteps=total_timesteps)
+    return model
+
+
+def train_candidate(symbol, total_timesteps=20000, save_path=None, df=None):
     """
     Melatih model baru dan menyimpannya di folder 'models/candidates'.
-    Tidak langsung menimpa model live.
+    Tidak langsung menimpa model live. ``df`` (opsional) = data training yang
+    sudah di-enrich, misal data sebelum periode validasi out-of-sample.
     """
     try:
         # 1. Fetch Data (Cukup banyak untuk belajar, misal 2 tahun)
-        df = fetch_data(symbol, period="2y", interval="1h")
+        if df is None:
+            df = fetch_data(symbol, period="2y", interval="1h")
         if df.empty or len(df) < 500:
             return {"success": False, "error": "Data tidak cukup"}
 
-        # 2. Setup Environment
-        env = TradingEnv(df)
-
-        # 3. Setup Model (PPO)
-        model = PPO("MlpPolicy", env, verbose=0, device=device)
-
-        # 4. Training Loop
-        model.learn(total_timesteps=total_timesteps)
+        # 2-4. Environment, Model (PPO) & Training Loop
+        model = train_on_frame(df, total_timesteps)
 
         # 5. Save ke Folder KANDIDAT
         if save_path is None:
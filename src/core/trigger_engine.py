@@ -0,0 +1,295 @@
+import asyncio
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError
+
+from src.core.logger import logger
+from src.core.stream_manager import STREAM_KEY, follow_stream
+from src.database.database import signals_collection
+from src.database.redis_client import redis_client
+
+# Channel notifikasi "sinyal berubah" (payload: _id sinyal) dari producer
+SIGNAL_SYNC_CHANNEL = "signals:sync"
+ACTIVE_STATUSES = ("OPEN", "PENDING")
+# Batas dokumen saat rebuild dari Mongo
+REBUILD_LIMIT = 100_000
+# Simbol dengan tick lebih baru dari ini tidak perlu di-poll watcher
+LIVE_TICK_MAX_AGE = 60.0
+
+SIDE_ABOVE = "above"  # terpicu saat harga >= level
+SIDE_BELOW = "below"  # terpicu saat harga <= level
+
+
+class LevelBook:
+    """
+    Level harga satu simbol dalam dua list terurut. ``above`` berisi level
+    yang terpicu saat harga naik (TP BUY, SL SELL, limit SELL), ``below``
+    level yang terpicu saat harga turun (SL BUY, TP SELL, limit BUY).
+    Satu tick = dua bisect, O(log n + k).
+    """
+
+    def __init__(self):
+        self.prices = {SIDE_ABOVE: [], SIDE_BELOW: []}
+        self.ids = {SIDE_ABOVE: [], SIDE_BELOW: []}
+
+    def __len__(self) -> int:
+        return len(self.prices[SIDE_ABOVE]) + len(self.prices[SIDE_BELOW])
+
+    def add(self, side: str, level: float, sig_id) -> None:
+        i = bisect_right(self.prices[side], level)
+        self.prices[side].insert(i, level)
+        self.ids[side].insert(i, sig_id)
+
+    def remove(self, side: str, level: float, sig_id) -> None:
+        prices, ids = self.prices[side], self.ids[side]
+        i = bisect_left(prices, level)
+        while i < len(prices) and prices[i] == level:
+            if ids[i] == sig_id:
+                del prices[i], ids[i]
+                return
+            i += 1
+
+    def triggered(self, low: float, high: float) -> List:
+        """ID sinyal yang levelnya tersentuh oleh range [low, high]."""
+        above = self.ids[SIDE_ABOVE][: bisect_right(self.prices[SIDE_ABOVE], high)]
+        below = self.ids[SIDE_BELOW][bisect_left(self.prices[SIDE_BELOW], low):]
+        return above + below
+
+
+def signal_levels(sig: dict) -> List[tuple]:
+    """Level (side, harga) yang harus dipantau untuk satu sinyal aktif."""
+    is_buy = "BUY" in sig.get("action", "").upper()
+    if sig.get("status") == "PENDING":
+        entry = sig.get("price")
+        if entry is None:
+            return []
+        return [(SIDE_BELOW if is_buy else SIDE_ABOVE, float(entry))]
+
+    levels = []
+    if sig.get("tp") is not None:
+        levels.append((SIDE_ABOVE if is_buy else SIDE_BELOW, float(sig["tp"])))
+    if sig.get("sl") is not None:
+        levels.append((SIDE_BELOW if is_buy else SIDE_ABOVE, float(sig["sl"])))
+    return levels
+
+
+class TriggerEngine:
+    """
+    Indeks in-memory semua sinyal OPEN/PENDING, dipicu langsung oleh tick dari
+    ``market_ticks_stream``. ``evaluate(sig, curr, now)`` menentukan transisi
+    (UpdateOne atau None) — dipakai fungsi yang sama dengan polling watcher.
+    """
+
+    def __init__(self, evaluate: Callable[[dict, dict, datetime], Any]):
+        self.evaluate = evaluate
+        self.books: Dict[str, LevelBook] = defaultdict(LevelBook)
+        self.signals: Dict[Any, dict] = {}
+        self.last_tick: Dict[str, float] = {}
+        self.fills = 0
+        self.closes = 0
+
+    def __len__(self) -> int:
+        return len(self.signals)
+
+    # --- Sinkronisasi indeks ---
+    def add(self, sig: dict) -> None:
+        self.discard(sig["_id"])
+        if sig.get("status") not in ACTIVE_STATUSES:
+            return
+        levels = signal_levels(sig)
+        if not levels:
+            return
+        book = self.books[sig["symbol"]]
+        for side, level in levels:
+            book.add(side, level, sig["_id"])
+        self.signals[sig["_id"]] = sig
+
+    def discard(self, sig_id) -> None:
+        sig = self.signals.pop(sig_id, None)
+        if sig is None:
+            return
+        book = self.books[sig["symbol"]]
+        for side, level in signal_levels(sig):
+            book.remove(side, level, sig_id)
+        if not len(book):
+            del self.books[sig["symbol"]]
+
+    def load(self, signals) -> None:
+        self.books = defaultdict(LevelBook)
+        self.signals = {}
+        for sig in signals:
+            self.add(sig)
+
+    async def rebuild(self) -> int:
+        """Bangun ulang indeks dari semua sinyal OPEN/PENDING di Mongo."""
+        cursor = signals_collection.find({"status": {"$in": list(ACTIVE_STATUSES)}})
+        self.load(await cursor.to_list(length=REBUILD_LIMIT))
+        logger.info(
+            "🎯 Trigger index rebuilt: %d signals on %d symbols",
+            len(self.signals),
+            len(self.books),
+        )
+        return len(self.signals)
+
+    async def sync_signal(self, sig_id) -> None:
+        """Muat ulang satu sinyal (insert/close dari proses lain)."""
+        sig = await signals_collection.find_one({"_id": sig_id})
+        if sig is None:
+            self.discard(sig_id)
+        else:
+            self.add(sig)
+
+    def transition(self, sig: dict, now: datetime) -> None:
+        """Terapkan transisi yang sudah diputuskan ``evaluate`` ke indeks."""
+        self.discard(sig["_id"])
+        if sig["status"] == "PENDING":
+            # Limit terisi -> pantau TP/SL sebagai posisi OPEN
+            self.fills += 1
+            self.add({**sig, "status": "OPEN", "opened_at": now, "fill_price": sig["price"]})
+        else:
+            self.closes += 1
+
+    def is_live(self, symbol: str, max_age: float = LIVE_TICK_MAX_AGE) -> bool:
+        seen = self.last_tick.get(symbol)
+        return seen is not None and time.monotonic() - seen < max_age
+
+    def revert(self, pairs) -> None:
+        """Kembalikan indeks ke state sebelum transisi yang gagal ditulis."""
+        restored = set()
+        for sig, _op in pairs:
+            # Pair pertama per sinyal = state terakhir yang masih sesuai Mongo
+            if sig["_id"] not in restored:
+                restored.add(sig["_id"])
+                self.add(sig)
+
+    async def write(self, pairs, ordered: bool) -> int:
+        """
+        Tulis pasangan ``(sig, op)`` hasil transisi. Op yang tidak terkonfirmasi
+        di-revert dari indeks supaya dipicu ulang tick berikutnya; update
+        ber-filter status sehingga evaluasi ulang aman (idempotent).
+        """
+        if not pairs:
+            return 0
+        ops = [op for _sig, op in pairs]
+        try:
+            result = await signals_collection.bulk_write(ops, ordered=ordered)
+            return result.modified_count
+        except BulkWriteError as e:
+            failed = sorted(err["index"] for err in e.details.get("writeErrors", []))
+            if not failed:
+                failed = range(len(pairs))  # write concern error: status tidak pasti
+            elif ordered:
+                failed = range(failed[0], len(pairs))  # op setelah error tidak dijalankan
+            logger.error("Signal Transition Write Error (%d failed): %s", len(failed), e)
+            self.revert([pairs[i] for i in failed])
+            return e.details.get("nModified", 0)
+        except Exception as e:
+            logger.error("Signal Transition Write Error: %s", e)
+            self.revert(pairs)
+            return 0
+
+    # --- Pemrosesan tick ---
+    def _trigger(self, symbol: str, price: float, now: datetime) -> list:
+        """Transisi ``(sig, op)`` untuk order yang terpicu oleh tick ini."""
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+
+        curr = {"Close": price, "High": price, "Low": price}
+        pairs = []
+        for sig_id in book.triggered(price, price):
+            sig = self.signals.get(sig_id)
+            if sig is None:
+                continue  # sudah diproses lewat level lain pada tick yang sama
+            op = self.evaluate(sig, curr, now)
+            if op is None:
+                # Data sinyal tidak lengkap: jangan dipicu ulang tiap tick
+                self.discard(sig_id)
+                continue
+            pairs.append((sig, op))
+            self.transition(sig, now)
+        return pairs
+
+    def on_tick(self, symbol: str, price: float, now: Optional[datetime] = None) -> list:
+        """Return list UpdateOne untuk order yang terpicu oleh tick ini."""
+        now = now or datetime.now(timezone.utc)
+        return [op for _sig, op in self._trigger(symbol, price, now)]
+
+    async def process_messages(self, messages) -> int:
+        pairs = []
+        now = datetime.now(timezone.utc)
+        seen_at = time.monotonic()
+        for _message_id, data in messages:
+            try:
+                symbol = data["symbol"]
+                price = float(data["price"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            self.last_tick[symbol] = seen_at
+            pairs.extend(self._trigger(symbol, price, now))
+
+        if pairs:
+            # ordered=True: fill lalu close sinyal yang sama dalam satu batch
+            modified = await self.write(pairs, ordered=True)
+            logger.info("⚡ Trigger engine applied %d transitions", modified)
+        return len(pairs)
+
+    async def consume_ticks(self, stream: str = STREAM_KEY) -> None:
+        """
+        Semua watcher melihat semua tick (``follow_stream``). Update ber-filter
+        status, jadi aman bila dua watcher memicu sinyal yang sama.
+        """
+        await follow_stream(self.process_messages, stream)
+
+    async def listen_sync(self) -> None:
+        """Subscribe SIGNAL_SYNC_CHANNEL lalu rebuild (tidak ada insert yang terlewat)."""
+        while True:
+            pubsub = None
+            try:
+                await redis_client.connect()
+                redis_conn = redis_client.redis
+                if not redis_conn:
+                    await asyncio.sleep(1)
+                    continue
+
+                pubsub = redis_conn.pubsub()
+                await pubsub.subscribe(SIGNAL_SYNC_CHANNEL)
+                await self.rebuild()
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        await self.sync_signal(ObjectId(message["data"]))
+                    except InvalidId:
+                        logger.warning("Invalid signal id on %s: %r", SIGNAL_SYNC_CHANNEL, message["data"])
+                    except Exception as e:
+                        logger.error("Trigger Engine Sync Error: %s", e)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Trigger Engine Sync Listener Error: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    async def run(self) -> None:
+        await asyncio.gather(self.listen_sync(), self.consume_ticks())
+
+
+async def notify_signal_changed(sig_id) -> None:
+    """Beritahu trigger engine (proses watcher) bahwa sinyal berubah."""
+    try:
+        await redis_client.publish(SIGNAL_SYNC_CHANNEL, str(sig_id))
+    except Exception as e:
+        logger.error("Signal Sync Publish Error: %s", e)
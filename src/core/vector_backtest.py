@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+# Kolom yang bukan fitur model (sama dengan TradingEnv)
+EXCLUDE_COLS = ["timestamp", "date", "symbol", "target"]
+# Observasi per forward pass policy (batas memori untuk data panjang)
+PREDICT_BATCH_SIZE = 4096
+# Nilai profit factor jika tidak ada trade rugi
+PROFIT_FACTOR_CAP = 999
+
+ACTION_HOLD, ACTION_BUY, ACTION_SELL = 0, 1, 2
+
+
+def feature_columns(df: pd.DataFrame) -> list:
+    return [c for c in df.columns if c not in EXCLUDE_COLS]
+
+
+def observation_matrix(df: pd.DataFrame, feature_cols=None) -> np.ndarray:
+    """Seluruh observasi (n_bar x n_fitur) dibangun sekali."""
+    return df[feature_cols or feature_columns(df)].to_numpy(dtype=np.float32)
+
+
+def predict_actions(model, obs: np.ndarray, batch_size: int = PREDICT_BATCH_SIZE) -> np.ndarray:
+    """Aksi deterministik untuk semua bar dengan forward pass ber-batch."""
+    actions = np.empty(len(obs), dtype=np.int64)
+    for start in range(0, len(obs), batch_size):
+        chunk, _ = model.predict(obs[start : start + batch_size], deterministic=True)
+        actions[start : start + batch_size] = np.asarray(chunk).reshape(-1)
+    return actions
+
+
+def predict_with_confidence(model, obs: np.ndarray, batch_size: int = PREDICT_BATCH_SIZE):
+    """
+    Aksi deterministik + confidence (probabilitas aksi terpilih x 100) dari
+    distribusi policy, satu forward pass per batch. Model tanpa distribusi
+    (bukan policy SB3) mendapat confidence 100.
+    """
+    policy = getattr(model, "policy", None)
+    if policy is None or not hasattr(policy, "get_distribution"):
+        actions = predict_actions(model, obs, batch_size)
+        return actions, np.full(len(obs), 100.0)
+
+    import torch
+
+    probs = np.empty((len(obs), model.action_space.n), dtype=np.float64)
+    with torch.no_grad():
+        for start in range(0, len(obs), batch_size):
+            obs_tensor, _ = policy.obs_to_tensor(obs[start : start + batch_size])
+            dist = policy.get_distribution(obs_tensor)
+            probs[start : start + batch_size] = dist.distribution.probs.cpu().numpy()
+    return probs.argmax(axis=1), probs.max(axis=1) * 100
+
+
+def equity_from_trades(n_bars: int, exits: np.ndarray, pnl: np.ndarray, initial_balance: float) -> np.ndarray:
+    """Saldo realized per bar (PnL dibukukan di bar exit)."""
+    realized = np.zeros(n_bars)
+    np.add.at(realized, exits, pnl)
+    return initial_balance + np.cumsum(realized)
+
+
+def summarize(equity: np.ndarray, pnl: np.ndarray, initial_balance: float, final_balance=None) -> dict:
+    """Metrik ringkasan dari kurva equity dan PnL per trade (vektor)."""
+    if final_balance is None:
+        final_balance = equity[-1] if len(equity) else initial_balance
+    final_balance = float(final_balance)
+    total_trades = len(pnl)
+    wins = int((pnl > 0).sum())
+    gross_profit = float(pnl[pnl > 0].sum())
+    gross_loss = abs(float(pnl[pnl < 0].sum()))
+
+    max_drawdown = 0.0
+    if len(equity):
+        peak = np.maximum.accumulate(equity)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drawdown = np.where(peak > 0, (equity - peak) / peak * 100, 0.0)
+        max_drawdown = min(float(drawdown.min()), 0.0)
+
+    total_return = final_balance - initial_balance
+    return {
+        "final_balance": round(final_balance, 2),
+        "total_return": round(total_return, 2),
+        "total_return_percent": round(total_return / initial_balance * 100, 2),
+        "win_rate": round(wins / total_trades * 100, 2) if total_trades else 0.0,
+        "total_trades": int(total_trades),
+        "profit_factor": round(gross_profit / gross_loss, 2) if gross_loss > 0 else PROFIT_FACTOR_CAP,
+        "max_drawdown": abs(round(max_drawdown, 2)),
+    }
+
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.core.backtest_cache import data_fingerprint
+from src.core.execution import EXECUTION_VERSION, run_execution_backtest
+from src.core.logger import logger
+from src.core.vector_backtest import feature_columns, observation_matrix, predict_actions, summarize
+
+# Hasil per fold disimpan per simbol (JSON), dipakai ulang antar run
+WALK_FORWARD_DIR = os.path.join("data", "walk_forward")
+# Satu fold out-of-sample = satu periode kalender (bulan); bar baru hanya mengubah fold terakhir
+TEST_FREQ = "M"
+# Bar sebelum fold yang dipakai untuk melatih model fold tersebut
+TRAIN_BARS = 2000
+MAX_FOLDS = 6
+# Fold (biasanya periode berjalan) dengan bar lebih sedikit belum dievaluasi
+MIN_TEST_BARS = 20
+# Syarat promosi: minimal sekian fraksi fold untung
+MIN_PROFITABLE_FOLDS = 0.5
+
+
+def fold_windows(index: pd.DatetimeIndex, train_bars: int = TRAIN_BARS, freq: str = TEST_FREQ, max_folds: int = MAX_FOLDS) -> list:
+    """
+    Window rolling [(train_start, test_start, test_end)] dalam posisi bar.
+    Test = satu periode kalender, train = ``train_bars`` bar tepat sebelumnya.
+    """
+    if len(index) == 0:
+        return []
+    periods = np.asarray(index.to_period(freq).astype(str))
+    starts = np.flatnonzero(periods[1:] != periods[:-1]) + 1
+    bounds = [0, *starts.tolist(), len(index)]
+
+    folds = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if start < train_bars or end - start < MIN_TEST_BARS:
+            continue
+        folds.append((start - train_bars, start, end))
+    return folds[-max_folds:]
+
+
+def oos_start(index: pd.DatetimeIndex, train_bars: int = TRAIN_BARS, freq: str = TEST_FREQ, max_folds: int = MAX_FOLDS):
+    """
+    Posisi bar awal fold out-of-sample pertama (None jika tidak ada fold).
+    Model kandidat dilatih hanya dengan data sebelum posisi ini.
+    """
+    folds = fold_windows(index, min(train_bars, len(index) // 2), freq, max_folds)
+    return folds[0][1] if folds else None
+
+
+def fold_key(df: pd.DataFrame, window: tuple, symbol: str, config: dict) -> str:
+    """Key fold: fingerprint slice train+test dan konfigurasi evaluasi."""
+    train_start, test_start, test_end = window
+    raw = json.dumps(
+        [
+            data_fingerprint(df.iloc[train_start:test_start], symbol, "train"),
+            data_fingerprint(df.iloc[test_start:test_end], symbol, "test"),
+            config,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def evaluate_fold(test_df: pd.DataFrame, model, info: dict, initial_balance: float) -> dict:
+    """Backtest vektor satu fold out-of-sample (model eksekusi sama dengan /backtest/run)."""
+    obs = observation_matrix(test_df)
+    if obs.shape[1] != model.observation_space.shape[0]:
+        raise ValueError(
+            f"Model mismatch: expects {model.observation_space.shape[0]} features, got {obs.shape[1]}"
+        )
+    sim = run_execution_backtest(
+        test_df["High"].to_numpy(dtype=float),
+        test_df["Low"].to_numpy(dtype=float),
+        test_df["Close"].to_numpy(dtype=float),
+        test_df["ATR_14"].to_numpy(dtype=float),
+        predict_actions(model, obs),
+        info,
+        initial_balance,
+        sma20=test_df["SMA_20"].to_numpy(dtype=float) if "SMA_20" in test_df.columns else None,
+    )
+    return {
+        "start": str(test_df.index[0]),
+        "end": str(test_df.index[-1]),
+        "bars": len(test_df),
+        **sim["stats"],
+        "pnl": sim["pnl"].tolist(),
+        # Saldo relatif per bar, untuk merangkai equity semua fold
+        "curve": (sim["balance"] - initial_balance).round(2).tolist(),
+    }
+
+
+def _cache_path(symbol: str, cache_dir: str, config: dict) -> str:
+    # Satu file per simbol + konfigurasi agar mode/model lain tidak saling menimpa
+    safe = "".join(c for c in symbol if c.isalnum() or c in "._")
+    digest = hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:10]
+    return os.path.join(cache_dir, f"{safe}_{digest}.json")
+
+
+def _load_cache(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path: str, folds: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(folds, f)
+    os.replace(tmp, path)
+
+
+def aggregate_folds(folds: list, initial_balance: float) -> dict:
+    """Equity out-of-sample berantai (fold demi fold) -> metrik gabungan."""
+    curves, pnls, offset = [], [], 0.0
+    for fold in folds:
+        curve = np.asarray(fold["curve"], dtype=float)
+        curves.append(curve + offset)
+        pnls.append(np.asarray(fold["pnl"], dtype=float))
+        if len(curve):
+            offset += curve[-1]
+    equity = initial_balance + (np.concatenate(curves) if curves else np.array([]))
+    pnl = np.concatenate(pnls) if pnls else np.array([])
+    stats = summarize(np.round(equity, 2), pnl, initial_balance)
+    profitable = sum(1 for f in folds if f["total_return"] > 0)
+    stats["folds"] = len(folds)
+    stats["profitable_folds"] = round(profitable / len(folds), 2) if folds else 0.0
+    return stats
+
+
+def run_walk_forward(
+    df: pd.DataFrame,
+    info: dict,
+    symbol: str,
+    train_fn=None,
+    model=None,
+    config: dict = None,
+    initial_balance: float = 100000000,
+    train_bars: int = TRAIN_BARS,
+    freq: str = TEST_FREQ,
+    max_folds: int = MAX_FOLDS,
+    cache_dir: str = WALK_FORWARD_DIR,
+) -> dict:
+    """
+    Walk-forward: tiap fold dilatih ulang lewat ``train_fn(train_df)`` (atau
+    memakai ``model`` tetap) lalu dievaluasi out-of-sample dengan policy
+    vektor. Hasil fold di-cache per fingerprint data + ``config`` sehingga
+    data yang bertambah hanya menghitung fold terbaru.
+
+    ``config`` wajib membedakan model/pelatihan (misal hash model atau
+    timesteps); ikut menjadi bagian key cache.
+    """
+    if (train_fn is None) == (model is None):
+        raise ValueError("Isi salah satu: train_fn atau model")
+
+    config = {
+        **(config or {}),
+        "features": feature_columns(df),
+        "balance": initial_balance,
+        "lot_multiplier": info.get("lot_multiplier"),
+        "type": info.get("type"),
+        "execution": EXECUTION_VERSION,
+    }
+    # Riwayat pendek (misal crypto, fetch dibatasi 2000 bar): train maksimal
+    # separuh data agar tetap ada fold out-of-sample
+    train_bars = min(train_bars, len(df) // 2)
+    path = _cache_path(symbol, cache_dir, config)
+    cached = _load_cache(path)
+    results, fresh, computed = [], {}, 0
+
+    for window in fold_windows(df.index, train_bars, freq, max_folds):
+        key = fold_key(df, window, symbol, config)
+        fold = cached.get(key)
+        if fold is None:
+            train_start, test_start, test_end = window
+            fold_model = model if model is not None else train_fn(df.iloc[train_start:test_start])
+            fold = evaluate_fold(df.iloc[test_start:test_end], fold_model, info, initial_balance)
+            computed += 1
+        fresh[key] = fold
+        results.append(fold)
+
+    # Simpan hanya fold yang masih relevan (fold lama otomatis terbuang)
+    _save_cache(path, fresh)
+    logger.info(
+        "🚶 Walk-forward %s: %d fold (%d baru, %d cache)", symbol, len(results), computed, len(results) - computed
+    )
+
+    return {
+        "symbol": symbol,
+        "stats": aggregate_folds(results, initial_balance),
+        "folds": [{k: v for k, v in f.items() if k not in ("pnl", "curve")} for f in results],
+        # PnL trade out-of-sample berurutan (untuk bootstrap Monte Carlo)
+        "pnl": [p for f in results for p in f["pnl"]],
+        "computed": computed,
+        "cached": len(results) - computed,
+    }
+
+
+def passes_walk_forward(report: dict, min_profitable: float = MIN_PROFITABLE_FOLDS) -> bool:
+    """Gate promosi: return OOS gabungan positif dan cukup banyak fold untung."""
+    stats = report["stats"]
+    return stats["folds"] > 0 and stats["total_return"] > 0 and stats["profitable_folds"] >= min_profitable
@@ -1,40 +1,275 @@
-from typing import Any, Optional
+import asyncio
+import inspect
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
 
 import msgpack
 
+from src.core.logger import logger
 from src.database.redis_client import redis_client
 
+# Channel Pub/Sub untuk invalidasi L1 di semua proses/node
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+L1_MAX_ITEMS = int(os.getenv("CACHE_L1_MAX_ITEMS", "10000"))
+# Batas atas umur entry L1, jaga-jaga jika pesan invalidasi terlewat
+L1_MAX_TTL = int(os.getenv("CACHE_L1_MAX_TTL", "60"))
+
+# Berapa lama nilai basi (stale) boleh disajikan sambil di-refresh di background
+DEFAULT_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "300"))
+# Faktor XFetch: >1 refresh lebih awal, <1 lebih dekat ke batas expiry
+EARLY_REFRESH_BETA = float(os.getenv("CACHE_EARLY_REFRESH_BETA", "1.0"))
+# Lock recompute lintas proses (ms) & interval polling saat menunggu pemegang lock
+RECOMPUTE_LOCK_MS = 10_000
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    Cache in-process (L1) dengan TTL per entry dan eviksi LRU.
+    Nilai disimpan sebagai object Python, jadi caller tidak boleh memutasinya.
+    """
+
+    def __init__(self, max_items: int = L1_MAX_ITEMS, max_ttl: int = L1_MAX_TTL):
+        self.max_items = max_items
+        self.max_ttl = max_ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+local_cache = LocalCache()
+
 
 class SmartCache:
+    """
+    Cache dua tingkat:
+    - L1: memory proses (LocalCache), tanpa network.
+    - L2: Redis (koneksi biner), menyimpan bytes MessagePack apa adanya.
+    """
+
     @staticmethod
     async def set(key: str, data: Any, ttl: int = 3600):
         """
-        Simpan data ke Redis dalam format Binary (MessagePack).
+        Simpan data ke Redis dalam format Binary (MessagePack), lalu beri tahu
+        proses lain untuk membuang L1 (nilai lama) seperti pada ``delete``.
         """
         try:
             # Serialize: Object -> Binary
             packed_data = msgpack.packb(data, use_bin_type=True)
             if packed_data:
-                await redis_client.set(key, packed_data.hex(), ex=ttl)
+                await redis_client.set_bytes(key, packed_data, ex=ttl)
+                await redis_client.publish(INVALIDATION_CHANNEL, key)
+                local_cache.set(key, data, ttl)
         except Exception as e:
-            print(f"Cache Set Error: {e}")
+            logger.error("Cache Set Error: %s", e)
 
     @staticmethod
     async def get(key: str) -> Optional[Any]:
         """
-        Ambil data binary dari Redis dan kembalikan ke Object asli.
+        Ambil data dari L1, fallback ke Redis (L2) lalu isi ulang L1.
         """
+        value = local_cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
         try:
-            packed_data = await redis_client.get(key)
+            packed_data = await redis_client.get_bytes(key)
             if not packed_data:
                 return None
 
             # Deserialize: Binary -> Object
-            return msgpack.unpackb(bytes.fromhex(packed_data), raw=False)
+            value = msgpack.unpackb(packed_data, raw=False)
         except Exception as e:
-            print(f"Cache Get Error: {e}")
+            logger.error("Cache Get Error: %s", e)
             return None
 
+        # Umur L1 dibatasi L1_MAX_TTL; perubahan eksplisit datang lewat pub/sub
+        local_cache.set(key, value, L1_MAX_TTL)
+        return value
+
+    @staticmethod
+    async def get_or_compute(
+        key: str,
+        ttl: int,
+        fn: Callable[[], Any],
+        stale_ttl: int = DEFAULT_STALE_TTL,
+        beta: float = EARLY_REFRESH_BETA,
+    ) -> Any:
+        """
+        Ambil nilai dari cache atau hitung dengan ``fn`` (sync/async).
+
+        - Probabilistic early refresh (XFetch): makin dekat ke expiry, makin
+          besar peluang satu request memicu refresh lebih awal.
+        - Setelah ``ttl`` lewat, nilai lama tetap disajikan hingga ``stale_ttl``
+          detik sementara refresh berjalan di background.
+        - Hanya satu pemanggil per key yang menjalankan ``fn`` (lock lokal +
+          lock Redis lintas proses).
+
+        Hasil ``None`` tidak di-cache.
+        """
+        envelope = await SmartCache._get_envelope(key)
+        if envelope is not None:
+            if not _should_refresh(envelope, beta):
+                return envelope["v"]
+            # Early refresh atau stale: sajikan nilai sekarang, rebuild di background
+            _start_refresh(key, ttl, fn, stale_ttl, wait_for_peer=False)
+            return envelope["v"]
+
+        task = _start_refresh(key, ttl, fn, stale_ttl, wait_for_peer=True)
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _get_envelope(key: str) -> Optional[Dict[str, Any]]:
+        envelope = await SmartCache.get(key)
+        if isinstance(envelope, dict) and {"v", "d", "e"} <= envelope.keys():
+            return envelope
+        return None
+
     @staticmethod
     async def delete(key: str):
-        await redis_client.delete(key)
+        """Hapus dari L1 & L2, lalu beri tahu proses lain untuk membuang L1."""
+        local_cache.pop(key)
+        batch = redis_client.batch()
+        batch.delete(key)
+        batch.publish(INVALIDATION_CHANNEL, key)
+        await batch.execute()
+
+
+# Refresh yang sedang berjalan per key (single-flight dalam proses ini)
+_inflight: Dict[str, "asyncio.Task[Any]"] = {}
+
+
+def _should_refresh(envelope: Dict[str, Any], beta: float) -> bool:
+    """XFetch: refresh jika now - delta * beta * ln(rand) >= expiry."""
+    jitter = -envelope["d"] * beta * math.log(random.random() or 1e-12)
+    return time.time() + jitter >= envelope["e"]
+
+
+def _start_refresh(
+    key: str, ttl: int, fn: Callable[[], Any], stale_ttl: int, wait_for_peer: bool
+) -> "asyncio.Task[Any]":
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_refresh(key, ttl, fn, stale_ttl, wait_for_peer))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _on_refresh_done(key, t))
+    return task
+
+
+def _on_refresh_done(key: str, task: "asyncio.Task[Any]") -> None:
+    _inflight.pop(key, None)
+    # Refresh background tidak di-await siapa pun; ambil exception agar tidak bocor
+    if not task.cancelled():
+        task.exception()
+
+
+async def _call(fn: Callable[[], Any]) -> Any:
+    result = fn()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def _refresh(
+    key: str, ttl: int, fn: Callable[[], Any], stale_ttl: int, wait_for_peer: bool
+) -> Any:
+    lock_key = f"lock:{key}"
+    token = f"{os.getpid()}:{id(asyncio.current_task())}"
+    try:
+        acquired = await redis_client.set(
+            lock_key, token, nx=True, px=RECOMPUTE_LOCK_MS
+        )
+    except Exception as e:
+        logger.error("Cache Lock Error: %s", e)
+        acquired = True  # Redis bermasalah: tetap hitung lokal
+
+    if not acquired:
+        if not wait_for_peer:
+            # Proses lain sedang me-refresh; buang L1 agar hasilnya terbaca dari L2
+            local_cache.pop(key)
+            return None
+        # Cache miss: tunggu hasil dari pemegang lock sebelum menghitung sendiri
+        deadline = time.monotonic() + RECOMPUTE_LOCK_MS / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            envelope = await SmartCache._get_envelope(key)
+            if envelope is not None:
+                return envelope["v"]
+
+    try:
+        if acquired:
+            # L1 bisa tertinggal dari node lain yang baru saja me-refresh
+            local_cache.pop(key)
+            envelope = await SmartCache._get_envelope(key)
+            if envelope is not None and envelope["e"] > time.time():
+                return envelope["v"]
+
+        started = time.monotonic()
+        value = await _call(fn)
+        delta = time.monotonic() - started
+        if value is not None:
+            envelope = {"v": value, "d": delta, "e": time.time() + ttl}
+            await SmartCache.set(key, envelope, ttl=ttl + stale_ttl)
+        return value
+    except Exception as e:
+        logger.error("Cache Compute Error (%s): %s", key, e)
+        raise
+    finally:
+        if acquired:
+            try:
+                # Atomik: lock yang sudah expire & diambil proses lain tidak ikut terhapus
+                await redis_client.release_lock(lock_key, token)
+            except Exception:
+                pass
+
+
+async def cache_invalidation_task():
+    """
+    Mendengarkan channel invalidasi dan membuang entry L1 yang sesuai.
+    Dijalankan sekali per proses (lihat lifespan di main.py).
+    """
+    await redis_client.connect()
+    redis_conn = redis_client.redis
+    if redis_conn:
+        pubsub = redis_conn.pubsub()
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+
+        logger.info("🎧 Cache Invalidation Listener Started")
+
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                local_cache.pop(message["data"])
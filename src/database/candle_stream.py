@@ -0,0 +1,122 @@
+import json
+import time
+from typing import Dict, List, Optional
+
+from src.core.bar_aggregator import CANDLE_CHANNEL_PREFIX, TIMEFRAMES, recent_bars_pipeline
+from src.database.database import db
+
+# Jumlah bar default / maksimal pada snapshot awal
+DEFAULT_SNAPSHOT_BARS = 300
+MAX_SNAPSHOT_BARS = 1000
+
+
+def candle_topic(symbol: str, timeframe: str) -> str:
+    """Topik langganan WebSocket == nama channel Redis fragmen bar."""
+    return f"{CANDLE_CHANNEL_PREFIX}{symbol}:{timeframe}"
+
+
+def parse_topic(topic: str):
+    symbol, _, timeframe = topic[len(CANDLE_CHANNEL_PREFIX):].rpartition(":")
+    return symbol, timeframe
+
+
+class LiveCandle:
+    """
+    Bar yang sedang terbentuk untuk satu simbol/timeframe, digabung dari
+    fragmen tiap consumer stream (aturan sama dengan ``bars_pipeline``).
+    """
+
+    def __init__(self):
+        self.bucket: Optional[int] = None
+        self.emitted = False
+        self._fragments: Dict[str, list] = {}
+
+    def merged(self) -> list:
+        frags = list(self._fragments.values())
+        first = min(frags, key=lambda f: f[7])
+        last = max(frags, key=lambda f: f[8])
+        return [
+            self.bucket,
+            first[2],
+            max(f[3] for f in frags),
+            min(f[4] for f in frags),
+            last[5],
+            sum(f[6] for f in frags),
+        ]
+
+    def apply(self, fragment: list) -> List[tuple]:
+        """Return list (jenis, bar): "u" = bar terbentuk berubah, "c" = bar selesai."""
+        consumer, bucket, closed = fragment[0], fragment[1], fragment[9]
+        events = []
+        if self.bucket is None or bucket > self.bucket:
+            if self.bucket is not None and self._fragments and not self.emitted:
+                events.append(("c", self.merged()))
+            self.bucket, self.emitted, self._fragments = bucket, False, {}
+        elif bucket < self.bucket or self.emitted:
+            # Fragmen terlambat: sudah tersimpan di market_data, abaikan untuk live
+            return events
+
+        self._fragments[consumer] = fragment
+        if all(f[9] for f in self._fragments.values()) and closed:
+            events.append(("c", self.merged()))
+            self.emitted = True
+        else:
+            events.append(("u", self.merged()))
+        return events
+
+
+# topic -> LiveCandle (hanya untuk topik yang punya pendengar di node ini)
+live_candles: Dict[str, LiveCandle] = {}
+
+
+def apply_fragment(topic: str, raw: str) -> List[tuple]:
+    """Terapkan fragmen dari Redis; return list (key, teks) siap kirim."""
+    symbol, timeframe = parse_topic(topic)
+    candle = live_candles.setdefault(topic, LiveCandle())
+    messages = []
+    for kind, bar in candle.apply(json.loads(raw)):
+        text = json.dumps([kind, symbol, timeframe, *bar])
+        # Update bar terbentuk boleh di-coalesce; bar selesai tidak boleh hilang
+        key = topic if kind == "u" else f"{topic}:c:{bar[0]}"
+        messages.append((key, text))
+    return messages
+
+
+async def load_snapshot(symbol: str, timeframe: str, limit: int = DEFAULT_SNAPSHOT_BARS) -> dict:
+    """N bar terakhir dari market_data + bar yang sedang terbentuk (jika ada)."""
+    limit = max(1, min(limit, MAX_SNAPSHOT_BARS))
+    cursor = db.market_data.aggregate(
+        recent_bars_pipeline(symbol, timeframe, limit, time.time())
+    )
+    docs = await cursor.to_list(length=limit)
+    bars = [
+        [
+            int(d["timestamp"].timestamp()),
+            d["open"],
+            d["high"],
+            d["low"],
+            d["close"],
+            d["volume"],
+        ]
+        for d in docs
+    ]
+
+    forming = False
+    candle = live_candles.get(candle_topic(symbol, timeframe))
+    if candle is not None and candle.bucket is not None and not candle.emitted:
+        if not bars or candle.bucket > bars[-1][0]:
+            bars.append(candle.merged())
+            forming = True
+
+    return {
+        "type": "candles",
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "fields": ["t", "o", "h", "l", "c", "v"],
+        "bars": bars,
+        "forming": forming,
+    }
+
+
+def is_valid_timeframe(timeframe: str) -> bool:
+    return timeframe in TIMEFRAMES
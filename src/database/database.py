@@ -36,6 +36,20 @@ requests_collection = db.upgrade_requests
 assets_collection = db.assets
 presets_collection = db.screener_presets
 alerts_collection = db.alerts
+market_data_collection = db.market_data
+market_bars_live_collection = db.market_bars_live
+
+# --- Time-series bar OHLCV (lihat BarAggregator) ---
+MARKET_DATA_TIMESERIES = {
+    "timeField": "timestamp",
+    "metaField": "symbol",
+    # Mayoritas dokumen adalah bar 1m -> bucket per jam
+    "granularity": "minutes",
+}
+# Bar lebih tua dari ini dihapus otomatis oleh MongoDB (0 = simpan selamanya)
+MARKET_DATA_RETENTION_DAYS = int(os.getenv("MARKET_DATA_RETENTION_DAYS", "365"))
+# Snapshot bar partial dari consumer yang sudah mati dibuang setelah ini
+MARKET_BARS_LIVE_TTL = 2 * 3600
 
 
 # --- 3. Helper Functions ---
@@ -64,11 +78,55 @@ async def init_db_indexes():
         await transactions_collection.create_index("order_id", unique=True)
         await requests_collection.create_index([("user_email", 1), ("status", 1)])
 
+        await ensure_market_data_collection(db)
+
         logger.info("⚡ Database Indexes Optimized")
     except Exception as e:
         logger.warning("⚠️ Warning during index creation: %s", e)
 
 
+async def ensure_market_data_collection(database=db):
+    """
+    Pastikan market_data berupa time-series collection (metaField=symbol)
+    beserta retensi dan index sekundernya. Collection biasa yang sudah ada
+    tidak diubah di sini; jalankan scripts/migrate_market_data_timeseries.py.
+    """
+    retention = MARKET_DATA_RETENTION_DAYS * 86400 or None
+    infos = await database.list_collections(filter={"name": "market_data"})
+    info = next(iter(await infos.to_list(length=1)), None)
+
+    if info is None:
+        options = {"timeseries": MARKET_DATA_TIMESERIES}
+        if retention:
+            options["expireAfterSeconds"] = retention
+        await database.create_collection("market_data", **options)
+        logger.info("📊 market_data created as time-series collection")
+    elif info.get("type") != "timeseries":
+        logger.warning(
+            "⚠️ market_data is a regular collection; run "
+            "scripts/migrate_market_data_timeseries.py to convert it"
+        )
+    else:
+        # Sinkronkan retensi jika env berubah
+        current = info.get("options", {}).get("expireAfterSeconds")
+        if current != retention:
+            await database.command(
+                "collMod", "market_data", expireAfterSeconds=retention or "off"
+            )
+
+    # Replay/chart: filter timeframe + range waktu per simbol
+    await database.market_data.create_index(
+        [("symbol", 1), ("timeframe", 1), ("timestamp", 1)]
+    )
+
+    await database.market_bars_live.create_index(
+        [("symbol", 1), ("timeframe", 1), ("consumer", 1)], unique=True
+    )
+    await database.market_bars_live.create_index(
+        "close_time", expireAfterSeconds=MARKET_BARS_LIVE_TTL
+    )
+
+
 async def regenerate_api_key(user_id: str) -> str:
     """Generate API key baru dan invalidate yang lama secara aman"""
     # 1. Ambil hash lama untuk invalidasi cache
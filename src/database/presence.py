@@ -0,0 +1,111 @@
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Dict
+
+from src.core.logger import logger
+from src.database.redis_client import redis_client
+
+# Sorted set: node -> heartbeat terakhir (epoch detik)
+PRESENCE_NODES_KEY = "ws:nodes"
+# Hash per node: simbol -> jumlah koneksi yang mendengarkan
+PRESENCE_SYMBOLS_PREFIX = "ws:presence:"
+# Hash per node: connections, symbols, queued, dropped
+PRESENCE_STATS_PREFIX = "ws:node:"
+
+NODE_ID = os.getenv("WS_NODE_ID", f"{socket.gethostname()}-{os.getpid()}")
+HEARTBEAT_INTERVAL = 5
+# Node yang tidak heartbeat selama ini dianggap mati
+NODE_TTL = HEARTBEAT_INTERVAL * 3
+# Perubahan langganan dipublish paling cepat tiap interval ini
+MIN_PUBLISH_INTERVAL = 1.0
+
+
+class PresenceRegistry:
+    """
+    Mencatat di Redis simbol apa saja yang dilayani node ini (dan berapa
+    koneksinya) sehingga jumlah koneksi bisa dilihat di seluruh cluster.
+    Key per node memakai TTL: node yang crash hilang sendiri.
+    """
+
+    def __init__(self, manager, node_id: str = NODE_ID):
+        self.manager = manager
+        self.node_id = node_id
+        self.symbols_key = f"{PRESENCE_SYMBOLS_PREFIX}{node_id}"
+        self.stats_key = f"{PRESENCE_STATS_PREFIX}{node_id}"
+        self._published_version = -1
+
+    async def publish(self) -> None:
+        counts = {
+            symbol: len(connections)
+            for symbol, connections in self.manager.active_connections.items()
+        }
+        stats = self.manager.stats()
+
+        batch = redis_client.batch(transaction=True)
+        batch.delete(self.symbols_key)
+        if counts:
+            batch.hset(self.symbols_key, mapping=counts)
+            batch.expire(self.symbols_key, NODE_TTL)
+        batch.hset(self.stats_key, mapping=stats)
+        batch.expire(self.stats_key, NODE_TTL)
+        batch.zadd(PRESENCE_NODES_KEY, {self.node_id: time.time()})
+        await batch.execute()
+
+    async def remove(self) -> None:
+        batch = redis_client.batch(transaction=True)
+        batch.delete(self.symbols_key, self.stats_key)
+        batch.zrem(PRESENCE_NODES_KEY, self.node_id)
+        await batch.execute()
+
+    async def run(self) -> None:
+        """Heartbeat; langsung publish (maks 1x/detik) bila langganan berubah."""
+        last_publish = 0.0
+        try:
+            while True:
+                now = time.monotonic()
+                changed = self.manager.version != self._published_version
+                if changed or now - last_publish >= HEARTBEAT_INTERVAL:
+                    version = self.manager.version
+                    try:
+                        await self.publish()
+                        self._published_version = version
+                        last_publish = now
+                    except Exception as e:
+                        logger.error("Presence Heartbeat Error: %s", e)
+                await asyncio.sleep(MIN_PUBLISH_INTERVAL)
+        except asyncio.CancelledError:
+            try:
+                await self.remove()
+            except Exception:
+                pass
+            raise
+
+
+async def cluster_presence() -> Dict[str, Any]:
+    """Ringkasan seluruh node: koneksi per node dan pendengar per simbol."""
+    now = time.time()
+    await redis_client.zremrangebyscore(PRESENCE_NODES_KEY, "-inf", now - NODE_TTL)
+    nodes = await redis_client.zrangebyscore(PRESENCE_NODES_KEY, now - NODE_TTL, "+inf")
+
+    keys = [f"{PRESENCE_STATS_PREFIX}{n}" for n in nodes]
+    keys += [f"{PRESENCE_SYMBOLS_PREFIX}{n}" for n in nodes]
+    results = await redis_client.hgetall_many(keys)
+    stats, symbol_maps = results[: len(nodes)], results[len(nodes):]
+
+    per_node = {}
+    symbols: Dict[str, Dict[str, int]] = {}
+    for node, node_stats, node_symbols in zip(nodes, stats, symbol_maps):
+        per_node[node] = {k: int(v) for k, v in node_stats.items()}
+        for symbol, count in node_symbols.items():
+            symbols.setdefault(symbol, {})[node] = int(count)
+
+    return {
+        "nodes": per_node,
+        "connections": sum(s.get("connections", 0) for s in per_node.values()),
+        "symbols": {
+            symbol: {"listeners": sum(by_node.values()), "nodes": sorted(by_node)}
+            for symbol, by_node in sorted(symbols.items())
+        },
+    }
@@ -1,7 +1,7 @@
 # src/core/redis_client.py
 import json
 import os
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from redis import asyncio as aioredis
@@ -10,6 +10,57 @@ from src.core.logger import logger
 
 load_dotenv()
 
+SIGNALS_KEY = "market_signals"
+# Nomor urut global (monoton) untuk setiap update sinyal
+SIGNALS_SEQ_KEY = "market_signals:seq"
+# Sorted set: simbol -> seq update terakhir (satu entry per simbol, jadi terbatas)
+SIGNALS_CHANGES_KEY = "market_signals:changes"
+# Seq saat hash terakhir di-reset; klien dengan since < floor butuh snapshot penuh
+SIGNALS_FLOOR_KEY = "market_signals:floor"
+SIGNALS_RESET_CHANNEL = "signals:reset"
+
+# Atomik di server: reservasi seq, sisipkan "Seq" ke payload JSON, HSET, ZADD,
+# lalu PUBLISH. Karena script tidak bisa diselingi, urutan publish == urutan seq.
+# KEYS: hash, seq, changes | ARGV: symbol1, payload1, symbol2, payload2, ...
+_SET_SIGNALS_LUA = """
+local n = #ARGV / 2
+local seq = redis.call('INCRBY', KEYS[2], n) - n
+for i = 1, #ARGV, 2 do
+    seq = seq + 1
+    local symbol = ARGV[i]
+    local body = ARGV[i + 1]
+    local payload
+    if body == '{}' then
+        payload = '{"Seq": ' .. seq .. '}'
+    else
+        payload = '{"Seq": ' .. seq .. ', ' .. string.sub(body, 2)
+    end
+    redis.call('HSET', KEYS[1], symbol, payload)
+    redis.call('ZADD', KEYS[3], seq, symbol)
+    redis.call('PUBLISH', 'signal:' .. symbol, payload)
+    redis.call('PUBLISH', 'signal:all', payload)
+end
+return seq
+"""
+
+# KEYS: hash, seq, changes, floor | ARGV: reset channel
+_RESET_SIGNALS_LUA = """
+redis.call('DEL', KEYS[1], KEYS[3])
+local seq = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[4], seq)
+redis.call('PUBLISH', ARGV[1], seq)
+return seq
+"""
+
+# Compare-and-delete: lepas lock hanya jika masih milik token ini
+# KEYS: lock | ARGV: token
+_RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 
 class RedisManager:
     def __init__(self):
@@ -18,6 +69,8 @@ class RedisManager:
             f"redis://{os.getenv('REDIS_USER')}:{os.getenv('REDIS_PASSWORD')}@{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT', '6379')}/0",
         )
         self.redis = None
+        # Koneksi terpisah tanpa decode_responses untuk payload biner (msgpack)
+        self.redis_bin = None
 
     async def connect(self):
         if not self.redis:
@@ -26,32 +79,39 @@ class RedisManager:
             )
             logger.info("✅ Redis Connected")
 
+    async def connect_binary(self):
+        if not self.redis_bin:
+            self.redis_bin = await aioredis.from_url(
+                self.redis_url, decode_responses=False
+            )
+            logger.info("✅ Redis (binary) Connected")
+
     async def close(self):
         if self.redis:
             await self.redis.close()
             logger.info("🔒 Redis Closed")
+        if self.redis_bin:
+            await self.redis_bin.close()
+            self.redis_bin = None
 
-    async def set_signal(self, symbol: str, data: dict) -> None:
-        """Simpan sinyal dan Publish event"""
-        if not self.redis:
-            await self.connect()
+    def batch(self, transaction: bool = False) -> "RedisBatch":
+        """Buat antrian perintah yang dikirim dalam satu round trip (pipeline)."""
+        return RedisBatch(self, transaction=transaction)
 
-        # Use type assertion to tell Pylance that redis is not None after connect
-        redis_conn = self.redis
-        if redis_conn:
-            # 1. Simpan data (Persistence)
-            await redis_conn.hset(  # type: ignore[misc]
-                "market_signals", symbol, json.dumps(data)
-            )
-
-            # 2. Publish event real-time (Pub/Sub)
-            # Channel khusus per simbol dan channel global
-            await redis_conn.publish(
-                f"signal:{symbol}", json.dumps(data)
-            )
-            await redis_conn.publish(
-                "signal:all", json.dumps(data)
-            )
+    async def set_signal(self, symbol: str, data: dict) -> None:
+        """Simpan sinyal dan Publish event (1 round trip, serialize sekali)"""
+        batch = self.batch()
+        batch.set_signal(symbol, data)
+        await batch.execute()
+
+    async def set_signals(self, signals: Dict[str, dict]) -> None:
+        """Simpan banyak sinyal sekaligus dalam 1 pipeline"""
+        if not signals:
+            return
+        batch = self.batch()
+        for symbol, data in signals.items():
+            batch.set_signal(symbol, data)
+        await batch.execute()
 
     async def get_signal(self, symbol: str) -> Optional[Dict[str, Any]]:
         if not self.redis:
@@ -59,7 +119,7 @@ class RedisManager:
 
         redis_conn = self.redis
         if redis_conn:
-            data = await redis_conn.hget("market_signals", symbol)  # type: ignore[misc]
+            data = await redis_conn.hget(SIGNALS_KEY, symbol)  # type: ignore[misc]
             return json.loads(data) if data else None
         return None
 
@@ -69,10 +129,111 @@ class RedisManager:
 
         redis_conn = self.redis
         if redis_conn:
-            all_data = await redis_conn.hgetall("market_signals")  # type: ignore[misc]
+            all_data = await redis_conn.hgetall(SIGNALS_KEY)  # type: ignore[misc]
             return {k: json.loads(v) for k, v in all_data.items()}
         return {}
 
+    async def get_signals(
+        self, symbols: Iterable[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Ambil sinyal untuk banyak simbol dengan satu HMGET"""
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            values = await redis_conn.hmget(SIGNALS_KEY, symbols)  # type: ignore[misc]
+            return {
+                symbol: json.loads(raw) if raw else None
+                for symbol, raw in zip(symbols, values)
+            }
+        return {symbol: None for symbol in symbols}
+
+    async def reset_signals(self) -> int:
+        """Hapus semua sinyal; seq dinaikkan agar klien delta sync memuat ulang."""
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            keys = [SIGNALS_KEY, SIGNALS_SEQ_KEY, SIGNALS_CHANGES_KEY, SIGNALS_FLOOR_KEY]
+            return int(
+                await redis_conn.eval(_RESET_SIGNALS_LUA, len(keys), *keys, SIGNALS_RESET_CHANNEL)  # type: ignore[misc]
+            )
+        return 0
+
+    async def get_signal_state(self) -> Dict[str, Any]:
+        """
+        Snapshot konsisten (MULTI) untuk sinkronisasi awal:
+        semua sinyal, seq terakhir, floor, dan seq per simbol.
+        """
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if not redis_conn:
+            return {"signals": {}, "seq": 0, "floor": 0, "versions": []}
+
+        pipe = redis_conn.pipeline(transaction=True)
+        pipe.hgetall(SIGNALS_KEY)
+        pipe.get(SIGNALS_SEQ_KEY)
+        pipe.get(SIGNALS_FLOOR_KEY)
+        pipe.zrange(SIGNALS_CHANGES_KEY, 0, -1, withscores=True)
+        raw, seq, floor, versions = await pipe.execute()
+        return {
+            "signals": {k: json.loads(v) for k, v in raw.items()},
+            "seq": int(seq or 0),
+            "floor": int(floor or 0),
+            # Urut naik berdasarkan seq
+            "versions": [(symbol, int(score)) for symbol, score in versions],
+        }
+
+    async def get_signal_changes(self, since: int) -> Dict[str, Any]:
+        """
+        Sinyal yang berubah setelah ``since``. ``full`` = True berarti klien
+        tertinggal (sebelum reset terakhir) dan ``signals`` berisi semua sinyal.
+        """
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if not redis_conn:
+            return {"seq": 0, "full": True, "signals": {}}
+
+        pipe = redis_conn.pipeline(transaction=True)
+        pipe.get(SIGNALS_SEQ_KEY)
+        pipe.get(SIGNALS_FLOOR_KEY)
+        pipe.zrangebyscore(SIGNALS_CHANGES_KEY, f"({since}", "+inf")
+        seq, floor, changed = await pipe.execute()
+        seq, floor = int(seq or 0), int(floor or 0)
+
+        if since < floor or since > seq:
+            return {"seq": seq, "full": True, "signals": await self.get_all_signals()}
+
+        signals = await self.get_signals(changed) if changed else {}
+        return {
+            "seq": seq,
+            "full": False,
+            "signals": {k: v for k, v in signals.items() if v is not None},
+        }
+
+    async def mget(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Ambil banyak key string dengan satu MGET"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            values = await redis_conn.mget(keys)  # type: ignore[misc]
+            return dict(zip(keys, values))
+        return {key: None for key in keys}
+
     async def get(self, key: str) -> Optional[str]:
         if not self.redis:
             await self.connect()
@@ -91,13 +252,15 @@ class RedisManager:
             return await redis_conn.incr(key)  # type: ignore[misc]
         return 0
 
-    async def set(self, key: str, value: str, ex: Optional[int] = None) -> bool:
+    async def set(
+        self, key: str, value: str, ex: Optional[int] = None, **kwargs
+    ) -> bool:
         if not self.redis:
             await self.connect()
 
         redis_conn = self.redis
         if redis_conn:
-            return await redis_conn.set(key, value, ex=ex)  # type: ignore[misc]
+            return await redis_conn.set(key, value, ex=ex, **kwargs)  # type: ignore[misc]
         return False
 
     async def expire(self, key: str, time: int) -> bool:
@@ -118,15 +281,110 @@ class RedisManager:
             return await redis_conn.delete(key)  # type: ignore[misc]
         return 0
 
-    async def xadd(self, stream: str, fields: dict) -> str:
+    async def release_lock(self, key: str, token: str) -> int:
+        """Hapus lock secara atomik jika nilainya masih ``token``."""
         if not self.redis:
             await self.connect()
 
         redis_conn = self.redis
         if redis_conn:
-            return await redis_conn.xadd(stream, fields)  # type: ignore[misc]
+            return await redis_conn.eval(_RELEASE_LOCK_LUA, 1, key, token)  # type: ignore[misc]
+        return 0
+
+    async def publish(self, channel: str, message: str) -> int:
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            return await redis_conn.publish(channel, message)  # type: ignore[misc]
+        return 0
+
+    async def hgetall_many(self, keys: List[str]) -> List[Dict[str, str]]:
+        """HGETALL banyak key dalam satu pipeline (urutan sama dengan keys)."""
+        if not keys:
+            return []
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            pipe = redis_conn.pipeline(transaction=False)
+            for key in keys:
+                pipe.hgetall(key)
+            return await pipe.execute()
+        return [{} for _ in keys]
+
+    async def zrangebyscore(self, name: str, min_score, max_score) -> List[str]:
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            return await redis_conn.zrangebyscore(name, min_score, max_score)  # type: ignore[misc]
+        return []
+
+    async def zremrangebyscore(self, name: str, min_score, max_score) -> int:
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            return await redis_conn.zremrangebyscore(name, min_score, max_score)  # type: ignore[misc]
+        return 0
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """GET tanpa decode (untuk payload biner seperti msgpack)"""
+        if not self.redis_bin:
+            await self.connect_binary()
+
+        redis_conn = self.redis_bin
+        if redis_conn:
+            return await redis_conn.get(key)  # type: ignore[misc]
+        return None
+
+    async def set_bytes(self, key: str, value: bytes, ex: Optional[int] = None) -> bool:
+        if not self.redis_bin:
+            await self.connect_binary()
+
+        redis_conn = self.redis_bin
+        if redis_conn:
+            return await redis_conn.set(key, value, ex=ex)  # type: ignore[misc]
+        return False
+
+    async def xadd(self, stream: str, fields: dict, **kwargs) -> str:
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            return await redis_conn.xadd(stream, fields, **kwargs)  # type: ignore[misc]
         return ""
 
+    async def xadd_many(self, stream: str, entries: List[dict], **kwargs) -> List[str]:
+        """XADD banyak entry dalam satu pipeline (kwargs: maxlen/minid/approximate)."""
+        if not entries:
+            return []
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            pipe = redis_conn.pipeline(transaction=False)
+            for fields in entries:
+                pipe.xadd(stream, fields, **kwargs)
+            return await pipe.execute()
+        return []
+
+    async def xread(self, streams: dict, **kwargs):
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            return await redis_conn.xread(streams, **kwargs)  # type: ignore[misc]
+        return []
+
     async def xgroup_create(self, stream: str, groupname: str, **kwargs) -> bool:
         if not self.redis:
             await self.connect()
@@ -148,6 +406,26 @@ class RedisManager:
             return await redis_conn.xreadgroup(groupname, consumername, streams, **kwargs)  # type: ignore[misc]
         return []
 
+    async def xautoclaim(
+        self, stream: str, groupname: str, consumername: str, min_idle_time: int, **kwargs
+    ) -> list:
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            return await redis_conn.xautoclaim(stream, groupname, consumername, min_idle_time, **kwargs)  # type: ignore[misc]
+        return []
+
+    async def xinfo_groups(self, stream: str) -> list:
+        if not self.redis:
+            await self.connect()
+
+        redis_conn = self.redis
+        if redis_conn:
+            return await redis_conn.xinfo_groups(stream)  # type: ignore[misc]
+        return []
+
     async def xack(self, stream: str, groupname: str, *ids) -> int:
         if not self.redis:
             await self.connect()
@@ -158,5 +436,88 @@ class RedisManager:
         return 0
 
 
+class RedisBatch:
+    """
+    Menampung perintah tulis Redis lalu mengirimnya dalam satu pipeline.
+
+    Sinyal di-serialize sekali per update lalu ditulis oleh satu script Lua
+    yang memberi nomor urut (``Seq``), HSET, mencatat changelog, dan publish.
+    Aman dipakai bersama oleh banyak task: ``execute()`` mengambil isi
+    antrian secara atomik sebelum menunggu Redis.
+    """
+
+    def __init__(self, manager: RedisManager, transaction: bool = False):
+        self.manager = manager
+        self.transaction = transaction
+        self._signals: Dict[str, str] = {}
+        self._ops: List[Tuple[str, tuple, dict]] = []
+
+    def __len__(self) -> int:
+        return len(self._signals) + len(self._ops)
+
+    async def __aenter__(self) -> "RedisBatch":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.execute()
+
+    def set_signal(self, symbol: str, data: dict) -> None:
+        if "Seq" in data:
+            # Seq selalu diberikan server (lihat _SET_SIGNALS_LUA)
+            data = {k: v for k, v in data.items() if k != "Seq"}
+        # Publish ke signal:{symbol} dan signal:all dilakukan oleh script
+        self._signals[symbol] = json.dumps(data)
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        self._ops.append(("set", (key, value), {"ex": ex}))
+
+    def setex(self, key: str, ttl: int, value: str) -> None:
+        self._ops.append(("setex", (key, ttl, value), {}))
+
+    def delete(self, *keys: str) -> None:
+        self._ops.append(("delete", keys, {}))
+
+    def publish(self, channel: str, message: str) -> None:
+        self._ops.append(("publish", (channel, message), {}))
+
+    def hset(self, name: str, mapping: Dict[str, Any]) -> None:
+        self._ops.append(("hset", (name,), {"mapping": mapping}))
+
+    def expire(self, key: str, ttl: int) -> None:
+        self._ops.append(("expire", (key, ttl), {}))
+
+    def zadd(self, name: str, mapping: Dict[str, float]) -> None:
+        self._ops.append(("zadd", (name, mapping), {}))
+
+    def zrem(self, name: str, *members: str) -> None:
+        self._ops.append(("zrem", (name, *members), {}))
+
+    async def execute(self) -> list:
+        """Kirim semua perintah yang tertunda dalam satu round trip."""
+        signals, ops = self._signals, self._ops
+        self._signals, self._ops = {}, []
+        if not signals and not ops:
+            return []
+
+        if not self.manager.redis:
+            await self.manager.connect()
+
+        redis_conn = self.manager.redis
+        if not redis_conn:
+            return []
+
+        pipe = redis_conn.pipeline(transaction=self.transaction)
+        # 1. Sinyal: HSET + changelog + publish dengan seq (atomik)
+        if signals:
+            args = [item for pair in signals.items() for item in pair]
+            keys = [SIGNALS_KEY, SIGNALS_SEQ_KEY, SIGNALS_CHANGES_KEY]
+            pipe.eval(_SET_SIGNALS_LUA, len(keys), *keys, *args)
+        # 2. Key tambahan / publish lain sesuai urutan antrian
+        for name, args, kwargs in ops:
+            getattr(pipe, name)(*args, **kwargs)
+        return await pipe.execute()
+
+
 # Global Instance
 redis_client = RedisManager()  # Global Instance
@@ -1,27 +1,190 @@
 # src/core/signal_bus.py
-from src.database.redis_client import redis_client
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.core.logger import logger
+from src.database.redis_client import SIGNALS_RESET_CHANNEL, redis_client
+
+SIGNAL_CHANNEL_PREFIX = "signal:"
+# Dikirim saat hash market_signals dihapus agar semua mirror ikut kosong
+SIGNAL_RESET_CHANNEL = SIGNALS_RESET_CHANNEL
+
+
+class SignalMirror:
+    """
+    Salinan in-process dari hash ``market_signals`` (sudah di-decode).
+
+    Disinkronkan lewat Pub/Sub ``signal:{symbol}`` yang sudah dipublish oleh
+    ``set_signal``; snapshot awal diambil dengan satu HGETALL setelah subscribe.
+    Selama listener tidak tersambung, ``ready`` = False dan pembaca kembali ke
+    Redis. Dict yang dikembalikan dipakai bersama: jangan dimutasi.
+
+    Setiap payload membawa ``Seq`` (lihat RedisBatch). ``_versions`` menyimpan
+    simbol urut berdasarkan seq terakhirnya sehingga ``changes_since`` cukup
+    berjalan mundur sebanyak simbol yang berubah.
+
+    Mirror adalah replika PENUH (psubscribe ``signal:*``) karena dashboard,
+    screener dan search membaca semua simbol. Jadi setiap node tetap menerima
+    update semua simbol, terlepas dari PresenceRegistry; yang di-scope per
+    node hanya fan-out WebSocket (lihat ``redis_connector_task``).
+    """
+
+    def __init__(self):
+        self._signals: Dict[str, Dict[str, Any]] = {}
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self.seq = 0
+        self.floor = 0
+        self.ready = False
+
+    def get(self, symbol):
+        return self._signals.get(symbol)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._signals)
+
+    def apply(self, symbol: str, data: Dict[str, Any]) -> None:
+        seq = data.get("Seq")
+        if seq is not None:
+            if seq <= self._versions.get(symbol, self.floor):
+                # Sudah tercakup snapshot (pesan datang setelah sinkronisasi)
+                return
+            self._versions[symbol] = seq
+            self._versions.move_to_end(symbol)
+            self.seq = max(self.seq, seq)
+        self._signals[symbol] = data
+
+    def load(self, state: Dict[str, Any]) -> None:
+        self._signals = state["signals"]
+        self._versions = OrderedDict(state["versions"])
+        self.seq = state["seq"]
+        self.floor = state["floor"]
+
+    def reset(self, seq: Optional[int] = None) -> None:
+        self._signals = {}
+        self._versions = OrderedDict()
+        if seq is not None:
+            self.seq = max(self.seq, seq)
+            self.floor = seq
+
+    def changes_since(self, since: int) -> Dict[str, Any]:
+        """Sinyal dengan seq > since, atau snapshot penuh jika klien tertinggal."""
+        if since < self.floor or since > self.seq:
+            return {"seq": self.seq, "full": True, "signals": self.snapshot()}
+
+        changed = {}
+        for symbol in reversed(self._versions):
+            if self._versions[symbol] <= since:
+                break
+            changed[symbol] = self._signals[symbol]
+        return {"seq": self.seq, "full": False, "signals": changed}
+
+    def _handle(self, message) -> None:
+        if message["type"] == "pmessage":
+            channel = message["channel"]
+            if channel == "signal:all":
+                return
+            self.apply(channel[len(SIGNAL_CHANNEL_PREFIX):], json.loads(message["data"]))
+        elif message["type"] == "message" and message["channel"] == SIGNAL_RESET_CHANNEL:
+            self.reset(int(message["data"]))
+
+    async def run(self):
+        """Loop listener; reconnect otomatis jika koneksi Pub/Sub putus."""
+        while True:
+            pubsub = None
+            try:
+                await redis_client.connect()
+                redis_conn = redis_client.redis
+                if not redis_conn:
+                    await asyncio.sleep(1)
+                    continue
+
+                pubsub = redis_conn.pubsub()
+                await pubsub.psubscribe(f"{SIGNAL_CHANNEL_PREFIX}*")
+                await pubsub.subscribe(SIGNAL_RESET_CHANNEL)
+
+                # Snapshot setelah subscribe: update yang sudah tercakup
+                # snapshot dilewati berdasarkan Seq.
+                self.load(await redis_client.get_signal_state())
+                self.ready = True
+                logger.info("🪞 Signal Mirror Synced (%d symbols)", len(self._signals))
+
+                async for message in pubsub.listen():
+                    try:
+                        self._handle(message)
+                    except Exception as e:
+                        logger.error("Signal Mirror Update Error: %s", e)
+            except asyncio.CancelledError:
+                self.ready = False
+                raise
+            except Exception as e:
+                self.ready = False
+                logger.error("Signal Mirror Error: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
 
 
 class InternalSignalBus:
     """
-    Sekarang bertindak sebagai Proxy ke Redis.
-    Tidak ada lagi variabel _storage lokal.
+    Proxy ke Redis. Pembacaan dilayani dari SignalMirror (tanpa network dan
+    tanpa json.loads) ketika mirror sudah tersinkron.
     """
 
+    def __init__(self):
+        self.mirror = SignalMirror()
+
     async def update_signal(self, symbol, data):
         # Fire and forget ke Redis
         await redis_client.set_signal(symbol, data)
 
+    async def update_signals(self, signals):
+        """Update banyak sinyal dalam satu pipeline"""
+        await redis_client.set_signals(signals)
+
     async def get_signal(self, symbol):
+        if self.mirror.ready:
+            return self.mirror.get(symbol)
         return await redis_client.get_signal(symbol)
 
+    async def get_signals(self, symbols):
+        """Ambil banyak sinyal sekaligus (HMGET). Simbol tanpa data -> None"""
+        if self.mirror.ready:
+            return {symbol: self.mirror.get(symbol) for symbol in symbols}
+        return await redis_client.get_signals(symbols)
+
     async def get_all_signals(self):
+        if self.mirror.ready:
+            return self.mirror.snapshot()
         return await redis_client.get_all_signals()
 
+    async def get_changes_since(self, since):
+        """
+        Delta sync: {"seq", "full", "signals"}. Jika ``full`` = False,
+        ``signals`` hanya berisi simbol yang berubah setelah ``since``.
+        """
+        if self.mirror.ready:
+            return self.mirror.changes_since(since)
+        return await redis_client.get_signal_changes(since)
+
+    def batch(self):
+        """Antrian update sinyal yang di-flush bersama (lihat RedisBatch)"""
+        return redis_client.batch()
+
     async def clear(self):
         """Clear all signals from Redis"""
-        await redis_client.delete("market_signals")
+        seq = await redis_client.reset_signals()
+        self.mirror.reset(seq)
 
 
 # Instance
 signal_bus = InternalSignalBus()
+
+
+async def signal_mirror_task():
+    await signal_bus.mirror.run()
@@ -1,68 +1,419 @@
 import asyncio
 import json
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
 
 from fastapi import WebSocket
 
 from src.core.logger import logger
+from src.core.bar_aggregator import CANDLE_CHANNEL_PREFIX
+from src.database.candle_stream import (
+    DEFAULT_SNAPSHOT_BARS,
+    MAX_SNAPSHOT_BARS,
+    apply_fragment,
+    candle_topic,
+    is_valid_timeframe,
+    live_candles,
+    load_snapshot,
+    parse_topic,
+)
+from src.database.presence import PresenceRegistry
 from src.database.redis_client import redis_client
+from src.database.signal_bus import SIGNAL_CHANNEL_PREFIX, signal_bus
+
+
+# Kebijakan untuk klien lambat saat antrian kirimnya penuh
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_COALESCE = "coalesce"  # simpan hanya payload terbaru per simbol
+POLICY_DISCONNECT = "disconnect"
+SLOW_CONSUMER_POLICIES = (POLICY_DROP_OLDEST, POLICY_COALESCE, POLICY_DISCONNECT)
+
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+DEFAULT_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", POLICY_COALESCE)
+# Batas simbol per koneksi multiplex
+MAX_SYMBOLS_PER_CONNECTION = int(os.getenv("WS_MAX_SYMBOLS", "200"))
+IDLE_POLL_INTERVAL = 0.1
+# Send yang macet lebih lama dari ini -> koneksi ditutup
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+
+
+class ClientConnection:
+    """
+    Satu WebSocket dengan antrian kirim terbatas dan writer task sendiri,
+    sehingga klien lambat tidak menahan broadcast ke klien lain.
+    Antrian berisi teks JSON yang sudah di-encode sekali per broadcast.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        policy: str = DEFAULT_POLICY,
+        max_queue: int = SEND_QUEUE_SIZE,
+    ):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            policy = POLICY_COALESCE
+        self.websocket = websocket
+        self.policy = policy
+        self.max_queue = max_queue
+        # key -> teks; key unik per pesan kecuali saat coalesce
+        self._queue: "OrderedDict[Any, str]" = OrderedDict()
+        self._counter = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.symbols: set[str] = set()
+        self.closed = False
+        # True jika diputus server (klien lambat / send gagal)
+        self.evicted = False
+        self.dropped = 0
+        self.sent = 0
+
+    def start(self, on_close: Callable[["ClientConnection"], None]) -> None:
+        self._task = asyncio.create_task(self._writer(on_close))
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def send(self, text: str, key: Optional[str] = None) -> bool:
+        """Masukkan pesan tanpa menunggu. False jika koneksi harus diputus."""
+        if self.closed:
+            return False
+
+        if self.policy == POLICY_COALESCE and key is not None:
+            if key in self._queue:
+                # Ganti payload lama di posisi yang sama (belum sempat terkirim)
+                self._queue[key] = text
+                self.dropped += 1
+                return True
+        else:
+            self._counter += 1
+            key = self._counter
+
+        if len(self._queue) >= self.max_queue:
+            if self.policy == POLICY_DISCONNECT:
+                self.evicted = True
+                self.close()
+                return False
+            self._queue.popitem(last=False)
+            self.dropped += 1
+
+        self._queue[key] = text
+        self._wakeup.set()
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+        self._queue.clear()
+        self._wakeup.set()
+        # Writer bisa sedang macet di send_text; hentikan langsung
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def _writer(self, on_close: Callable[["ClientConnection"], None]) -> None:
+        try:
+            while not self.closed:
+                if not self._queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                _key, text = self._queue.popitem(last=False)
+                await asyncio.wait_for(self.websocket.send_text(text), SEND_TIMEOUT)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.evicted = True
+            logger.debug("WS writer stopped: %s", e)
+        finally:
+            self.closed = True
+            on_close(self)
+            if self.evicted:
+                try:
+                    # 1013 = Try Again Later (klien terlalu lambat)
+                    await self.websocket.close(code=1013)
+                except Exception:
+                    pass
 
 
 class ConnectionManager:
+    """
+    Registry WebSocket -> simbol. Satu koneksi bisa berlangganan banyak simbol;
+    channel Redis ``signal:{symbol}`` hanya di-subscribe selama ada pendengar
+    (jumlah pendengar = reference count, lihat ``sync_subscriptions``).
+    """
+
     def __init__(self):
-        self.active_connections: dict[str, list[WebSocket]] = {}
+        self.active_connections: dict[str, dict[WebSocket, ClientConnection]] = {}
+        self.clients: dict[WebSocket, ClientConnection] = {}
+        self._channels_changed = asyncio.Event()
+        # Naik setiap koneksi/langganan berubah (dipakai PresenceRegistry)
+        self.version = 0
 
-    async def connect(self, websocket: WebSocket, symbol: str):
+    async def connect(
+        self,
+        websocket: WebSocket,
+        symbol: Optional[str] = None,
+        policy: str = DEFAULT_POLICY,
+    ) -> ClientConnection:
         await websocket.accept()
-        if symbol not in self.active_connections:
-            self.active_connections[symbol] = []
-        self.active_connections[symbol].append(websocket)
-        logger.info("🔌 WS Connected: %s", symbol)
+        client = ClientConnection(websocket, policy)
+        self.clients[websocket] = client
+        self.version += 1
+        client.start(lambda c: self.disconnect(c.websocket))
+        if symbol:
+            self.subscribe(websocket, [symbol])
+        logger.info("🔌 WS Connected: %s", symbol or "multiplex")
+        return client
 
-    def disconnect(self, websocket: WebSocket, symbol: str):
-        if symbol in self.active_connections:
-            if websocket in self.active_connections[symbol]:
-                self.active_connections[symbol].remove(websocket)
-            if not self.active_connections[symbol]:
-                del self.active_connections[symbol]
-        logger.info("🔌 WS Disconnected: %s", symbol)
+    def subscribe(self, websocket: WebSocket, symbols: Iterable[str]) -> list[str]:
+        """Tambah simbol ke koneksi. Return simbol yang benar-benar baru."""
+        client = self.clients.get(websocket)
+        if client is None:
+            return []
+        added = []
+        for symbol in symbols:
+            if symbol in client.symbols:
+                continue
+            if len(client.symbols) >= MAX_SYMBOLS_PER_CONNECTION:
+                break
+            client.symbols.add(symbol)
+            connections = self.active_connections.setdefault(symbol, {})
+            connections[websocket] = client
+            if len(connections) == 1:
+                self._channels_changed.set()
+            added.append(symbol)
+        if added:
+            self.version += 1
+        return added
+
+    def unsubscribe(self, websocket: WebSocket, symbols: Iterable[str]) -> list[str]:
+        client = self.clients.get(websocket)
+        if client is None:
+            return []
+        removed = []
+        for symbol in symbols:
+            if symbol not in client.symbols:
+                continue
+            client.symbols.discard(symbol)
+            connections = self.active_connections.get(symbol)
+            if connections is not None:
+                connections.pop(websocket, None)
+                if not connections:
+                    # Pendengar terakhir: channel Redis dilepas oleh sync_subscriptions
+                    del self.active_connections[symbol]
+                    live_candles.pop(symbol, None)
+                    self._channels_changed.set()
+            removed.append(symbol)
+        if removed:
+            self.version += 1
+        return removed
+
+    def disconnect(self, websocket: WebSocket, symbol: Optional[str] = None):
+        """Lepas koneksi beserta semua langganannya (``symbol`` diabaikan)."""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        self.unsubscribe(websocket, list(client.symbols))
+        del self.clients[websocket]
+        self.version += 1
+        client.close()
+        logger.info("🔌 WS Disconnected: %s", symbol or "multiplex")
 
     async def broadcast(self, symbol: str, data: dict):
+        """Serialize sekali lalu antrikan ke semua subscriber (tanpa menunggu I/O)."""
         if symbol in self.active_connections:
-            connections = self.active_connections[symbol]
-            for ws in list(connections):
-                try:
-                    await ws.send_json(data)
-                except Exception:
-                    self.disconnect(ws, symbol)
+            self.broadcast_text(symbol, json.dumps(data))
+
+    def broadcast_text(self, symbol: str, text: str, key: Optional[str] = None) -> int:
+        connections = self.active_connections.get(symbol)
+        if not connections:
+            return 0
+        for client in list(connections.values()):
+            client.send(text, key=key or symbol)
+        return len(connections)
+
+    def wanted_channels(self) -> set[str]:
+        # Topik chart sudah berupa nama channel (candle:{symbol}:{tf})
+        return {
+            topic if topic.startswith(CANDLE_CHANNEL_PREFIX) else f"{SIGNAL_CHANNEL_PREFIX}{topic}"
+            for topic in self.active_connections
+        }
+
+    async def sync_subscriptions(self, pubsub) -> None:
+        """
+        Samakan channel Pub/Sub dengan simbol yang sedang punya pendengar.
+        Satu-satunya penulis perintah SUBSCRIBE/UNSUBSCRIBE untuk ``pubsub``.
+        """
+        subscribed: set[str] = set()
+        while True:
+            self._channels_changed.clear()
+            wanted = self.wanted_channels()
+            to_add, to_remove = wanted - subscribed, subscribed - wanted
+            if to_add:
+                await pubsub.subscribe(*to_add)
+            if to_remove:
+                await pubsub.unsubscribe(*to_remove)
+            subscribed = wanted
+            await self._channels_changed.wait()
+
+    def stats(self) -> dict:
+        clients = list(self.clients.values())
+        return {
+            "connections": len(clients),
+            "symbols": len(self.active_connections),
+            "queued": sum(len(c) for c in clients),
+            "dropped": sum(c.dropped for c in clients),
+        }
 
 
 manager = ConnectionManager()
+presence = PresenceRegistry(manager)
 
 
-async def redis_connector_task():
+async def presence_task():
+    """Heartbeat presence node ini ke Redis (lihat PresenceRegistry)."""
+    await presence.run()
+
+
+async def handle_stream_message(websocket: WebSocket, raw: str) -> None:
     """
-    Mendengarkan Redis Pub/Sub dan mem-push ke WebSocket
-    HANYA ketika ada data (event) baru dari producer.py.
+    Protokol multiplex /ws/stream:
+    {"action": "subscribe" | "unsubscribe", "symbols": [...]} atau {"action": "ping"}.
+    Setelah subscribe, sinyal terakhir tiap simbol baru dikirim sebagai snapshot.
+
+    Chart live: {"action": "subscribe_candles", "symbols": [...], "timeframe": "1m",
+    "limit": 300} -> snapshot {"type": "candles", "bars": [[t,o,h,l,c,v], ...]},
+    lalu delta array ["u" | "c", symbol, timeframe, t, o, h, l, c, v].
     """
-    await redis_client.connect()
-    redis_conn = redis_client.redis
-    if redis_conn:
-        pubsub = redis_conn.pubsub()
-        await pubsub.subscribe("signal:all")
+    client = manager.clients.get(websocket)
+    if client is None:
+        return
+    try:
+        msg = json.loads(raw)
+        action = msg.get("action")
+        symbols = msg.get("symbols", [])
+    except (ValueError, AttributeError, TypeError):
+        client.send(json.dumps({"type": "error", "detail": "Invalid message"}))
+        return
+    # String tunggal akan teriterasi per karakter -> tolak, bukan subscribe "B", "T", ...
+    if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+        client.send(json.dumps({"type": "error", "detail": "symbols must be a list of strings"}))
+        return
 
-        logger.info("🎧 Redis Pub/Sub WS Listener Started")
+    if action == "subscribe":
+        added = manager.subscribe(websocket, symbols)
+        client.send(json.dumps({"type": "subscribed", "symbols": _signal_symbols(client)}))
+        if added:
+            snapshot = await signal_bus.get_signals(added)
+            for symbol, data in snapshot.items():
+                if data:
+                    client.send(json.dumps(data), key=symbol)
+    elif action == "unsubscribe":
+        manager.unsubscribe(websocket, symbols)
+        client.send(json.dumps({"type": "subscribed", "symbols": _signal_symbols(client)}))
+    elif action in ("subscribe_candles", "unsubscribe_candles"):
+        await _handle_candles(websocket, client, action, symbols, msg)
+    elif action == "ping":
+        client.send(json.dumps({"type": "pong"}))
+    else:
+        client.send(json.dumps({"type": "error", "detail": f"Unknown action: {action}"}))
+
+
+def _signal_symbols(client: ClientConnection) -> list[str]:
+    return sorted(s for s in client.symbols if not s.startswith(CANDLE_CHANNEL_PREFIX))
 
-        async for message in pubsub.listen():
-            if message["type"] == "message":
-                try:
-                    data = json.loads(message["data"])
-                    symbol = data.get("Symbol")
 
-                    # Tambahkan server timestamp
-                    data["server_time"] = str(asyncio.get_event_loop().time())
+async def _handle_candles(websocket, client, action, symbols, msg) -> None:
+    timeframe = msg.get("timeframe", "1m")
+    if not isinstance(timeframe, str) or not is_valid_timeframe(timeframe):
+        client.send(json.dumps({"type": "error", "detail": f"Invalid timeframe: {timeframe}"}))
+        return
+    limit = msg.get("limit")
+    if limit is None:
+        limit = DEFAULT_SNAPSHOT_BARS
+    elif not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+        client.send(json.dumps({"type": "error", "detail": "limit must be a positive integer"}))
+        return
+    limit = min(limit, MAX_SNAPSHOT_BARS)
 
-                    if symbol and symbol in manager.active_connections:
-                        await manager.broadcast(symbol, data)
+    topics = [candle_topic(symbol, timeframe) for symbol in symbols]
+    if action == "subscribe_candles":
+        added = manager.subscribe(websocket, topics)
+        for topic in added:
+            symbol, _tf = parse_topic(topic)
+            client.send(json.dumps(await load_snapshot(symbol, timeframe, limit)))
+    else:
+        manager.unsubscribe(websocket, topics)
 
-                except Exception as e:
-                    logger.error("WS Broadcast Error: %s", e)
+    candles = sorted(t for t in client.symbols if t.startswith(CANDLE_CHANNEL_PREFIX))
+    client.send(
+        json.dumps(
+            {"type": "candles_subscribed", "candles": [list(parse_topic(t)) for t in candles]}
+        )
+    )
+
+
+def _dispatch(channel: str, raw: str) -> None:
+    if channel.startswith(CANDLE_CHANNEL_PREFIX):
+        if channel in manager.active_connections:
+            for key, text in apply_fragment(channel, raw):
+                manager.broadcast_text(channel, text, key=key)
+        return
+
+    symbol = channel[len(SIGNAL_CHANNEL_PREFIX):]
+    if symbol not in manager.active_connections:
+        return
+    data = json.loads(raw)
+    # Tambahkan server timestamp
+    data["server_time"] = str(asyncio.get_event_loop().time())
+    manager.broadcast_text(symbol, json.dumps(data))
+
+
+async def redis_connector_task():
+    """
+    Mendengarkan channel ``signal:{symbol}`` yang punya pendengar dan mem-push
+    ke WebSocket HANYA ketika ada data (event) baru dari producer.py.
+    Reconnect otomatis; langganan disinkronkan ulang setelah reconnect.
+    """
+    while True:
+        pubsub = None
+        syncer = None
+        try:
+            await redis_client.connect()
+            redis_conn = redis_client.redis
+            if not redis_conn:
+                await asyncio.sleep(1)
+                continue
+
+            pubsub = redis_conn.pubsub()
+            syncer = asyncio.create_task(manager.sync_subscriptions(pubsub))
+            logger.info("🎧 Redis Pub/Sub WS Listener Started")
+
+            while True:
+                if syncer.done():
+                    syncer.result()  # naikkan error SUBSCRIBE -> reconnect
+                if not pubsub.subscribed:
+                    # Belum ada simbol yang didengarkan
+                    await asyncio.sleep(IDLE_POLL_INTERVAL)
+                    continue
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if message and message["type"] == "message":
+                    try:
+                        _dispatch(message["channel"], message["data"])
+                    except Exception as e:
+                        logger.error("WS Broadcast Error: %s", e)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("WS Listener Error: %s", e)
+            await asyncio.sleep(1)
+        finally:
+            if syncer is not None:
+                syncer.cancel()
+            if pubsub is not None:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
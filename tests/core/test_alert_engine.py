@@ -0,0 +1,113 @@
+"""
+Tests for the indexed alert engine and compiled formulas.
+"""
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pandas as pd
+import pytest
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import watcher  # noqa: E402
+from src.core import alert_engine as ae  # noqa: E402
+from src.core.formula_evaluator import compile_formula, safe_eval  # noqa: E402
+
+
+def make_alert(_id, symbol="BTC/USDT", type="PRICE", condition="ABOVE", target_price=0.0, status="ACTIVE"):
+    return {
+        "_id": _id,
+        "symbol": symbol,
+        "type": type,
+        "condition": condition,
+        "target_price": target_price,
+        "status": status,
+        "note": f"alert {_id}",
+    }
+
+
+def test_formula_is_compiled_once():
+    compile_formula.cache_clear()
+    env = {"CLOSE": 51000, "RSI": 25}
+    for _ in range(100):
+        assert safe_eval("CLOSE > 50000 AND RSI < 30", env) is True
+    assert compile_formula.cache_info().misses == 1
+    assert safe_eval("RSI < 30 AND MISSING > 1", env) is False
+    assert safe_eval("CLOSE >", env) is False
+    assert safe_eval("1 / 0 > 1", env) is False
+
+
+def test_price_alerts_trigger_by_bisection():
+    engine = ae.AlertEngine()
+    engine.load(
+        [
+            make_alert(1, condition="ABOVE", target_price=110),
+            make_alert(2, condition="ABOVE", target_price=120),
+            make_alert(3, condition="BELOW", target_price=90),
+            make_alert(4, symbol="ETH/USDT", condition="BELOW", target_price=10),
+            make_alert(5, status="TRIGGERED", target_price=1),
+        ]
+    )
+    assert len(engine) == 4
+
+    assert engine.evaluate("BTC/USDT", 100) == []
+    assert [a["_id"] for a in engine.evaluate("BTC/USDT", 115)] == [1]
+    # Sudah terpicu -> tidak terpicu lagi
+    assert engine.evaluate("BTC/USDT", 115) == []
+    assert [a["_id"] for a in engine.evaluate("BTC/USDT", 85)] == [3]
+    assert len(engine._pending) == 2
+    assert set(engine.alerts) == {2, 4}
+
+
+def test_formula_alerts_use_latest_bar_variables():
+    engine = ae.AlertEngine()
+    engine.load([make_alert(1, type="FORMULA", condition="RSI < 30 AND CLOSE > SMA20")])
+
+    assert engine.evaluate("BTC/USDT", 100, {"CLOSE": 100, "RSI": 40, "SMA20": 95}) == []
+    engine.env["BTC/USDT"]["RSI"] = 25
+    # Tick baru memakai variabel bar terakhir dengan CLOSE = harga tick
+    assert engine.evaluate("BTC/USDT", 90) == []
+    assert [a["_id"] for a in engine.evaluate("BTC/USDT", 96)] == [1]
+
+
+@pytest.mark.asyncio
+async def test_tick_batch_persists_triggered_alerts_in_one_write():
+    engine = ae.AlertEngine()
+    engine.load([make_alert(i, target_price=100 + i) for i in range(5)])
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock()
+
+    messages = [
+        ("1-0", {"symbol": "BTC/USDT", "price": "102"}),
+        ("2-0", {"symbol": "OTHER", "price": "1"}),
+        ("3-0", {"symbol": "BTC/USDT", "price": "110"}),
+    ]
+    with patch.object(ae, "alerts_collection", collection):
+        assert await engine.process_messages(messages) == 5
+        assert await engine.process_messages(messages) == 0
+
+    collection.bulk_write.assert_awaited_once()
+    ops = collection.bulk_write.await_args.args[0]
+    assert [op._filter["_id"] for op in ops] == [0, 1, 2, 3, 4]
+    assert all(op._doc["$set"]["status"] == "TRIGGERED" for op in ops)
+
+
+@pytest.mark.asyncio
+async def test_sync_alert_and_check_alerts():
+    engine = ae.AlertEngine()
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value=make_alert(9, condition="BELOW", target_price=50))
+    collection.bulk_write = AsyncMock()
+
+    with patch.object(ae, "alerts_collection", collection), patch.object(watcher, "alert_engine", engine):
+        await engine.sync_alert(9)
+        assert 9 in engine.alerts
+
+        df = pd.DataFrame([{"Close": 49.0, "Volume": 10.0, "RSI_14": 50.0, "SMA_20": 48.0}])
+        await watcher.check_alerts(df, "BTC/USDT")
+
+        collection.find_one.return_value = None
+        await engine.sync_alert(9)
+
+    assert engine.alerts == {}
+    collection.bulk_write.assert_awaited_once()
@@ -0,0 +1,132 @@
+"""
+Tests for the content-addressed backtest result cache.
+"""
+import pandas as pd
+import pytest
+
+from src.core import backtest_cache as bc
+
+
+class FakeBatch:
+    def __init__(self, store):
+        self.store = store
+        self.ops = []
+
+    def delete(self, *keys):
+        self.ops.append(keys)
+
+    async def execute(self):
+        for keys in self.ops:
+            for key in keys:
+                self.store.pop(key, None)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None, **kwargs):
+        self.store[key] = value
+        return True
+
+    get_bytes = get
+    set_bytes = set
+
+    def batch(self):
+        return FakeBatch(self.store)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(bc, "redis_client", fake)
+    return fake
+
+
+def frame(rows, start="2024-01-01"):
+    index = pd.date_range(start, periods=rows, freq="h")
+    return pd.DataFrame({"Close": range(rows)}, index=index)
+
+
+def result(model="m1", data="d1", rows=10):
+    curve = [{"date": f"t{i}", "balance": 100.0 + i} for i in range(rows)]
+    return {
+        "symbol": "BBCA.JK",
+        "total_return_percent": 1.5,
+        "equity_curve": curve,
+        "equity_curve_raw": [{"time": p["date"], "value": p["balance"]} for p in curve],
+        bc.CACHE_META: {"model": model, "data": data},
+    }
+
+
+def test_fingerprint_and_model_hash(tmp_path):
+    fp = bc.data_fingerprint(frame(100), "BBCA.JK", "1h")
+    assert fp == bc.data_fingerprint(frame(100), "BBCA.JK", "1h")
+    assert fp != bc.data_fingerprint(frame(101), "BBCA.JK", "1h")
+    assert fp != bc.data_fingerprint(frame(100, "2024-01-02"), "BBCA.JK", "1h")
+    assert fp != bc.data_fingerprint(frame(100), "BBCA.JK", "1d")
+
+    path = tmp_path / "model.zip"
+    path.write_bytes(b"weights-v1")
+    first = bc.model_hash(str(path))
+    assert bc.model_hash(str(path)) == first
+    path.write_bytes(b"weights-v2-longer")
+    assert bc.model_hash(str(path)) != first
+
+    params = {"symbol": "X", "period": "2y", "initial_balance": 1}
+    assert bc.cache_key("m", "d", params) == bc.cache_key("m", "d", dict(reversed(params.items())))
+    assert bc.cache_key("m", "d", params) != bc.cache_key("m2", "d", params)
+
+
+@pytest.mark.asyncio
+async def test_store_then_lookup_hit(redis):
+    params = {"symbol": "BBCA.JK", "period": "2y", "initial_balance": 100}
+    assert await bc.lookup("BBCA.JK", "1h", "2y", "m1", params) is None
+
+    key = await bc.store("BBCA.JK", "1h", "2y", params, result())
+    assert key in redis.store
+
+    cached = await bc.lookup("BBCA.JK", "1h", "2y", "m1", params)
+    assert cached["total_return_percent"] == 1.5
+    assert len(cached["equity_curve"]) == 10
+    assert bc.CACHE_META not in cached
+
+    # Parameter lain / model lain -> miss
+    assert await bc.lookup("BBCA.JK", "1h", "2y", "m1", {**params, "initial_balance": 5}) is None
+    assert await bc.lookup("BBCA.JK", "1h", "2y", "m2", params) is None
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_expiry_and_invalidation(redis, monkeypatch):
+    params = {"symbol": "BBCA.JK", "period": "2y", "initial_balance": 100}
+    other = {**params, "initial_balance": 200}
+    old_key = await bc.store("BBCA.JK", "1h", "2y", params, result())
+    old_other = await bc.store("BBCA.JK", "1h", "2y", other, result())
+
+    now = bc.time.time()
+    monkeypatch.setattr(bc.time, "time", lambda: now + bc.DATA_TTL + 1)
+    assert await bc.lookup("BBCA.JK", "1h", "2y", "m1", params) is None
+
+    # Data berubah (bar baru) -> semua entry lama simbol dihapus
+    new_key = await bc.store("BBCA.JK", "1h", "2y", params, result(data="d2"))
+    assert old_key not in redis.store and old_other not in redis.store
+    assert (await bc.lookup("BBCA.JK", "1h", "2y", "m1", params)) is not None
+
+    assert await bc.invalidate("BBCA.JK", "1h", "2y") == 1
+    assert new_key not in redis.store
+
+
+@pytest.mark.asyncio
+async def test_large_equity_curve_goes_to_parquet(redis, monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(bc, "PARQUET_MIN_ROWS", 5)
+    params = {"symbol": "BBCA.JK", "period": "2y", "initial_balance": 100}
+    key = await bc.store("BBCA.JK", "1h", "2y", params, result(rows=50))
+    assert f"{key}:equity" in redis.store
+
+    cached = await bc.lookup("BBCA.JK", "1h", "2y", "m1", params)
+    assert cached["equity_curve"][49] == {"date": "t49", "balance": 149.0}
+    assert cached["equity_curve_raw"][0] == {"time": "t0", "value": 100.0}
@@ -0,0 +1,53 @@
+"""
+Tests for the tick -> OHLCV bar aggregator.
+"""
+from datetime import datetime, timezone
+
+from src.core.bar_aggregator import BarAggregator, bars_pipeline
+
+T0 = 1_700_000_000 - 1_700_000_000 % 3600  # awal jam
+
+
+def test_bar_closes_when_next_bucket_starts():
+    agg = BarAggregator({"1m": 60})
+    assert agg.add_tick("A", 10, 1, T0) == []
+    assert agg.add_tick("A", 13, 1, T0 + 10) == []
+    assert agg.add_tick("A", 9, 2, T0 + 20) == []
+    assert agg.add_tick("A", 11, 1, T0 + 59) == []
+
+    (bar,) = agg.add_tick("A", 12, 5, T0 + 60)
+    assert bar["timestamp"] == datetime.fromtimestamp(T0, tz=timezone.utc)
+    assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (10, 13, 9, 11)
+    assert bar["volume"] == 5 and bar["ticks"] == 4
+    assert "partial" not in bar
+
+
+def test_multiple_timeframes_and_out_of_order_ticks():
+    agg = BarAggregator()
+    agg.add_tick("A", 10, 1, T0 + 5)
+    agg.add_tick("A", 8, 1, T0 + 1)  # lebih awal -> jadi open
+    forming = {b["timeframe"]: b for b in agg.snapshot()}
+    assert set(forming) == {"1m", "5m", "1h"}
+    assert forming["1h"]["open"] == 8 and forming["1h"]["close"] == 10
+    assert all(b["partial"] for b in forming.values())
+
+    # Tick terlambat untuk bucket yang sudah ditutup -> fragmen terpisah
+    agg.add_tick("A", 11, 1, T0 + 120)
+    late = agg.add_tick("A", 7, 1, T0 + 30)
+    assert [b["timeframe"] for b in late] == ["1m"]
+    assert late[0]["ticks"] == 1
+
+
+def test_flush_expired_respects_grace():
+    agg = BarAggregator({"1m": 60}, grace=2)
+    agg.add_tick("A", 10, 1, T0)
+    assert agg.flush_expired(T0 + 61) == []
+    assert len(agg.flush_expired(T0 + 62)) == 1
+    assert len(agg) == 0
+
+
+def test_bars_pipeline_filters_timeframe():
+    start = datetime(2024, 1, 1)
+    pipeline = bars_pipeline("A", "5m", start, limit=10)
+    assert pipeline[0]["$match"] == {"symbol": "A", "timeframe": "5m", "timestamp": {"$gte": start}}
+    assert pipeline[-2] == {"$limit": 10}
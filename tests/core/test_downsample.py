@@ -0,0 +1,45 @@
+"""
+Tests for LTTB equity curve downsampling.
+"""
+import time
+
+import numpy as np
+
+from src.core.downsample import downsample_points, lttb_indices
+
+
+def test_keeps_endpoints_and_extremes():
+    y = np.zeros(1000)
+    y[137] = 50.0  # puncak
+    y[702] = -40.0  # lembah
+    idx = lttb_indices(y, 20)
+
+    assert len(idx) == 20
+    assert idx[0] == 0 and idx[-1] == 999
+    assert np.all(np.diff(idx) > 0)
+    assert 137 in idx and 702 in idx
+
+
+def test_small_inputs_are_returned_as_is():
+    assert lttb_indices([1, 2, 3], 10).tolist() == [0, 1, 2]
+    assert lttb_indices(np.arange(100), 2).tolist() == list(range(100))
+    assert len(lttb_indices(np.arange(100), 99)) == 99
+
+
+def test_downsample_points_and_speed():
+    rng = np.random.default_rng(0)
+    balance = 1e8 + np.cumsum(rng.normal(0, 1e5, 50_000))
+    curve = [{"date": str(i), "balance": float(b)} for i, b in enumerate(balance)]
+
+    started = time.perf_counter()
+    sampled = downsample_points(curve, "balance", 500)
+    elapsed = time.perf_counter() - started
+
+    assert len(sampled) == 500
+    assert sampled[0] is curve[0] and sampled[-1] is curve[-1]
+    # Bentuk kurva terjaga: ekstrem hasil sampling dekat ekstrem asli
+    spread = balance.max() - balance.min()
+    assert max(p["balance"] for p in sampled) > balance.max() - 0.01 * spread
+    assert min(p["balance"] for p in sampled) < balance.min() + 0.01 * spread
+    assert elapsed < 0.5
+    assert downsample_points(curve[:10], "balance", 500) == curve[:10]
@@ -0,0 +1,124 @@
+"""
+Tests for the shared intrabar execution model (watcher + backtest).
+"""
+import numpy as np
+import pytest
+
+from src.core import execution as ex
+
+FOREX = {"type": "forex", "lot_multiplier": 100000}
+STOCK = {"type": "stock_indo", "lot_multiplier": 100}
+
+
+def test_single_bar_rules_match_watcher():
+    # TP dicek lebih dulu, lalu SL
+    assert ex.check_exit(True, 1.2, 1.0, high=1.25, low=0.95) == (1.2, ex.EXIT_TP)
+    assert ex.check_exit(True, 1.2, 1.0, high=1.1, low=0.99) == (1.0, ex.EXIT_SL)
+    assert ex.check_exit(False, 1.0, 1.2, high=1.1, low=1.05) == (None, None)
+    assert ex.check_exit(False, 1.0, 1.2, high=1.1, low=0.99) == (1.0, ex.EXIT_TP)
+
+    assert ex.limit_filled(True, 100, high=105, low=99.5)
+    assert not ex.limit_filled(True, 100, high=105, low=100.5)
+    assert ex.limit_filled(False, 100, high=100, low=90)
+
+
+def test_net_pnl_costs():
+    # Forex: 50 pip - spread 2 pip = 48 pip x $10 x 0.1 lot - komisi $0.7
+    assert ex.net_pnl(1.1000, 1.1050, True, 0.1, "forex") == pytest.approx(48 - 0.7)
+    assert ex.net_pnl(1.1000, 1.1050, False, 0.1, "forex") == pytest.approx(-52 - 0.7)
+    # Saham: selisih x lot x 100 - komisi beli+jual 0.1%
+    assert ex.net_pnl(9000, 9100, True, 10, "stock_indo") == pytest.approx(100_000 - 2 * 9000)
+    # Crypto memakai contract size aset
+    assert ex.net_pnl(60000, 61000, True, 1, "crypto", contract_size=1) == pytest.approx(1000 - 0.0002 - 7)
+
+    pnl = ex.net_pnl(np.array([1.1, 1.1]), np.array([1.2, 1.0]), np.array([True, False]), 1, "forex")
+    assert isinstance(pnl, np.ndarray) and pnl[0] == pytest.approx(pnl[1])
+    assert isinstance(ex.net_pnl(1.1, 1.2, True, 1, "forex"), float)
+
+
+def test_order_levels_follow_signal_logic():
+    entry, sl, tp, is_limit = ex.order_levels(
+        np.array([True, False, True]),
+        close=np.array([100.0, 100.0, 100.0]),
+        atr=np.array([1.0, 1.0, 1.0]),
+        sma20=np.array([100.5, 99.5, 98.0]),
+        sl_mult=2.0,
+    )
+    assert is_limit.tolist() == [False, False, True]
+    assert entry.tolist() == [100.0, 100.0, 99.0]
+    assert sl.tolist() == [98.0, 102.0, 97.0]
+    assert tp.tolist() == [104.0, 96.0, 103.0]
+    assert ex.sl_atr_mult("forex") == 1.5 and ex.sl_atr_mult("stock_indo") == 2.0
+
+
+def test_simulated_trades_first_touch_limit_and_timeout():
+    close = np.full(8, 100.0)
+    high = np.array([100.0, 101.0, 104.5, 100.0, 100.0, 103.0, 100.0, 100.0])
+    low = np.array([100.0, 99.0, 99.5, 100.0, 97.0, 100.0, 100.0, 100.0])
+    atr = np.ones(8)
+    actions = np.array([1, 1, 0, 2, 0, 0, 0, 0])
+
+    # Long bar 0: SL 98 / TP 104 -> TP di bar 2 (sinyal bar 1 diabaikan, masih posisi)
+    # Short bar 3: SL 102 / TP 96 -> SL di bar 5
+    sim = ex.simulate_trades(high, low, close, atr, actions, sl_mult=2.0)
+    assert sim["entries"].tolist() == [0, 3]
+    assert sim["exits"].tolist() == [2, 5]
+    assert sim["direction"].tolist() == [1, -1]
+    assert sim["exit_price"].tolist() == [104.0, 102.0]
+    assert sim["reason"] == [ex.EXIT_TP, ex.EXIT_SL]
+
+    # BUY LIMIT di 99 (close 100, SMA20 98) terisi di bar 1, lalu timeout
+    sma20 = np.full(8, 98.0)
+    quiet_high, quiet_low = np.full(8, 100.2), np.array([100.0, 98.9] + [99.5] * 6)
+    limit = ex.simulate_trades(quiet_high, quiet_low, close, atr, np.array([1, 0, 0, 0, 0, 0, 0, 0]), sl_mult=2.0, sma20=sma20, max_hold=3)
+    assert limit["signals"].tolist() == [0]
+    assert limit["entries"].tolist() == [1]
+    assert limit["entry_price"].tolist() == [99.0]
+    assert limit["exits"].tolist() == [4] and limit["reason"] == [ex.EXIT_TIMEOUT]
+
+    # Limit tidak terisi dalam limit_expiry -> batal
+    unfilled = ex.simulate_trades(quiet_high, np.full(8, 99.5), close, atr, np.array([1, 0, 0, 0, 0, 0, 0, 0]), sma20=sma20, limit_expiry=3)
+    assert len(unfilled["entries"]) == 0
+
+    # Confidence di bawah ambang tidak membuka posisi
+    filtered = ex.simulate_trades(high, low, close, atr, actions, confidence=np.full(8, 40.0), min_confidence=50)
+    assert len(filtered["entries"]) == 0
+
+
+def reference_watcher(high, low, close, atr, actions, info, lot_size):
+    """Replay bar demi bar dengan aturan watcher (check_exit per bar)."""
+    pnls, position = [], None
+    for i in range(len(close)):
+        if position is not None:
+            price, reason = ex.check_exit(position["buy"], position["tp"], position["sl"], high[i], low[i])
+            if reason:
+                pnls.append(ex.net_pnl(position["entry"], price, position["buy"], lot_size, info["type"], info["lot_multiplier"]))
+                position = None
+            continue
+        if actions[i] in (1, 2) and i < len(close) - 1:
+            buy = actions[i] == 1
+            sl_dist = atr[i] * ex.sl_atr_mult(info["type"])
+            d = 1 if buy else -1
+            position = {"buy": buy, "entry": close[i], "sl": close[i] - d * sl_dist, "tp": close[i] + d * sl_dist * ex.TP_RATIO}
+    return pnls
+
+
+@pytest.mark.parametrize("info", [FOREX, STOCK])
+def test_backtest_matches_bar_by_bar_watcher_replay(info):
+    rng = np.random.default_rng(7)
+    n = 3000
+    scale = 0.001 if info is FOREX else 10
+    close = np.cumsum(rng.normal(0, scale, n)) + (1.1 if info is FOREX else 9000)
+    high = close + rng.uniform(0, scale, n)
+    low = close - rng.uniform(0, scale, n)
+    atr = np.full(n, scale)
+    actions = rng.choice([0, 0, 0, 1, 2], size=n)
+
+    sim = ex.run_execution_backtest(high, low, close, atr, actions, info, 1_000_000)
+    expected = reference_watcher(high, low, close, atr, actions, info, 1)
+    # Posisi terakhir yang ditutup paksa (timeout) tidak ada di replay watcher
+    done = [r != ex.EXIT_TIMEOUT for r in sim["reason"]]
+    assert np.round(np.array(expected[: sum(done)]), 2).tolist() == sim["pnl"][done].tolist()
+    assert sim["stats"]["total_trades"] == len(sim["pnl"])
+    # pnl dibulatkan per trade, saldo tidak
+    assert sim["equity"][-1] == pytest.approx(1_000_000 + sim["pnl"].sum(), abs=0.01 * len(sim["pnl"]))
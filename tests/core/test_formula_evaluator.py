@@ -0,0 +1,73 @@
+"""
+Tests for the vectorized formula compiler.
+"""
+import numpy as np
+import pandas as pd
+
+from src.core.formula_evaluator import (
+    compile_vector_formula,
+    evaluate_formula,
+    formula_fire_mask,
+    safe_eval,
+)
+
+
+def test_vector_formula_matches_scalar_evaluation():
+    rng = np.random.default_rng(7)
+    columns = {
+        "CLOSE": rng.uniform(90, 110, 500),
+        "RSI": rng.uniform(0, 100, 500),
+        "VOLUME": rng.uniform(0, 1000, 500),
+        "SMA20": rng.uniform(90, 110, 500),
+    }
+    formulas = [
+        "CLOSE > SMA20 AND RSI < 30",
+        "rsi < 20 OR volume > 900",
+        "NOT (CLOSE < 100)",
+        "95 < CLOSE < 105 and RSI >= 50",
+        "CLOSE - SMA20 > 2 * 1.5",
+    ]
+    for expr in formulas:
+        mask = evaluate_formula(expr, columns)
+        expected = [
+            bool(safe_eval(expr, {k: v[i] for k, v in columns.items()}))
+            for i in range(500)
+        ]
+        assert mask.dtype == bool
+        assert mask.tolist() == expected, expr
+
+
+def test_invalid_or_unknown_formula_is_all_false():
+    columns = {"CLOSE": [1.0, 2.0, 3.0]}
+    assert evaluate_formula("MACD > 1", columns).tolist() == [False] * 3
+    assert evaluate_formula("__import__('os')", columns).tolist() == [False] * 3
+    assert evaluate_formula("CLOSE >", columns).tolist() == [False] * 3
+    assert evaluate_formula("1 > 0", columns).tolist() == [True] * 3
+    assert compile_vector_formula("CLOSE > 1") is compile_vector_formula("CLOSE > 1")
+
+
+def test_fire_mask_marks_rising_edges_on_enriched_frame():
+    df = pd.DataFrame(
+        {
+            "Close": [10, 12, 13, 9, 14, 15],
+            "Volume": [1, 1, 1, 1, 1, 1],
+            "RSI_14": [np.nan, 25, 20, 40, 10, 10],
+        }
+    )
+    # SMA_20 tidak ada -> default 0
+    fired = formula_fire_mask("RSI < 30 AND CLOSE > SMA20", df)
+    assert fired.tolist() == [False, True, False, False, True, False]
+
+
+def test_pow_only_with_small_constant_exponent():
+    columns = {"CLOSE": [2.0, 3.0]}
+    assert evaluate_formula("CLOSE ** 2 > 5", columns).tolist() == [False, True]
+    assert safe_eval("CLOSE ** 2 > 5", {"CLOSE": 3}) is True
+    assert safe_eval("CLOSE ** -1 < 1", {"CLOSE": 3}) is True
+    # Eksponen besar / non-konstanta ditolak tanpa dihitung (tidak hang)
+    for expr in ("9**9**9**9 > 1", "CLOSE ** CLOSE > 1", "CLOSE ** 100 > 1"):
+        assert evaluate_formula(expr, columns).tolist() == [False, False], expr
+        assert safe_eval(expr, {"CLOSE": 3}) is False, expr
+    # Pangkat bertingkat dengan eksponen kecil: overflow float, bukan int raksasa
+    assert safe_eval("((((9**9)**9)**9)**9)**9 > 1", {}) is False
+    assert evaluate_formula("((((CLOSE**9)**9)**9)**9)**9 > 1", columns).tolist() == [True, True]
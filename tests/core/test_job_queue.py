@@ -0,0 +1,113 @@
+"""
+Tests for the process-pool job queue (coalescing, tiers, progress, cancel).
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.core import job_queue as jq
+
+
+def staged_job(progress, steps, delay):
+    for i in range(steps):
+        progress(int(i * 100 / steps), f"step {i}")
+        time.sleep(delay)
+    return {"steps": steps}
+
+
+def failing_job(progress):
+    return {"error": "Data historis tidak ditemukan"}
+
+
+@pytest.fixture
+def queue():
+    q = jq.JobQueue(max_workers=2)
+    yield q
+    q.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_are_coalesced(queue):
+    params = {"steps": 2, "delay": 0.05}
+    job, coalesced = queue.submit("demo", staged_job, params, "u1", "premium")
+    same, coalesced_again = queue.submit("demo", staged_job, dict(params), "u2", "premium")
+    other, _ = queue.submit("demo", staged_job, {"steps": 1, "delay": 0.0}, "u1", "premium")
+
+    assert not coalesced and coalesced_again
+    assert same is job and other is not job
+    assert job.owners == {"u1", "u2"}
+
+    await queue.wait(job, timeout=60)
+    await queue.wait(other, timeout=60)
+    assert job.status == jq.JOB_DONE and job.result == {"steps": 2}
+    assert job.to_dict()["result"] == {"steps": 2}
+    assert queue.stats()["active"] == 0
+
+    # Setelah selesai, request yang sama menjadi job baru
+    fresh, coalesced = queue.submit("demo", staged_job, params, "u1", "premium")
+    assert not coalesced and fresh is not job
+    await queue.wait(fresh, timeout=60)
+
+
+@pytest.mark.asyncio
+async def test_progress_and_cancel_running_job(queue):
+    job, _ = queue.submit("demo", staged_job, {"steps": 100, "delay": 0.05}, "u1", "free")
+
+    deadline = time.monotonic() + 60
+    while queue.get(job.id).progress == 0 and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    assert job.status == jq.JOB_RUNNING
+    assert job.stage.startswith("step")
+
+    assert queue.cancel(job, "u1")
+    await queue.wait(job, timeout=60)
+    assert job.status == jq.JOB_CANCELLED
+    assert not queue.cancel(job, "u1")
+
+
+@pytest.mark.asyncio
+async def test_tier_concurrency_and_queue_limits(queue, monkeypatch):
+    monkeypatch.setattr(jq, "MAX_JOBS_PER_USER", 2)
+    first, _ = queue.submit("demo", staged_job, {"steps": 5, "delay": 0.05}, "u1", "free")
+    second, _ = queue.submit("demo", staged_job, {"steps": 2, "delay": 0.0}, "u1", "free")
+    other, _ = queue.submit("demo", staged_job, {"steps": 5, "delay": 0.05}, "u2", "free")
+    with pytest.raises(jq.QueueFull):
+        queue.submit("demo", staged_job, {"steps": 3, "delay": 0.0}, "u1", "free")
+
+    await asyncio.sleep(0.2)
+    # Slot tier free berlaku per user: job kedua u1 antri, job u2 tetap jalan
+    assert first.status == jq.JOB_RUNNING
+    assert second.status == jq.JOB_QUEUED
+    assert other.status == jq.JOB_RUNNING
+
+    # Job yang masih antri dibatalkan tanpa menyentuh worker
+    queue.cancel(second, "u1")
+    await queue.wait(second, timeout=5)
+    assert second.status == jq.JOB_CANCELLED
+    await queue.wait(first, timeout=60)
+    await queue.wait(other, timeout=60)
+    assert queue._user_slots == {}
+
+
+@pytest.mark.asyncio
+async def test_job_error_is_reported(queue):
+    job, _ = queue.submit("demo", failing_job, {}, "u1", "enterprise")
+    await queue.wait(job, timeout=60)
+    assert job.status == jq.JOB_FAILED
+    assert job.error == "Data historis tidak ditemukan"
+    assert "result" not in job.to_dict()
+
+
+@pytest.mark.asyncio
+async def test_on_done_hook_runs_before_job_is_done(queue):
+    seen = []
+
+    async def on_done(job):
+        seen.append(job.status)
+        job.result["steps"] += 1
+
+    job, _ = queue.submit("demo", staged_job, {"steps": 1, "delay": 0.0}, "u1", "premium", on_done=on_done)
+    await queue.wait(job, timeout=60)
+    assert seen == [jq.JOB_RUNNING]
+    assert job.status == jq.JOB_DONE and job.result == {"steps": 2}
@@ -0,0 +1,58 @@
+"""
+Tests for bootstrap / Monte Carlo robustness analysis.
+"""
+import time
+
+import numpy as np
+
+from src.core import monte_carlo as mc
+
+
+def test_ten_thousand_paths_well_under_a_second():
+    rng = np.random.default_rng(1)
+    pnl = rng.normal(50, 1000, 500)
+
+    started = time.perf_counter()
+    report = mc.monte_carlo(pnl, 100_000, n_paths=10_000, seed=7)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 1.0
+    assert report["paths"] == 10_000 and report["trades"] == 500
+    ret = report["total_return_percent"]
+    assert ret["low"] < ret["median"] < ret["high"]
+    # Mean bootstrap return ~ total PnL asli
+    assert abs(ret["mean"] - pnl.sum() / 100_000 * 100) < 2.0
+    assert report["max_drawdown"]["low"] >= 0
+    assert 0 <= report["risk_of_ruin"] <= 100
+
+
+def test_reproducible_and_chunked(monkeypatch):
+    pnl = np.array([100.0, -50.0, 30.0, -20.0, 80.0])
+    full = mc.monte_carlo(pnl, 1000, n_paths=2000, seed=3)
+    assert full == mc.monte_carlo(pnl, 1000, n_paths=2000, seed=3)
+
+    # Chunk kecil menghasilkan distribusi yang sama (urutan sampling identik)
+    monkeypatch.setattr(mc, "MAX_CELLS", 37)
+    assert mc.monte_carlo(pnl, 1000, n_paths=2000, seed=3) == full
+
+
+def test_risk_of_ruin_and_gate():
+    losing = np.array([-300.0, -200.0, 50.0])
+    report = mc.monte_carlo(losing, 1000, n_paths=5000, ruin_drawdown=30.0, seed=1)
+    assert report["risk_of_ruin"] > 50
+    assert not mc.passes_monte_carlo(report)
+
+    winning = np.array([120.0, -40.0, 90.0, -30.0, 60.0])
+    report = mc.monte_carlo(winning, 10_000, n_paths=5000, seed=1)
+    assert report["risk_of_ruin"] == 0.0
+    assert report["profit_factor"]["median"] > 1
+    assert mc.passes_monte_carlo(report)
+
+    empty = mc.monte_carlo([], 1000)
+    assert empty["trades"] == 0 and not mc.passes_monte_carlo(empty)
+
+
+def test_all_winning_trades_cap_profit_factor():
+    report = mc.monte_carlo([10.0, 20.0], 1000, n_paths=100, seed=0)
+    assert report["profit_factor"]["median"] == mc.PROFIT_FACTOR_CAP
+    assert report["max_drawdown"]["high"] == 0.0
@@ -0,0 +1,63 @@
+"""
+Tests for the parameter sweep grid and ranking.
+"""
+import numpy as np
+import pytest
+
+from src.core import param_sweep as ps
+from src.core import vector_backtest as vb
+
+FOREX = {"type": "forex", "lot_multiplier": 100000}
+
+
+def test_expand_grid():
+    combos = ps.expand_grid({"sl_mult": [1.0, 2.0], "tp_ratio": [2.0], "min_confidence": [50, 70]})
+    assert len(combos) == 4
+    assert {"sl_mult": 2.0, "tp_ratio": 2.0, "min_confidence": 70} in combos
+    assert len(ps.expand_grid()) == 27
+    with pytest.raises(ValueError):
+        ps.expand_grid({"lot": [1]})
+
+
+def test_sweep_reuses_actions_and_ranks():
+    rng = np.random.default_rng(5)
+    n = 5000
+    close = np.cumsum(rng.normal(0, 1, n)) + 1000
+    high = close + rng.uniform(0, 2, n)
+    low = close - rng.uniform(0, 2, n)
+    atr = np.full(n, 1.5)
+    actions = rng.choice([0, 0, 0, 1, 2], size=n)
+    confidence = rng.uniform(30, 100, n)
+
+    combos = ps.expand_grid()
+    rows = ps.sweep_arrays(high, low, close, atr, actions, confidence, FOREX, combos, 1_000_000, sma20=close)
+    assert len(rows) == len(combos)
+
+    by_conf = {r["min_confidence"]: r["total_trades"] for r in rows if r["sl_mult"] == 2.0 and r["tp_ratio"] == 2.0}
+    assert by_conf[50] >= by_conf[60] >= by_conf[70] > 0
+
+    table = ps.rank_results([{"symbol": "X", **r} for r in rows] + [
+        {"symbol": "Y", "total_return_percent": 1e9, "total_trades": 1, "max_drawdown": 0.0}
+    ])
+    assert [r["rank"] for r in table] == list(range(1, len(rows) + 2))
+    # Terlalu sedikit trade -> paling bawah walau return tertinggi
+    assert table[-1]["symbol"] == "Y"
+    returns = [r["total_return_percent"] for r in table[:-1]]
+    assert returns == sorted(returns, reverse=True)
+
+
+class ProbPolicy:
+    """Policy tiruan tanpa get_distribution -> confidence 100."""
+
+
+class PlainModel:
+    policy = ProbPolicy()
+
+    def predict(self, obs, deterministic=True):
+        return np.ones(len(obs), dtype=np.int64), None
+
+
+def test_confidence_fallback_without_distribution():
+    actions, confidence = vb.predict_with_confidence(PlainModel(), np.zeros((10, 3), dtype=np.float32))
+    assert actions.tolist() == [1] * 10
+    assert confidence.tolist() == [100.0] * 10
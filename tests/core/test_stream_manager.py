@@ -0,0 +1,230 @@
+"""
+Tests for StreamManager batching, pending recovery and metrics.
+"""
+import json
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from src.core import stream_manager as sm  # noqa: E402
+
+
+def test_adaptive_batch_size_grows_and_shrinks():
+    manager = sm.StreamManager(consumer_name="test-1")
+    assert manager.batch_size == sm.MIN_BATCH_SIZE
+
+    manager._adapt_batch_size(sm.MIN_BATCH_SIZE)
+    assert manager.batch_size == sm.MIN_BATCH_SIZE * 2
+
+    for _ in range(20):
+        manager._adapt_batch_size(manager.batch_size)
+    assert manager.batch_size == sm.MAX_BATCH_SIZE
+
+    for _ in range(20):
+        manager._adapt_batch_size(0)
+    assert manager.batch_size == sm.MIN_BATCH_SIZE
+
+
+@pytest.mark.asyncio
+async def test_process_messages_acks_invalid_entries():
+    manager = sm.StreamManager(consumer_name="test-1")
+    fake_redis = MagicMock()
+    fake_redis.xack = AsyncMock(return_value=3)
+    fake_db = MagicMock()
+    fake_db.market_data.insert_many = AsyncMock()
+    fake_db.market_bars_live.bulk_write = AsyncMock()
+
+    messages = [
+        ("1700000000000-0", {"symbol": "BTC/USDT", "price": "65000.5", "volume": "2"}),
+        ("1700000000001-0", {"symbol": "ETH/USDT", "price": "oops"}),
+        ("1700000000002-0", {"symbol": "BBCA.JK", "price": "9000"}),
+    ]
+    # Interval 0: persist (snapshot) + ACK di setiap batch
+    with patch.object(sm, "redis_client", fake_redis), patch.object(sm, "db", fake_db), patch.object(
+        sm, "BAR_SNAPSHOT_INTERVAL", 0
+    ):
+        await manager.process_messages(messages, read_at=0)
+
+    # Tick dalam menit yang sama belum menghasilkan bar selesai
+    fake_db.market_data.insert_many.assert_not_awaited()
+    forming = {(b["symbol"], b["timeframe"]): b for b in manager.aggregator.snapshot()}
+    assert len(forming) == 2 * len(manager.aggregator.timeframes)
+    assert forming[("BBCA.JK", "1m")]["volume"] == 0.0
+    fake_redis.xack.assert_awaited_once_with(
+        sm.STREAM_KEY, sm.GROUP_NAME, *[m[0] for m in messages]
+    )
+    assert manager.metrics.acked == 3
+    assert manager.metrics.invalid == 1
+
+
+@pytest.mark.asyncio
+async def test_recover_pending_claims_until_cursor_wraps():
+    manager = sm.StreamManager(consumer_name="test-2")
+    fake_redis = MagicMock()
+    fake_redis.xautoclaim = AsyncMock(
+        side_effect=[
+            ["5-0", [("1-0", {"symbol": "A", "price": "1"}), ("2-0", None)], []],
+            ["0-0", [("3-0", {"symbol": "B", "price": "2"})], []],
+        ]
+    )
+    fake_redis.xack = AsyncMock()
+    fake_db = MagicMock()
+    fake_db.market_data.insert_many = AsyncMock()
+
+    with patch.object(sm, "redis_client", fake_redis), patch.object(sm, "db", fake_db):
+        await manager.recover_pending()
+
+    assert fake_redis.xautoclaim.await_count == 2
+    assert fake_redis.xautoclaim.await_args_list[1].kwargs["start_id"] == "5-0"
+    assert manager.metrics.claimed == 2
+    assert {b["symbol"] for b in manager.aggregator.snapshot()} == {"A", "B"}
+
+
+@pytest.mark.asyncio
+async def test_completed_bars_are_flushed_once():
+    manager = sm.StreamManager(consumer_name="test-3")
+    fake_redis = MagicMock()
+    fake_redis.xack = AsyncMock()
+    fake_db = MagicMock()
+    fake_db.market_data.insert_many = AsyncMock()
+    fake_db.market_bars_live.bulk_write = AsyncMock()
+
+    minute = 1_700_000_100_000  # awal bucket 5 menit (ms)
+    messages = [
+        (f"{minute}-0", {"symbol": "A", "price": "10", "volume": "1"}),
+        (f"{minute + 30_000}-0", {"symbol": "A", "price": "12", "volume": "2"}),
+        (f"{minute + 61_000}-0", {"symbol": "A", "price": "11", "volume": "1"}),
+    ]
+    with patch.object(sm, "redis_client", fake_redis), patch.object(sm, "db", fake_db):
+        await manager.process_messages(messages, read_at=0)
+        await manager.persist()
+        await manager.persist()
+
+    fake_db.market_data.insert_many.assert_awaited_once()
+    bars = fake_db.market_data.insert_many.await_args.args[0]
+    assert [(b["timeframe"], b["open"], b["high"], b["close"], b["volume"]) for b in bars] == [
+        ("1m", 10.0, 12.0, 12.0, 3.0)
+    ]
+    assert manager.metrics.bars_written == 1
+
+
+class FakeLiveBars:
+    """market_bars_live minimal: upsert per (symbol, timeframe, consumer)."""
+
+    def __init__(self):
+        self.docs = {}
+        self.fail = False
+
+    async def bulk_write(self, ops, ordered=False):
+        if self.fail:
+            raise RuntimeError("mongo down")
+        keep = set()
+        for op in ops:
+            if type(op).__name__ == "UpdateOne":
+                key = tuple(op._filter[k] for k in ("symbol", "timeframe", "consumer"))
+                self.docs[key] = op._doc["$set"]
+                keep.add(key)
+        self.docs = {k: v for k, v in self.docs.items() if k in keep}
+
+    def find(self, query):
+        docs = [d for d in self.docs.values() if d["consumer"] == query["consumer"]]
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(return_value=docs)
+        return cursor
+
+
+@pytest.mark.asyncio
+async def test_ticks_are_acked_only_after_persist_and_restored_after_crash():
+    fake_redis = MagicMock()
+    fake_redis.xack = AsyncMock()
+    fake_db = MagicMock()
+    fake_db.market_data.insert_many = AsyncMock()
+    fake_db.market_bars_live = FakeLiveBars()
+
+    first = sm.StreamManager(consumer_name="node-a")
+    messages = [
+        ("1700000100000-0", {"symbol": "A", "price": "10", "volume": "1"}),
+        ("1700000110000-0", {"symbol": "A", "price": "13", "volume": "2"}),
+    ]
+    with patch.object(sm, "redis_client", fake_redis), patch.object(sm, "db", fake_db):
+        await first.process_messages(messages, read_at=0)
+        # Belum dipersist -> belum di-ACK (crash di sini: tick diklaim ulang)
+        fake_redis.xack.assert_not_awaited()
+
+        # Mongo gagal: tetap tidak di-ACK, dicoba lagi di persist berikutnya
+        fake_db.market_bars_live.fail = True
+        with pytest.raises(RuntimeError):
+            await first.persist()
+        fake_redis.xack.assert_not_awaited()
+        fake_db.market_bars_live.fail = False
+
+        await first.persist()
+        fake_redis.xack.assert_awaited_once_with(sm.STREAM_KEY, sm.GROUP_NAME, *[m[0] for m in messages])
+        assert len(fake_db.market_bars_live.docs) == len(first.aggregator.timeframes)
+
+        # "Crash" lalu restart dengan nama consumer yang sama: bar terbentuk dipulihkan
+        second = sm.StreamManager(consumer_name="node-a")
+        await second.restore_bars()
+        await second.process_messages(
+            [("1700000200000-0", {"symbol": "A", "price": "9", "volume": "4"})], read_at=0
+        )
+        await second.persist()
+
+    bars = fake_db.market_data.insert_many.await_args.args[0]
+    one_minute = [b for b in bars if b["timeframe"] == "1m"]
+    assert [(b["open"], b["high"], b["low"], b["close"], b["volume"]) for b in one_minute] == [
+        (10.0, 13.0, 10.0, 13.0, 3.0)
+    ]
+    forming = {b["timeframe"]: b for b in second.aggregator.snapshot()}
+    assert forming["1h"]["open"] == 10.0 and forming["1h"]["volume"] == 7.0
+    # Snapshot hanya memuat bar yang masih terbentuk
+    assert {k[1] for k in fake_db.market_bars_live.docs} == set(second.aggregator.timeframes)
+
+
+@pytest.mark.asyncio
+async def test_publish_ticks_pipelines_in_chunks_with_trim():
+    manager = sm.StreamManager(consumer_name="test-4")
+    fake_redis = MagicMock()
+    fake_redis.xadd_many = AsyncMock(side_effect=lambda stream, chunk, **kw: ["id"] * len(chunk))
+
+    ticks = [{"symbol": "A", "price": 1.0} for _ in range(sm.PUBLISH_CHUNK_SIZE + 5)]
+    with patch.object(sm, "redis_client", fake_redis):
+        sent = await manager.publish_ticks(iter(ticks))
+
+    assert sent == len(ticks)
+    calls = fake_redis.xadd_many.await_args_list
+    assert [len(c.args[1]) for c in calls] == [sm.PUBLISH_CHUNK_SIZE, 5]
+    assert calls[0].args[1][0] == {"symbol": "A", "price": 1.0, "volume": 0}
+    assert calls[0].kwargs == {"maxlen": sm.STREAM_MAXLEN, "approximate": True}
+
+
+def test_trim_args_prefers_time_based_retention():
+    with patch.object(sm, "STREAM_RETENTION_MS", 60_000):
+        args = sm._trim_args()
+    assert "maxlen" not in args
+    assert args["minid"] <= int(sm.time.time() * 1000) - 60_000
+
+
+@pytest.mark.asyncio
+async def test_live_candle_fragments_are_published_per_batch():
+    manager = sm.StreamManager(consumer_name="test-5")
+    batch = MagicMock()
+    batch.execute = AsyncMock()
+    fake_redis = MagicMock()
+    fake_redis.xack = AsyncMock()
+    fake_redis.batch = MagicMock(return_value=batch)
+
+    messages = [
+        ("1700000100000-0", {"symbol": "A", "price": "10"}),
+        ("1700000101000-0", {"symbol": "A", "price": "11"}),
+    ]
+    with patch.object(sm, "redis_client", fake_redis), patch.object(sm, "db", MagicMock()):
+        await manager.process_messages(messages, read_at=0)
+
+    published = {c.args[0]: json.loads(c.args[1]) for c in batch.publish.call_args_list}
+    assert set(published) == {"candle:A:1m", "candle:A:5m", "candle:A:1h"}
+    assert published["candle:A:1m"][:7] == ["test-5", 1700000100, 10.0, 11.0, 10.0, 11.0, 0.0]
+    batch.execute.assert_awaited_once()
@@ -0,0 +1,155 @@
+"""
+Tests for the tick-driven TP/SL/limit trigger engine.
+"""
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import watcher  # noqa: E402
+from src.core import trigger_engine as te  # noqa: E402
+
+
+def make_signal(_id, symbol="BTC/USDT", status="OPEN", action="BUY", **extra):
+    sig = {"_id": _id, "symbol": symbol, "status": status, "action": action}
+    sig.update(extra)
+    return sig
+
+
+def test_level_book_bisects_triggered_levels():
+    book = te.LevelBook()
+    for i, level in enumerate([105, 101, 110, 103]):
+        book.add(te.SIDE_ABOVE, level, f"a{i}")
+    for i, level in enumerate([95, 99, 90]):
+        book.add(te.SIDE_BELOW, level, f"b{i}")
+
+    assert book.triggered(100, 100) == []
+    assert book.triggered(103, 103) == ["a1", "a3"]
+    assert book.triggered(97, 97) == ["b1"]
+
+    book.remove(te.SIDE_ABOVE, 101, "a1")
+    assert book.triggered(103, 103) == ["a3"]
+    assert len(book) == 6
+
+
+def test_tick_closes_and_fills_signals():
+    engine = te.TriggerEngine(watcher.evaluate_signal)
+    engine.load(
+        [
+            make_signal(1, price=100, tp=110, sl=95),
+            make_signal(2, action="SELL", price=100, tp=90, sl=105),
+            make_signal(3, status="PENDING", action="BUY LIMIT", price=98, tp=120, sl=90),
+            make_signal(4, symbol="ETH/USDT", price=10, tp=11, sl=9),
+            make_signal(5, status="WIN", price=100, tp=101, sl=99),
+        ]
+    )
+    assert len(engine) == 4
+
+    assert engine.on_tick("BTC/USDT", 101) == []
+
+    ops = engine.on_tick("BTC/USDT", 97.5)
+    by_id = {op._filter["_id"]: op._doc["$set"] for op in ops}
+    assert by_id[3]["status"] == "OPEN" and by_id[3]["fill_price"] == 98
+    assert set(by_id) == {3}
+    # Limit yang terisi kini dipantau sebagai posisi OPEN
+    assert engine.signals[3]["status"] == "OPEN"
+
+    ops = engine.on_tick("BTC/USDT", 106)
+    by_id = {op._filter["_id"]: op._doc["$set"] for op in ops}
+    assert by_id[2]["exit_reason"] == "SL Hit"
+    assert set(by_id) == {2}
+
+    ops = engine.on_tick("BTC/USDT", 89)
+    assert {op._filter["_id"] for op in ops} == {1, 3}
+    assert "BTC/USDT" not in engine.books
+    assert engine.fills == 1 and engine.closes == 3
+    assert set(engine.signals) == {4}
+
+
+@pytest.mark.asyncio
+async def test_process_messages_bulk_writes_and_marks_symbol_live():
+    engine = te.TriggerEngine(watcher.evaluate_signal)
+    engine.load([make_signal(1, price=100, tp=110, sl=95)])
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(return_value=MagicMock(modified_count=1))
+
+    messages = [
+        ("1-0", {"symbol": "BTC/USDT", "price": "104", "volume": "1"}),
+        ("2-0", {"symbol": "BTC/USDT", "price": "bad"}),
+        ("3-0", {"symbol": "BTC/USDT", "price": "111", "volume": "1"}),
+    ]
+    with patch.object(te, "signals_collection", collection):
+        assert await engine.process_messages(messages) == 1
+
+    ops = collection.bulk_write.await_args.args[0]
+    assert ops[0]._doc["$set"]["exit_reason"] == "TP Hit"
+    assert engine.is_live("BTC/USDT")
+    assert not engine.is_live("ETH/USDT")
+
+
+@pytest.mark.asyncio
+async def test_failed_write_keeps_signals_in_index():
+    engine = te.TriggerEngine(watcher.evaluate_signal)
+    engine.load(
+        [
+            make_signal(1, price=100, tp=110, sl=95),
+            make_signal(2, status="PENDING", action="BUY LIMIT", price=98, tp=120, sl=90),
+        ]
+    )
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(side_effect=RuntimeError("mongo down"))
+
+    with patch.object(te, "signals_collection", collection):
+        assert await engine.process_messages([("1-0", {"symbol": "BTC/USDT", "price": "89"})]) == 2
+
+    # Tidak ada yang tertulis -> indeks kembali ke state sebelum tick
+    assert engine.signals[1]["status"] == "OPEN"
+    assert engine.signals[2]["status"] == "PENDING"
+    assert {op._filter["_id"] for op in engine.on_tick("BTC/USDT", 89)} == {1, 2}
+
+
+@pytest.mark.asyncio
+async def test_ordered_write_error_reverts_remaining_ops():
+    engine = te.TriggerEngine(watcher.evaluate_signal)
+    engine.load(
+        [
+            make_signal(1, status="PENDING", action="BUY LIMIT", price=98, tp=120, sl=90),
+            make_signal(2, symbol="ETH/USDT", price=10, tp=11, sl=9),
+        ]
+    )
+    # Op 0 (fill #1) sukses, op 1 (close #1) gagal, op 2 (close #2) tidak dijalankan
+    error = BulkWriteError({"writeErrors": [{"index": 1, "code": 1, "errmsg": "x"}], "nModified": 1})
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock(side_effect=error)
+    messages = [
+        ("1-0", {"symbol": "BTC/USDT", "price": "97"}),
+        ("2-0", {"symbol": "BTC/USDT", "price": "89"}),
+        ("3-0", {"symbol": "ETH/USDT", "price": "12"}),
+    ]
+    with patch.object(te, "signals_collection", collection):
+        assert await engine.process_messages(messages) == 3
+
+    # Fill tertulis: #1 dipantau sebagai OPEN, close #1 dan #2 dipicu ulang
+    assert engine.signals[1]["status"] == "OPEN"
+    assert engine.signals[2]["status"] == "OPEN"
+    assert len(engine.on_tick("BTC/USDT", 89)) == 1
+    assert len(engine.on_tick("ETH/USDT", 12)) == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_signal_adds_and_removes():
+    engine = te.TriggerEngine(watcher.evaluate_signal)
+    collection = MagicMock()
+    collection.find_one = AsyncMock(return_value=make_signal(7, price=1, tp=2, sl=0.5))
+
+    with patch.object(te, "signals_collection", collection):
+        await engine.sync_signal(7)
+        assert 7 in engine.signals
+
+        collection.find_one.return_value = make_signal(7, status="LOSS", price=1, tp=2, sl=0.5)
+        await engine.sync_signal(7)
+        assert 7 not in engine.signals
+        assert engine.books == {}
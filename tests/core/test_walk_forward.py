@@ -0,0 +1,128 @@
+"""
+Tests for walk-forward validation with cached folds.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.core import walk_forward as wf
+
+FOREX = {"type": "forex", "lot_multiplier": 100000}
+
+
+class Space:
+    shape = (5,)
+
+
+class TrendModel:
+    """BUY saat fitur pertama > 0, SELL saat < 0."""
+
+    observation_space = Space()
+
+    def predict(self, obs, deterministic=True):
+        return np.where(obs[:, 0] > 0, 1, 2), None
+
+
+def frame(start="2024-01-01", periods=24 * 200, seed=1):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=periods, freq="h")
+    close = np.cumsum(rng.normal(0, 0.001, periods)) + 1.1
+    return pd.DataFrame(
+        {
+            "signal": rng.normal(0, 1, periods),
+            "Close": close,
+            "High": close + 0.0005,
+            "Low": close - 0.0005,
+            "ATR_14": 0.001,
+        },
+        index=index,
+    )
+
+
+def test_fold_windows_follow_calendar_months():
+    df = frame()
+    folds = wf.fold_windows(df.index, train_bars=24 * 40, max_folds=10)
+    assert len(folds) == 5  # Mar..Jul (Jan/Feb belum punya cukup bar train)
+    for train_start, test_start, test_end in folds:
+        assert test_start - train_start == 24 * 40
+        assert df.index[test_start].day == 1 and df.index[test_start].hour == 0
+    assert folds[-1][2] <= len(df)
+    assert len(wf.fold_windows(df.index, train_bars=24 * 40, max_folds=2)) == 2
+
+
+def test_short_history_scales_train_window(tmp_path):
+    # Crypto: fetch dibatasi 2000 bar, dropna membuang warm-up indikator
+    df = frame(periods=1950)
+    assert wf.fold_windows(df.index) == []
+
+    trained = []
+
+    def train_fn(train_df):
+        trained.append(len(train_df))
+        return TrendModel()
+
+    report = wf.run_walk_forward(df, FOREX, "BTC/USDT", train_fn=train_fn, cache_dir=str(tmp_path))
+    assert report["stats"]["folds"] >= 1
+    assert trained and all(n == len(df) // 2 for n in trained)
+
+
+def test_fixed_model_folds_start_at_oos_start(tmp_path):
+    df = frame()
+    cut = wf.oos_start(df.index, max_folds=3)
+    report = wf.run_walk_forward(
+        df, FOREX, "EURUSD=X", model=TrendModel(), config={"model": "sha"},
+        max_folds=3, cache_dir=str(tmp_path),
+    )
+    # Kandidat dilatih dengan df[:cut]; semua fold evaluasi ada setelahnya
+    assert report["stats"]["folds"] == 3
+    assert report["folds"][0]["start"] == str(df.index[cut])
+    assert wf.oos_start(df.index[:100]) is None
+
+
+def test_new_bars_only_compute_newest_fold(tmp_path):
+    df = frame()
+    trained = []
+
+    def train_fn(train_df):
+        trained.append((train_df.index[0], train_df.index[-1]))
+        return TrendModel()
+
+    kwargs = dict(train_fn=train_fn, config={"mode": "retrain"}, initial_balance=1_000_000,
+                  train_bars=24 * 40, max_folds=10, cache_dir=str(tmp_path))
+    first = wf.run_walk_forward(df.iloc[:-100], FOREX, "EURUSD=X", **kwargs)
+    assert first["computed"] == first["stats"]["folds"] == len(trained)
+
+    # Bar baru masuk ke bulan berjalan -> hanya fold terakhir dihitung ulang
+    trained.clear()
+    second = wf.run_walk_forward(df, FOREX, "EURUSD=X", **kwargs)
+    assert second["computed"] == 1 and len(trained) == 1
+    assert second["cached"] == second["stats"]["folds"] - 1
+    assert second["folds"][:-1] == first["folds"][: len(second["folds"]) - 1]
+
+    # Konfigurasi lain (misal timesteps) tidak memakai cache yang sama
+    other = wf.run_walk_forward(df, FOREX, "EURUSD=X", **{**kwargs, "config": {"mode": "retrain", "timesteps": 1}})
+    assert other["cached"] == 0
+
+
+def test_aggregate_chains_fold_equity(tmp_path):
+    df = frame()
+    report = wf.run_walk_forward(
+        df, FOREX, "EURUSD=X", model=TrendModel(), config={"model": "abc"},
+        initial_balance=1_000_000, train_bars=24 * 40, max_folds=10, cache_dir=str(tmp_path),
+    )
+    stats = report["stats"]
+    assert stats["total_trades"] == sum(f["total_trades"] for f in report["folds"])
+    assert stats["total_return"] == pytest.approx(sum(f["total_return"] for f in report["folds"]), abs=0.05)
+    assert "pnl" not in report["folds"][0]
+    assert len(report["pnl"]) == stats["total_trades"]
+
+    with pytest.raises(ValueError):
+        wf.run_walk_forward(df, FOREX, "EURUSD=X", cache_dir=str(tmp_path))
+
+
+def test_promotion_gate():
+    passing = {"stats": {"folds": 4, "total_return": 10.0, "profitable_folds": 0.75}}
+    assert wf.passes_walk_forward(passing)
+    assert not wf.passes_walk_forward({"stats": {**passing["stats"], "profitable_folds": 0.25}})
+    assert not wf.passes_walk_forward({"stats": {**passing["stats"], "total_return": -1.0}})
+    assert not wf.passes_walk_forward({"stats": {"folds": 0, "total_return": 0.0, "profitable_folds": 0.0}})
@@ -0,0 +1,210 @@
+"""
+Tests for the two-tier SmartCache (L1 memory + L2 Redis bytes).
+"""
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import msgpack
+import pytest
+
+from src.database import cache_manager
+from src.database.cache_manager import LocalCache, SmartCache
+
+
+def test_local_cache_lru_and_ttl():
+    cache = LocalCache(max_items=2, max_ttl=60)
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2, ttl=10)
+    cache.get("a")  # "a" jadi paling baru
+    cache.set("c", 3, ttl=10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    cache.set("d", 4, ttl=0)
+    assert cache.get("d") is None
+
+
+def test_local_cache_expiry():
+    cache = LocalCache(max_items=10, max_ttl=60)
+    with patch("src.database.cache_manager.time.monotonic", return_value=100.0):
+        cache.set("k", "v", ttl=5)
+    with patch("src.database.cache_manager.time.monotonic", return_value=106.0):
+        assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_smart_cache_l1_hit_skips_redis():
+    fake_client = MagicMock()
+    fake_client.get_bytes = AsyncMock(
+        return_value=msgpack.packb({"email": "a@b.c"}, use_bin_type=True)
+    )
+    with patch.object(cache_manager, "redis_client", fake_client), patch.object(
+        cache_manager, "local_cache", LocalCache()
+    ):
+        first = await SmartCache.get("auth:user:x")
+        second = await SmartCache.get("auth:user:x")
+
+    assert first == second == {"email": "a@b.c"}
+    fake_client.get_bytes.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_smart_cache_set_stores_raw_bytes_and_delete_publishes():
+    fake_client = MagicMock()
+    fake_client.set_bytes = AsyncMock()
+    fake_client.publish = AsyncMock()
+    batch = MagicMock()
+    batch.execute = AsyncMock()
+    fake_client.batch.return_value = batch
+    l1 = LocalCache()
+
+    with patch.object(cache_manager, "redis_client", fake_client), patch.object(
+        cache_manager, "local_cache", l1
+    ):
+        await SmartCache.set("auth:user:x", {"role": "user"}, ttl=600)
+        stored = fake_client.set_bytes.await_args.args[1]
+        assert isinstance(stored, bytes)
+        assert msgpack.unpackb(stored, raw=False) == {"role": "user"}
+        assert l1.get("auth:user:x") == {"role": "user"}
+        fake_client.publish.assert_awaited_once_with(cache_manager.INVALIDATION_CHANNEL, "auth:user:x")
+
+        await SmartCache.delete("auth:user:x")
+
+    assert l1.get("auth:user:x") is None
+    batch.delete.assert_called_once_with("auth:user:x")
+    batch.publish.assert_called_once_with(
+        cache_manager.INVALIDATION_CHANNEL, "auth:user:x"
+    )
+
+
+class InMemoryRedis:
+    """Pengganti redis_client minimal untuk get_or_compute."""
+
+    def __init__(self):
+        self.strings = {}
+        self.bytes = {}
+
+    async def get_bytes(self, key):
+        return self.bytes.get(key)
+
+    async def set_bytes(self, key, value, ex=None):
+        self.bytes[key] = value
+        return True
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def set(self, key, value, ex=None, nx=False, px=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = value
+        return True
+
+    async def delete(self, key):
+        return 1 if self.strings.pop(key, None) is not None else 0
+
+    async def publish(self, channel, message):
+        return 0
+
+    async def release_lock(self, key, token):
+        if self.strings.get(key) != token:
+            return 0
+        return await self.delete(key)
+
+
+@pytest.mark.asyncio
+async def test_overwrite_invalidates_l1_on_other_node():
+    redis = InMemoryRedis()
+    node_a, node_b = LocalCache(), LocalCache()
+
+    async def publish(channel, key):
+        # cache_invalidation_task di setiap node membuang L1 key ini
+        for l1 in (node_a, node_b):
+            l1.pop(key)
+
+    redis.publish = publish
+
+    with patch.object(cache_manager, "redis_client", redis):
+        with patch.object(cache_manager, "local_cache", node_a):
+            await SmartCache.set("profile:1", {"plan": "free"})
+        with patch.object(cache_manager, "local_cache", node_b):
+            assert await SmartCache.get("profile:1") == {"plan": "free"}
+        with patch.object(cache_manager, "local_cache", node_a):
+            await SmartCache.set("profile:1", {"plan": "premium"})
+        with patch.object(cache_manager, "local_cache", node_b):
+            assert await SmartCache.get("profile:1") == {"plan": "premium"}
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_single_flight_on_miss():
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    with patch.object(cache_manager, "redis_client", InMemoryRedis()), patch.object(
+        cache_manager, "local_cache", LocalCache()
+    ):
+        results = await asyncio.gather(
+            *[SmartCache.get_or_compute("chart:BTC", 60, compute) for _ in range(20)]
+        )
+        cached = await SmartCache.get_or_compute("chart:BTC", 60, compute)
+
+    assert calls == 1
+    assert all(r == {"value": 42} for r in results)
+    assert cached == {"value": 42}
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_serves_stale_while_refreshing():
+    fake = InMemoryRedis()
+    l1 = LocalCache()
+    stale = {"v": "old", "d": 0.01, "e": time.time() - 1}
+    fake.bytes["dash"] = msgpack.packb(stale, use_bin_type=True)
+
+    with patch.object(cache_manager, "redis_client", fake), patch.object(
+        cache_manager, "local_cache", l1
+    ):
+        value = await SmartCache.get_or_compute("dash", 60, lambda: "new")
+        assert value == "old"
+        # Biarkan refresh background selesai
+        await asyncio.sleep(0.01)
+        value = await SmartCache.get_or_compute("dash", 60, lambda: "newer")
+
+    assert value == "new"
+    assert "lock:dash" not in fake.strings
+
+
+@pytest.mark.asyncio
+async def test_lock_taken_over_after_expiry_is_not_released():
+    fake = InMemoryRedis()
+
+    def compute():
+        # Lock kita expire dan diambil worker lain selama compute
+        fake.strings["lock:slow"] = "other-worker"
+        return "value"
+
+    with patch.object(cache_manager, "redis_client", fake), patch.object(
+        cache_manager, "local_cache", LocalCache()
+    ):
+        assert await SmartCache.get_or_compute("slow", 60, compute) == "value"
+
+    assert fake.strings["lock:slow"] == "other-worker"
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_does_not_cache_none():
+    fake = InMemoryRedis()
+    with patch.object(cache_manager, "redis_client", fake), patch.object(
+        cache_manager, "local_cache", LocalCache()
+    ):
+        assert await SmartCache.get_or_compute("auth:user:missing", 60, lambda: None) is None
+
+    assert fake.bytes == {}
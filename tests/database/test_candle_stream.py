@@ -0,0 +1,96 @@
+"""
+Tests for live candle merging and the chart stream protocol.
+"""
+import json
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from src.database import candle_stream as cs  # noqa: E402
+from src.database import socket_manager as sm  # noqa: E402
+
+from tests.database.test_socket_manager import FakeWebSocket, settle  # noqa: E402
+
+
+def frag(consumer, t, o, h, l, c, v, ot, ct, closed=0):
+    return [consumer, t, o, h, l, c, v, ot, ct, closed]
+
+
+def test_live_candle_merges_consumer_fragments():
+    candle = cs.LiveCandle()
+    assert candle.apply(frag("a", 60, 10, 12, 9, 11, 1, 61, 70)) == [("u", [60, 10, 12, 9, 11, 1])]
+    # Consumer kedua punya tick lebih awal (open) dan lebih akhir (close)
+    events = candle.apply(frag("b", 60, 8, 13, 8.5, 12, 2, 60.5, 75))
+    assert events == [("u", [60, 8, 13, 8.5, 12, 3])]
+
+    # Bucket baru menutup bucket lama yang belum ditutup semua consumer
+    events = candle.apply(frag("a", 120, 12, 12, 12, 12, 1, 121, 121))
+    assert events == [("c", [60, 8, 13, 8.5, 12, 3]), ("u", [120, 12, 12, 12, 12, 1])]
+
+    # Fragmen terlambat diabaikan
+    assert candle.apply(frag("b", 60, 1, 1, 1, 1, 1, 60, 60)) == []
+
+
+def test_live_candle_closes_when_all_fragments_closed():
+    candle = cs.LiveCandle()
+    candle.apply(frag("a", 60, 10, 10, 10, 10, 1, 61, 61))
+    (kind, bar), = candle.apply(frag("a", 60, 10, 11, 10, 11, 2, 61, 65, closed=1))
+    assert kind == "c" and bar == [60, 10, 11, 10, 11, 2]
+    # Bucket berikutnya tidak mengirim "c" dua kali
+    assert [k for k, _ in candle.apply(frag("a", 120, 11, 11, 11, 11, 1, 121, 121))] == ["u"]
+
+
+@pytest.mark.asyncio
+async def test_subscribe_candles_sends_snapshot_then_deltas():
+    manager = sm.ConnectionManager()
+    ws = FakeWebSocket()
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[])
+    fake_db = MagicMock()
+    fake_db.market_data.aggregate = MagicMock(return_value=cursor)
+
+    with patch.object(sm, "manager", manager), patch.object(cs, "db", fake_db):
+        await manager.connect(ws)
+        await sm.handle_stream_message(
+            ws, json.dumps({"action": "subscribe_candles", "symbols": ["BTC"], "timeframe": "1m"})
+        )
+        assert "candle:BTC:1m" in manager.wanted_channels()
+
+        sm._dispatch("candle:BTC:1m", json.dumps(frag("a", 60, 10, 12, 9, 11, 1, 61, 70)))
+        await settle()
+
+    snapshot, state, delta = [json.loads(t) for t in ws.sent]
+    assert snapshot["type"] == "candles" and snapshot["bars"] == []
+    assert state == {"type": "candles_subscribed", "candles": [["BTC", "1m"]]}
+    assert delta == ["u", "BTC", "1m", 60, 10, 12, 9, 11, 1]
+
+    manager.disconnect(ws)
+    assert "candle:BTC:1m" not in cs.live_candles
+
+
+@pytest.mark.asyncio
+async def test_malformed_frames_get_error_replies():
+    manager = sm.ConnectionManager()
+    ws = FakeWebSocket()
+    frames = [
+        {"action": "subscribe_candles", "symbols": ["BTC"], "limit": "abc"},
+        {"action": "subscribe_candles", "symbols": ["BTC"], "limit": 0},
+        {"action": "subscribe_candles", "symbols": ["BTC"], "timeframe": ["1m"]},
+        {"action": "subscribe", "symbols": "BTC/USDT"},
+        {"action": "subscribe", "symbols": ["BTC", 1]},
+        ["not", "an", "object"],
+    ]
+    with patch.object(sm, "manager", manager):
+        await manager.connect(ws)
+        for frame in frames:
+            await sm.handle_stream_message(ws, json.dumps(frame))
+        await settle()
+
+    replies = [json.loads(t) for t in ws.sent]
+    assert len(replies) == len(frames)
+    assert all(r["type"] == "error" for r in replies)
+    assert manager.active_connections == {}
+    manager.disconnect(ws)
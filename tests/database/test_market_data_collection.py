@@ -0,0 +1,61 @@
+"""
+Tests for the market_data time-series setup.
+"""
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from src.database import database  # noqa: E402
+
+
+def fake_database(existing):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=existing)
+    fake = MagicMock()
+    fake.list_collections = AsyncMock(return_value=cursor)
+    fake.create_collection = AsyncMock()
+    fake.command = AsyncMock()
+    fake.market_data.create_index = AsyncMock()
+    fake.market_bars_live.create_index = AsyncMock()
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_creates_timeseries_collection_with_retention():
+    fake = fake_database([])
+    await database.ensure_market_data_collection(fake)
+
+    fake.create_collection.assert_awaited_once_with(
+        "market_data",
+        timeseries=database.MARKET_DATA_TIMESERIES,
+        expireAfterSeconds=database.MARKET_DATA_RETENTION_DAYS * 86400,
+    )
+    fake.market_data.create_index.assert_awaited_once_with(
+        [("symbol", 1), ("timeframe", 1), ("timestamp", 1)]
+    )
+
+
+@pytest.mark.asyncio
+async def test_regular_collection_is_left_for_migration():
+    fake = fake_database([{"name": "market_data", "type": "collection"}])
+    await database.ensure_market_data_collection(fake)
+
+    fake.create_collection.assert_not_awaited()
+    fake.command.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_retention_is_synced_on_existing_timeseries():
+    fake = fake_database(
+        [{"name": "market_data", "type": "timeseries", "options": {"expireAfterSeconds": 60}}]
+    )
+    await database.ensure_market_data_collection(fake)
+
+    fake.command.assert_awaited_once_with(
+        "collMod",
+        "market_data",
+        expireAfterSeconds=database.MARKET_DATA_RETENTION_DAYS * 86400,
+    )
@@ -0,0 +1,63 @@
+"""
+Tests for the cross-node WebSocket presence registry.
+"""
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.database import presence as presence_module
+from src.database.redis_client import RedisManager
+from src.database.socket_manager import ConnectionManager
+
+from tests.database.test_redis_batch import FakeRedis
+from tests.database.test_socket_manager import FakeWebSocket
+
+
+@pytest.mark.asyncio
+async def test_publish_writes_symbol_counts_and_heartbeat():
+    manager = ConnectionManager()
+    a, b = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(a)
+    await manager.connect(b)
+    manager.subscribe(a, ["BTC", "ETH"])
+    manager.subscribe(b, ["BTC"])
+
+    fake = FakeRedis()
+    redis = RedisManager()
+    redis.redis = fake
+    registry = presence_module.PresenceRegistry(manager, node_id="node-1")
+    with patch.object(presence_module, "redis_client", redis):
+        await registry.publish()
+
+    assert fake.round_trips == 1
+    ops = {(name, args[0]): (args, kwargs) for name, args, kwargs in fake.executed}
+    assert ops[("hset", "ws:presence:node-1")][1]["mapping"] == {"BTC": 2, "ETH": 1}
+    assert ops[("hset", "ws:node:node-1")][1]["mapping"]["connections"] == 2
+    assert "node-1" in ops[("zadd", "ws:nodes")][0][1]
+    manager.disconnect(a)
+    manager.disconnect(b)
+
+
+@pytest.mark.asyncio
+async def test_cluster_presence_aggregates_live_nodes():
+    fake = MagicMock()
+    fake.zremrangebyscore = AsyncMock(return_value=1)
+    fake.zrangebyscore = AsyncMock(return_value=["n1", "n2"])
+    fake.hgetall_many = AsyncMock(
+        return_value=[
+            {"connections": "3", "symbols": "2"},
+            {"connections": "5", "symbols": "1"},
+            {"BTC": "2", "ETH": "1"},
+            {"BTC": "5"},
+        ]
+    )
+    with patch.object(presence_module, "redis_client", fake):
+        result = await presence_module.cluster_presence()
+
+    assert result["connections"] == 8
+    assert result["symbols"]["BTC"] == {"listeners": 7, "nodes": ["n1", "n2"]}
+    assert result["symbols"]["ETH"] == {"listeners": 1, "nodes": ["n1"]}
+    # Node yang heartbeat-nya kedaluwarsa dibersihkan lebih dulu
+    cutoff = fake.zremrangebyscore.await_args.args[2]
+    assert cutoff <= time.time() - presence_module.NODE_TTL + 1
@@ -0,0 +1,109 @@
+"""
+Tests for RedisManager batching (pipeline, HMGET, MGET).
+"""
+import json
+
+import pytest
+
+from src.database.redis_client import RedisManager
+
+
+class FakePipeline:
+    def __init__(self, owner):
+        self.owner = owner
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        self.owner.round_trips += 1
+        self.owner.executed.extend(self.commands)
+        return [True] * len(self.commands)
+
+
+class FakeRedis:
+    def __init__(self, hash_data=None, strings=None):
+        self.round_trips = 0
+        self.executed = []
+        self.hash_data = hash_data or {}
+        self.strings = strings or {}
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+    async def hmget(self, name, keys):
+        self.round_trips += 1
+        return [self.hash_data.get(k) for k in keys]
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.strings.get(k) for k in keys]
+
+
+def make_manager(fake):
+    manager = RedisManager()
+    manager.redis = fake
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_set_signal_single_round_trip():
+    fake = FakeRedis()
+    manager = make_manager(fake)
+
+    await manager.set_signal("BBCA.JK", {"Symbol": "BBCA.JK", "Action": "BUY", "Seq": 7})
+
+    assert fake.round_trips == 1
+    (name, args, _kwargs), = fake.executed
+    assert name == "eval"
+    numkeys = args[1]
+    keys, argv = args[2 : 2 + numkeys], args[2 + numkeys :]
+    assert keys == ("market_signals", "market_signals:seq", "market_signals:changes")
+    assert argv[0] == "BBCA.JK"
+    # Seq dari caller dibuang; server yang memberi nomor urut
+    assert json.loads(argv[1]) == {"Symbol": "BBCA.JK", "Action": "BUY"}
+
+
+@pytest.mark.asyncio
+async def test_batch_coalesces_signals_into_one_script_call():
+    fake = FakeRedis()
+    manager = make_manager(fake)
+
+    batch = manager.batch()
+    for i in range(20):
+        batch.set_signal(f"SYM{i}", {"Symbol": f"SYM{i}", "Action": "HOLD"})
+    batch.set_signal("SYM0", {"Symbol": "SYM0", "Action": "BUY"})
+    batch.setex("active_trade:SYM1", 3600, "OPEN")
+    await batch.execute()
+
+    assert fake.round_trips == 1
+    assert [c[0] for c in fake.executed] == ["eval", "setex"]
+    argv = fake.executed[0][1][5:]
+    assert len(argv) == 40
+    assert json.loads(argv[1])["Action"] == "BUY"
+    assert len(batch) == 0
+
+    # Batch kosong tidak menyentuh Redis
+    await batch.execute()
+    assert fake.round_trips == 1
+
+
+@pytest.mark.asyncio
+async def test_get_signals_and_mget_bulk():
+    fake = FakeRedis(
+        hash_data={"BTC/USDT": json.dumps({"Action": "SELL"})},
+        strings={"active_trade:BTC/USDT": "OPEN"},
+    )
+    manager = make_manager(fake)
+
+    signals = await manager.get_signals(["BTC/USDT", "ETH/USDT", "BTC/USDT"])
+    flags = await manager.mget(["active_trade:BTC/USDT", "active_trade:ETH/USDT"])
+
+    assert fake.round_trips == 2
+    assert signals == {"BTC/USDT": {"Action": "SELL"}, "ETH/USDT": None}
+    assert flags == {"active_trade:BTC/USDT": "OPEN", "active_trade:ETH/USDT": None}
@@ -0,0 +1,105 @@
+"""
+Tests for the in-process market_signals mirror.
+"""
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.database import signal_bus as signal_bus_module
+from src.database.signal_bus import SIGNAL_RESET_CHANNEL, InternalSignalBus
+
+
+def pmessage(channel, data):
+    return {"type": "pmessage", "channel": channel, "data": json.dumps(data)}
+
+
+def test_mirror_applies_per_symbol_messages_and_reset():
+    bus = InternalSignalBus()
+    mirror = bus.mirror
+
+    mirror._handle(pmessage("signal:BBCA.JK", {"Action": "BUY"}))
+    mirror._handle(pmessage("signal:all", {"Symbol": "IGNORED", "Action": "SELL"}))
+    mirror._handle(pmessage("signal:BTC/USDT", {"Action": "HOLD"}))
+
+    assert mirror.snapshot() == {
+        "BBCA.JK": {"Action": "BUY"},
+        "BTC/USDT": {"Action": "HOLD"},
+    }
+
+    mirror._handle({"type": "message", "channel": SIGNAL_RESET_CHANNEL, "data": "1"})
+    assert mirror.snapshot() == {}
+
+
+@pytest.mark.asyncio
+async def test_reads_served_from_mirror_when_ready():
+    bus = InternalSignalBus()
+    bus.mirror.apply("EURUSD=X", {"Action": "SELL"})
+    bus.mirror.ready = True
+
+    fake_client = AsyncMock()
+    with patch.object(signal_bus_module, "redis_client", fake_client):
+        assert await bus.get_signal("EURUSD=X") == {"Action": "SELL"}
+        assert await bus.get_signals(["EURUSD=X", "GBPUSD=X"]) == {
+            "EURUSD=X": {"Action": "SELL"},
+            "GBPUSD=X": None,
+        }
+        assert await bus.get_all_signals() == {"EURUSD=X": {"Action": "SELL"}}
+
+    fake_client.get_signal.assert_not_called()
+    fake_client.get_all_signals.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_reads_fall_back_to_redis_when_not_ready():
+    bus = InternalSignalBus()
+    fake_client = AsyncMock()
+    fake_client.get_all_signals.return_value = {"X": {"Action": "HOLD"}}
+
+    with patch.object(signal_bus_module, "redis_client", fake_client):
+        assert await bus.get_all_signals() == {"X": {"Action": "HOLD"}}
+
+    fake_client.get_all_signals.assert_awaited_once()
+
+
+def test_mirror_delta_sync_returns_only_changed_symbols():
+    bus = InternalSignalBus()
+    mirror = bus.mirror
+    mirror.load(
+        {
+            "signals": {"A": {"Seq": 1}, "B": {"Seq": 2}},
+            "seq": 2,
+            "floor": 0,
+            "versions": [("A", 1), ("B", 2)],
+        }
+    )
+
+    # Pesan yang sudah tercakup snapshot diabaikan
+    mirror._handle(pmessage("signal:B", {"Seq": 2, "Action": "OLD"}))
+    mirror._handle(pmessage("signal:C", {"Seq": 3, "Action": "BUY"}))
+    mirror._handle(pmessage("signal:A", {"Seq": 4, "Action": "SELL"}))
+
+    delta = mirror.changes_since(2)
+    assert delta["full"] is False
+    assert delta["seq"] == 4
+    assert delta["signals"] == {
+        "A": {"Seq": 4, "Action": "SELL"},
+        "C": {"Seq": 3, "Action": "BUY"},
+    }
+    assert mirror.changes_since(4)["signals"] == {}
+    assert mirror.get("B") == {"Seq": 2}
+
+
+def test_mirror_delta_sync_full_snapshot_after_reset():
+    mirror = InternalSignalBus().mirror
+    mirror._handle(pmessage("signal:A", {"Seq": 1}))
+    mirror._handle({"type": "message", "channel": SIGNAL_RESET_CHANNEL, "data": "2"})
+    mirror._handle(pmessage("signal:B", {"Seq": 3}))
+
+    stale_client = mirror.changes_since(1)
+    assert stale_client["full"] is True
+    assert stale_client["signals"] == {"B": {"Seq": 3}}
+
+    # Klien dari epoch lain (seq di masa depan) juga dapat snapshot
+    assert mirror.changes_since(50)["full"] is True
+    assert mirror.changes_since(2) == {"seq": 3, "full": False, "signals": {"B": {"Seq": 3}}}
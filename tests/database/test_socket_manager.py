@@ -0,0 +1,193 @@
+"""
+Tests for WebSocket fan-out with per-connection send queues.
+"""
+import asyncio
+import json
+import os
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from src.database import socket_manager as sm  # noqa: E402
+
+
+class FakeWebSocket:
+    def __init__(self, blocked: bool = False):
+        self.sent = []
+        self.closed_code = None
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.closed_code = code
+
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_delay_others():
+    manager = sm.ConnectionManager()
+    fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+    await manager.connect(fast, "BTC", sm.POLICY_DROP_OLDEST)
+    await manager.connect(slow, "BTC", sm.POLICY_DROP_OLDEST)
+
+    for i in range(3):
+        await manager.broadcast("BTC", {"i": i})
+        await settle()
+
+    assert fast.sent == ['{"i": 0}', '{"i": 1}', '{"i": 2}']
+    assert slow.sent == []
+
+    slow.gate.set()
+    await settle()
+    assert slow.sent == fast.sent
+    manager.disconnect(fast, "BTC")
+    manager.disconnect(slow, "BTC")
+
+
+@pytest.mark.asyncio
+async def test_payload_is_serialized_once():
+    manager = sm.ConnectionManager()
+    sockets = [FakeWebSocket(blocked=True) for _ in range(3)]
+    for ws in sockets:
+        await manager.connect(ws, "ETH")
+
+    await manager.broadcast("ETH", {"Symbol": "ETH"})
+    texts = [next(iter(c._queue.values())) for c in manager.active_connections["ETH"].values()]
+    assert all(t is texts[0] for t in texts)
+    for ws in sockets:
+        manager.disconnect(ws, "ETH")
+
+
+def test_drop_oldest_and_coalesce_policies():
+    ws = FakeWebSocket()
+    drop = sm.ClientConnection(ws, sm.POLICY_DROP_OLDEST, max_queue=2)
+    for i in range(4):
+        drop.send(str(i), key="A")
+    assert list(drop._queue.values()) == ["2", "3"]
+    assert drop.dropped == 2
+
+    coalesce = sm.ClientConnection(ws, sm.POLICY_COALESCE, max_queue=2)
+    for i in range(4):
+        coalesce.send(str(i), key="A")
+    coalesce.send("b", key="B")
+    assert list(coalesce._queue.values()) == ["3", "b"]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_evicts_slow_client():
+    manager = sm.ConnectionManager()
+    ws = FakeWebSocket(blocked=True)
+    await manager.connect(ws, "SOL", sm.POLICY_DISCONNECT)
+    client = manager.active_connections["SOL"][ws]
+    client.max_queue = 2
+
+    for i in range(5):
+        manager.broadcast_text("SOL", str(i))
+        await settle()
+
+    assert client.evicted
+    assert "SOL" not in manager.active_connections
+    assert ws.closed_code == 1013
+
+
+@pytest.mark.asyncio
+async def test_broadcast_to_many_subscribers_does_not_wait_for_io():
+    manager = sm.ConnectionManager()
+    sockets = [FakeWebSocket(blocked=True) for _ in range(10_000)]
+    for ws in sockets:
+        await manager.connect(ws, "BTC")
+
+    started = time.perf_counter()
+    await manager.broadcast("BTC", {"Symbol": "BTC", "Price": 1})
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 1.0
+    assert manager.stats()["queued"] == 10_000
+    for ws in sockets:
+        manager.disconnect(ws, "BTC")
+    await settle()
+
+
+class FakePubSub:
+    def __init__(self):
+        self.channels = set()
+        self.calls = []
+
+    async def subscribe(self, *channels):
+        self.calls.append(("subscribe", set(channels)))
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.calls.append(("unsubscribe", set(channels)))
+        self.channels.difference_update(channels)
+
+
+@pytest.mark.asyncio
+async def test_redis_subscriptions_are_reference_counted():
+    manager = sm.ConnectionManager()
+    pubsub = FakePubSub()
+    syncer = asyncio.create_task(manager.sync_subscriptions(pubsub))
+    a, b = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(a)
+    await manager.connect(b)
+
+    manager.subscribe(a, ["BTC", "ETH"])
+    manager.subscribe(b, ["BTC"])
+    await settle()
+    assert pubsub.channels == {"signal:BTC", "signal:ETH"}
+
+    manager.unsubscribe(a, ["BTC"])
+    await settle()
+    assert pubsub.channels == {"signal:BTC", "signal:ETH"}
+
+    manager.disconnect(b)
+    await settle()
+    assert pubsub.channels == {"signal:ETH"}
+    assert pubsub.calls[-1] == ("unsubscribe", {"signal:BTC"})
+
+    manager.disconnect(a)
+    await settle()
+    assert pubsub.channels == set()
+    syncer.cancel()
+
+
+@pytest.mark.asyncio
+async def test_stream_protocol_subscribe_sends_snapshot():
+    manager = sm.ConnectionManager()
+    ws = FakeWebSocket()
+    fake_bus = MagicMock()
+    fake_bus.get_signals = AsyncMock(return_value={"BTC": {"Symbol": "BTC"}, "ETH": None})
+
+    with patch.object(sm, "manager", manager), patch.object(sm, "signal_bus", fake_bus):
+        await manager.connect(ws)
+        await sm.handle_stream_message(
+            ws, json.dumps({"action": "subscribe", "symbols": ["BTC", "ETH"]})
+        )
+        await sm.handle_stream_message(ws, json.dumps({"action": "unsubscribe", "symbols": ["ETH"]}))
+        await sm.handle_stream_message(ws, "not json")
+        await settle()
+
+    assert [json.loads(t) for t in ws.sent] == [
+        {"type": "subscribed", "symbols": ["BTC", "ETH"]},
+        {"Symbol": "BTC"},
+        {"type": "subscribed", "symbols": ["BTC"]},
+        {"type": "error", "detail": "Invalid message"},
+    ]
+    fake_bus.get_signals.assert_awaited_once_with(["BTC", "ETH"])
+    assert set(manager.active_connections) == {"BTC"}
+    manager.disconnect(ws)
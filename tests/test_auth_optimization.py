@@ -100,7 +100,10 @@ async def run_tests():
                 "daily_requests_limit": 100,
                 "role": "user"
             }
-            mock_smart_cache.get.return_value = None
+            async def compute_passthrough(key, ttl, fn):
+                return await fn()
+
+            mock_smart_cache.get_or_compute.side_effect = compute_passthrough
             mock_users_collection.find_one.return_value = sample_user
             mock_users_collection.find_one_and_update.return_value = sample_user
 
@@ -118,7 +121,8 @@ async def run_tests():
                 "daily_requests_limit": 10,
                 "role": "user"
             }
-            mock_smart_cache.get.return_value = auth_mod.serialize_user(stale_user)
+            mock_smart_cache.get_or_compute.side_effect = None
+            mock_smart_cache.get_or_compute.return_value = auth_mod.serialize_user(stale_user)
             mock_users_collection.find_one_and_update.return_value = None
             mock_users_collection.find_one.return_value = stale_user
 
@@ -0,0 +1,91 @@
+"""
+Tests for the grouped, bulk price polling in watcher.py.
+"""
+import os
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import watcher  # noqa: E402
+from src.core import trigger_engine as te  # noqa: E402
+
+
+def make_signal(_id, symbol, status="OPEN", action="BUY", **extra):
+    sig = {"_id": _id, "symbol": symbol, "status": status, "action": action}
+    sig.update(extra)
+    return sig
+
+
+@pytest.mark.asyncio
+async def test_check_positions_fetches_each_symbol_once_and_bulk_writes():
+    signals = [
+        make_signal(1, "EURUSD=X", price=1.1, tp=1.2, sl=1.0),
+        make_signal(2, "EURUSD=X", price=1.1, tp=1.15, sl=1.05),
+        make_signal(3, "BTC/USDT", status="PENDING", price=60000),
+        make_signal(4, "NOPRICE.JK", price=1000, tp=1100, sl=900),
+    ]
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=signals)
+    collection = MagicMock()
+    collection.find = MagicMock(return_value=cursor)
+    collection.bulk_write = AsyncMock(return_value=MagicMock(modified_count=2))
+
+    prices = {
+        "EURUSD=X": {"Close": 1.16, "High": 1.17, "Low": 1.09},
+        "BTC/USDT": {"Close": 59000.0, "High": 61000.0, "Low": 59000.0},
+    }
+    fetch = AsyncMock(return_value=prices)
+    with patch.object(watcher, "signals_collection", collection), patch.object(
+        te, "signals_collection", collection
+    ), patch.object(watcher, "fetch_live_prices", fetch):
+        await watcher.check_positions()
+
+    fetch.assert_awaited_once()
+    assert sorted(fetch.await_args.args[0]) == ["BTC/USDT", "EURUSD=X", "NOPRICE.JK"]
+    collection.bulk_write.assert_awaited_once()
+    ops = collection.bulk_write.await_args.args[0]
+    by_id = {op._filter["_id"]: op._doc["$set"] for op in ops}
+    assert set(by_id) == {2, 3}
+    assert by_id[2]["exit_reason"] == "TP Hit" and by_id[2]["status"] == "WIN"
+    assert by_id[3]["status"] == "OPEN" and by_id[3]["fill_price"] == 60000
+
+
+def test_evaluate_signal_closes_stock_positions():
+    now = datetime.now(timezone.utc)
+    sig = make_signal(1, "BBCA.JK", price=9000, tp=9500, sl=8800, asset_type="stock_indo", lot_size_num=10)
+    op = watcher.evaluate_signal(sig, {"Close": 8790, "High": 9010, "Low": 8790}, now)
+    assert op._doc["$set"]["exit_reason"] == "SL Hit"
+    assert op._doc["$set"]["status"] == "LOSS"
+    assert op._filter == {"_id": 1, "status": "OPEN"}
+
+
+@pytest.mark.asyncio
+async def test_crypto_prices_use_last_1m_bar_with_exchange_fallback():
+    binance = MagicMock()
+    binance.load_markets = AsyncMock(return_value={"BTC/USDT": {}, "CKB/USDC": {}})
+    binance.fetch_ohlcv = AsyncMock(
+        side_effect=lambda symbol, tf, limit: (
+            [[0, 99, 100, 98, 99.5, 1], [1, 99.5, 101, 99, 100.5, 1]] if symbol == "BTC/USDT" else []
+        )
+    )
+    bybit = MagicMock()
+    bybit.load_markets = AsyncMock(return_value={"CKB/USDC": {}})
+    bybit.fetch_ohlcv = AsyncMock(return_value=[[1, 0.01, 0.012, 0.009, 0.011, 5]])
+
+    exchanges = {"binance": binance, "bybit": bybit}
+    manager = MagicMock()
+    manager.get_exchange = AsyncMock(side_effect=lambda name: exchanges.get(name))
+
+    with patch.object(watcher, "exchange_manager", manager):
+        prices = await watcher._fetch_crypto_prices(["BTC/USDT", "CKB/USDC"])
+        again = await watcher._fetch_crypto_prices(["BTC/USDT"])
+
+    # High/Low intrabar dari candle 1m terakhir, bukan dari observasi pass sebelumnya
+    assert prices["BTC/USDT"] == {"Close": 100.5, "High": 101.0, "Low": 99.0}
+    assert again["BTC/USDT"] == prices["BTC/USDT"]
+    # Binance tidak punya data CKB -> fallback ke exchange berikutnya
+    assert prices["CKB/USDC"] == {"Close": 0.011, "High": 0.012, "Low": 0.009}
+    bybit.fetch_ohlcv.assert_awaited_once_with("CKB/USDC", "1m", limit=2)
@@ -1,4 +1,6 @@
 import asyncio  # Pastikan ada
+import time
+from collections import defaultdict
 from datetime import datetime, timezone
 
 import pandas as pd
@@ -6,15 +8,26 @@ import pytz
 import yfinance as yf
 
 import ccxt.async_support as ccxt
+from pymongo import UpdateOne
 
 from src.core.logger import logger
-from src.database.database import alerts_collection, signals_collection
-from src.core.formula_evaluator import safe_eval
-
-# CONFIG BIAYA (Simulasi Real Market)
-SPREAD_PIPS = 2  # Spread rata-rata (Forex)
-COMMISSION_PCT = 0.1  # Komisi Saham (0.1% per transaksi)
-COMMISSION_FX = 7.0  # Komisi Forex ($7 per lot round turn)
+from src.core.alert_engine import alert_engine
+from src.core.config_assets import get_asset_info
+from src.core.execution import (  # noqa: F401 (konfigurasi biaya diekspor ulang)
+    COMMISSION_FX,
+    COMMISSION_PCT,
+    FX_CONTRACT_SIZE,
+    SPREAD_PIPS,
+    check_exit,
+    limit_filled,
+    net_pnl,
+)
+from src.core.stream_manager import follow_stream
+from src.core.trigger_engine import TriggerEngine
+from src.database.database import signals_collection
+
+# CONFIG BIAYA (SPREAD_PIPS, COMMISSION_PCT, COMMISSION_FX) ada di src/core/execution.py,
+# dipakai bersama backtest agar hasil live dan simulasi konsisten.
 
 
 # Global Exchange Cache untuk efisiensi dan menghindari session leak
@@ -44,64 +57,210 @@ class ExchangeManager:
 exchange_manager = ExchangeManager()
 
 
-# Helper fetch harga live untuk CRYPTO via CCXT
-async def _fetch_crypto_price(symbol):
-    """Fetch OHLCV terbaru untuk crypto pair (e.g. CKB/USDC) via CCXT cached instances."""
-    EXCHANGE_LIST = ["binance", "bybit", "gateio", "mexc", "okx", "kucoin"]
+EXCHANGE_LIST = ["binance", "bybit", "gateio", "mexc", "okx", "kucoin"]
+# Batas request harga yang berjalan bersamaan (exchange / batch yfinance)
+FETCH_CONCURRENCY = 8
+# Jumlah ticker per panggilan yf.download
+YF_BATCH_SIZE = 50
+
+# Helper fetch harga live untuk CRYPTO via CCXT (candle 1m terakhir per simbol)
+async def _fetch_crypto_prices(symbols):
+    """
+    Close/High/Low dari candle 1m terakhir (intrabar, sama seperti versi
+    per-sinyal). Satu fetch per simbol dengan konkurensi terbatas; simbol yang
+    tidak listed / gagal dicoba di exchange berikutnya.
+    """
+    prices = {}
+    remaining = set(symbols)
+    limiter = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def _fetch(exchange, symbol):
+        async with limiter:
+            try:
+                ohlcv = await exchange.fetch_ohlcv(symbol, "1m", limit=2)
+            except Exception as e:
+                logger.debug("fetch_ohlcv %s failed: %s", symbol, e)
+                return symbol, None
+        if not ohlcv:
+            return symbol, None
+        last = ohlcv[-1]  # [timestamp, open, high, low, close, volume]
+        return symbol, {"Close": float(last[4]), "High": float(last[2]), "Low": float(last[3])}
+
     for ex_name in EXCHANGE_LIST:
+        if not remaining:
+            break
         try:
             exchange = await exchange_manager.get_exchange(ex_name)
             if not exchange:
                 continue
-                
-            ohlcv = await exchange.fetch_ohlcv(symbol, "1m", limit=2)
-            if ohlcv and len(ohlcv) > 0:
-                last = ohlcv[-1]  # [timestamp, open, high, low, close, volume]
-                return {
-                    "Close": last[4],
-                    "High": last[2],
-                    "Low": last[3],
-                }
-        except Exception:
-            pass
-    return None
+
+            markets = await exchange.load_markets()
+            listed = sorted(s for s in remaining if s in markets)
+            if not listed:
+                continue
+
+            for symbol, curr in await asyncio.gather(*(_fetch(exchange, s) for s in listed)):
+                if curr is not None:
+                    prices[symbol] = curr
+                    remaining.discard(symbol)
+        except Exception as e:
+            logger.debug("load_markets failed on %s: %s", ex_name, e)
+    return prices
 
 
-# Helper fetch harga live untuk SAHAM/FOREX via yfinance
-async def _fetch_yf_price(symbol):
-    def _fetch():
+# Helper fetch harga live untuk SAHAM/FOREX via yfinance (multi-ticker)
+async def _fetch_yf_prices(symbols):
+    def _fetch(batch):
         try:
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(period="1d", interval="1m")
-            if df.empty:
-                return None
-            return df.iloc[-1]
+            df = yf.download(
+                batch,
+                period="1d",
+                interval="1m",
+                group_by="ticker",
+                threads=True,
+                progress=False,
+            )
         except Exception:
-            return None
-    return await asyncio.to_thread(_fetch)
+            return {}
+        if df is None or df.empty:
+            return {}
+
+        result = {}
+        for symbol in batch:
+            try:
+                rows = df[symbol] if isinstance(df.columns, pd.MultiIndex) else df
+                rows = rows.dropna(subset=["Close"])
+                if rows.empty:
+                    continue
+                row = rows.iloc[-1]
+                result[symbol] = {
+                    "Close": float(row["Close"]),
+                    "High": float(row["High"]),
+                    "Low": float(row["Low"]),
+                }
+            except KeyError:
+                continue
+        return result
+
+    batches = [symbols[i : i + YF_BATCH_SIZE] for i in range(0, len(symbols), YF_BATCH_SIZE)]
+    limiter = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def _run(batch):
+        async with limiter:
+            return await asyncio.to_thread(_fetch, batch)
+
+    prices = {}
+    for result in await asyncio.gather(*(_run(b) for b in batches)):
+        prices.update(result)
+    return prices
+
+
+async def fetch_live_prices(symbols):
+    """
+    Smart Price Fetcher (bulk): CCXT untuk crypto ('/'), yfinance untuk
+    saham/forex. Return {symbol: {Close, High, Low}}; simbol gagal tidak ada.
+    """
+    symbols = sorted(set(symbols))
+    crypto = [s for s in symbols if "/" in s]
+    others = [s for s in symbols if "/" not in s]
+
+    results = await asyncio.gather(
+        _fetch_crypto_prices(crypto) if crypto else asyncio.sleep(0, result={}),
+        _fetch_yf_prices(others) if others else asyncio.sleep(0, result={}),
+    )
+    return {**results[0], **results[1]}
 
 
 async def fetch_live_price(symbol):
-    """Smart Price Fetcher: CCXT untuk crypto ('/'), yfinance untuk saham/forex."""
-    if "/" in symbol:
-        result = await _fetch_crypto_price(symbol)
-        return result  # dict {Close, High, Low} atau None
-    else:
-        row = await _fetch_yf_price(symbol)
-        if row is None:
+    """Harga satu simbol (dict {Close, High, Low} atau None)."""
+    return (await fetch_live_prices([symbol])).get(symbol)
+
+
+def evaluate_signal(sig, curr, now):
+    """
+    Tentukan transisi status satu sinyal terhadap harga terkini.
+    Return UpdateOne atau None jika tidak ada perubahan.
+    """
+    symbol = sig["symbol"]
+    high_price = curr["High"]
+    low_price = curr["Low"]
+
+    # --- LOGIKA A: HANDLE PENDING ORDER (LIMIT/STOP) ---
+    if sig["status"] == "PENDING":
+        entry_price = sig["price"]  # Harga Limit yang diinginkan
+        action = sig["action"]  # BUY LIMIT / SELL LIMIT
+
+        # Cek apakah harga pasar sudah menjemput order limit kita
+        if not limit_filled("BUY" in action, entry_price, high_price, low_price):
             return None
-        # Kembalikan sebagai dict agar format sama
-        return {
-            "Close": float(row["Close"]),
-            "High": float(row["High"]),
-            "Low": float(row["Low"]),
-        }
+
+        # Update jadi OPEN (Aktif)
+        logger.info("✅ ORDER FILLED: %s at %s", symbol, entry_price)
+        # Opsional: Kirim Notif Telegram "Order Filled"
+        return UpdateOne(
+            {"_id": sig["_id"], "status": "PENDING"},
+            {
+                "$set": {
+                    "status": "OPEN",
+                    "opened_at": now,
+                    "fill_price": entry_price,  # Harga eksekusi
+                }
+            },
+        )
+
+    # --- LOGIKA B: HANDLE OPEN POSITIONS (TP/SL Check) ---
+    entry_price = sig.get("fill_price") or sig.get("price") or sig.get("entry_price")
+    if entry_price is None:
+        logger.warning(
+            "⚠️ Skipping %s: no entry price found (fill_price/price/entry_price missing)",
+            symbol,
+        )
+        return None
+    lot_size = sig.get("lot_size_num", 0.01)
+    asset_type = sig.get("asset_type", "forex")
+    is_buy = "BUY" in sig["action"]
+
+    # Cek TP / SL (TP dulu), lalu PnL bersih di harga exit dengan BIAYA (Spread/Komisi)
+    exit_price, exit_reason = check_exit(is_buy, sig["tp"], sig["sl"], high_price, low_price)
+    if not exit_reason:
+        return None
+
+    info = get_asset_info(symbol)
+    pnl_net = net_pnl(
+        entry_price,
+        exit_price,
+        is_buy,
+        lot_size,
+        asset_type,
+        info.get("lot_multiplier", FX_CONTRACT_SIZE),
+    )
+
+    final_status = "WIN" if pnl_net > 0 else "LOSS"
+    logger.info("🏁 TRADE CLOSED %s: %s (%.2f)", symbol, final_status, pnl_net)
+    return UpdateOne(
+        {"_id": sig["_id"], "status": "OPEN"},
+        {
+            "$set": {
+                "status": final_status,
+                "closed_at": now,
+                "exit_price": exit_price,
+                "exit_reason": exit_reason,
+                "pnl": pnl_net,  # Simpan Net PnL (Realistis)
+            }
+        },
+    )
+
+
+# TP/SL/limit dipicu per tick dari market_ticks_stream (lihat run_watcher)
+trigger_engine = TriggerEngine(evaluate_signal)
 
 
 async def check_positions():
     """
-    Looping mengecek semua sinyal 'OPEN' di Database MongoDB.
+    Mengecek semua sinyal 'OPEN'/'PENDING' di MongoDB dalam satu pass:
+    harga diambil sekali per simbol (bulk), transisi ditulis dengan satu bulk_write.
     Jika harga menyentuh SL/TP, status diupdate jadi WIN/LOSS.
+    Simbol yang sedang mendapat tick live sudah ditangani trigger_engine.
     """
     logger.info("👀 Watcher Loop Started...")
 
@@ -112,185 +271,81 @@ async def check_positions():
     if not active_signals:
         return
 
-    print(f"Checking {len(active_signals)} active positions...")
-
+    # 2. Kelompokkan per simbol -> satu fetch harga per simbol
+    by_symbol = defaultdict(list)
     for sig in active_signals:
-        symbol = sig["symbol"]
+        if not trigger_engine.is_live(sig["symbol"]):
+            by_symbol[sig["symbol"]].append(sig)
 
-        # --- PERBAIKAN: Gunakan Async Fetch ---
-        curr = await fetch_live_price(symbol)
+    if not by_symbol:
+        return
 
+    started = time.monotonic()
+    prices = await fetch_live_prices(list(by_symbol))
+    logger.info(
+        "Checking %d active positions on %d symbols (%d priced in %.1fs)",
+        len(active_signals),
+        len(by_symbol),
+        len(prices),
+        time.monotonic() - started,
+    )
+
+    # 3. Evaluasi semua sinyal lalu tulis perubahan sekaligus
+    now = datetime.now(timezone.utc)
+    pairs = []
+    for symbol, signals in by_symbol.items():
+        curr = prices.get(symbol)
         if curr is None:
             continue
+        for sig in signals:
+            op = evaluate_signal(sig, curr, now)
+            if op is not None:
+                pairs.append((sig, op))
+                trigger_engine.transition(sig, now)
 
-        current_price = curr["Close"]
-        high_price = curr["High"]
-        low_price = curr["Low"]
-
-        # --- LOGIKA A: HANDLE PENDING ORDER (LIMIT/STOP) ---
-        if sig["status"] == "PENDING":
-            entry_price = sig["price"]  # Harga Limit yang diinginkan
-            action = sig["action"]  # BUY LIMIT / SELL LIMIT
-
-            triggered = False
-
-            # Cek apakah harga pasar sudah menjemput order limit kita
-            if "BUY" in action and low_price <= entry_price:
-                triggered = True
-            elif "SELL" in action and high_price >= entry_price:
-                triggered = True
-
-            if triggered:
-                # Update jadi OPEN (Aktif)
-                await signals_collection.update_one(
-                    {"_id": sig["_id"]},
-                    {
-                        "$set": {
-                            "status": "OPEN",
-                            "opened_at": datetime.now(timezone.utc),
-                            "fill_price": entry_price,  # Harga eksekusi
-                        }
-                    },
-                )
-                logger.info("✅ ORDER FILLED: %s at %s", symbol, entry_price)
-                # Opsional: Kirim Notif Telegram "Order Filled"
-
-            continue  # Lanjut ke signal berikutnya, jangan cek TP/SL dulu
-
-        # --- LOGIKA B: HANDLE OPEN POSITIONS (TP/SL Check) ---
-        # Hitung PnL Floating dengan BIAYA (Spread/Komisi)
-
-        entry_price = (
-            sig.get("fill_price") or sig.get("price") or sig.get("entry_price")
-        )
-        if entry_price is None:
-            logger.warning(
-                "⚠️ Skipping %s: no entry price found (fill_price/price/entry_price missing)",
-                symbol,
-            )
-            continue
-        lot_size = sig.get("lot_size_num", 0.01)
-        asset_type = sig.get("asset_type", "forex")
-
-        pnl_gross = 0
-        if "BUY" in sig["action"]:
-            pnl_gross = current_price - entry_price
-        else:  # SELL
-            pnl_gross = entry_price - current_price
-
-        # Konversi ke USD/IDR Value
-        if asset_type == "stock_indo":
-            # Saham: (Selisih * Lot * 100) - Komisi
-            val_gross = pnl_gross * lot_size * 100
-            commission = (entry_price * lot_size * 100) * (COMMISSION_PCT / 100)
-            pnl_net = val_gross - (commission * 2)  # Komisi Beli + Jual
-        else:
-            # Forex: (Selisih / PipScale) * (Lot * ContractSize) - Komisi - Spread
-            # Simplifikasi estimasi USD
-            pip_val = 10  # Standard Lot ($10/pip)
-            pnl_pips = pnl_gross * 10000  # Asumsi pair 4 digit
-            pnl_net = (pnl_pips * lot_size * 10) - (COMMISSION_FX * lot_size)
-
-            # Cek TP / SL
-            tp_hit = False
-            sl_hit = False
-            exit_price = current_price
-            exit_reason = ""
-
-            if "BUY" in sig["action"]:
-                if high_price >= sig["tp"]:
-                    tp_hit = True
-                    exit_price = sig["tp"]
-                    exit_reason = "TP Hit"
-                elif low_price <= sig["sl"]:
-                    sl_hit = True
-                    exit_price = sig["sl"]
-                    exit_reason = "SL Hit"
-            else:  # SELL
-                if low_price <= sig["tp"]:
-                    tp_hit = True
-                    exit_price = sig["tp"]
-                    exit_reason = "TP Hit"
-                elif high_price >= sig["sl"]:
-                    sl_hit = True
-                    exit_price = sig["sl"]
-                    exit_reason = "SL Hit"
-
-            if tp_hit or sl_hit:
-                final_status = "WIN" if pnl_net > 0 else "LOSS"
-
-                await signals_collection.update_one(
-                    {"_id": sig["_id"]},
-                    {
-                        "$set": {
-                            "status": final_status,
-                            "closed_at": datetime.now(timezone.utc),
-                            "exit_price": exit_price,
-                            "exit_reason": exit_reason,
-                            "pnl": pnl_net,  # Simpan Net PnL (Realistis)
-                        }
-                    },
-                )
-                logger.info(
-                    "🏁 TRADE CLOSED %s: %s (%.2f)", symbol, final_status, pnl_net
-                )
+    if pairs:
+        modified = await trigger_engine.write(pairs, ordered=False)
+        logger.info("📝 Watcher applied %d transitions", modified)
 
 
 async def check_alerts(df, symbol):
-    # 1. Ambil semua alert aktif untuk simbol ini
-    cursor = alerts_collection.find({"symbol": symbol, "status": "ACTIVE"})
-    alerts = await cursor.to_list(length=100)
-
-    if not alerts or df.empty:
+    """Evaluasi alert simbol ini terhadap bar terakhir (indeks in-memory)."""
+    if df.empty:
         return
 
     last_row = df.iloc[-1]
-    current_price = last_row["Close"]
-
-    for alert in alerts:
-        triggered = False
-
-        # Cek Price Alert
-        if alert["type"] == "PRICE":
-            if alert["condition"] == "ABOVE" and current_price >= alert["target_price"]:
-                triggered = True
-            elif (
-                alert["condition"] == "BELOW" and current_price <= alert["target_price"]
-            ):
-                triggered = True
-
-        # Cek Formula Alert
-        elif alert["type"] == "FORMULA":
-            safe_env = {
-                "CLOSE": float(last_row["Close"]),
-                "RSI": float(last_row.get("RSI_14", 50)),
-                "VOLUME": float(last_row["Volume"]),
-                "SMA20": float(last_row.get("SMA_20", 0)),
-            }
-            if safe_eval(alert["condition"], safe_env):
-                triggered = True
-
-        if triggered:
-            logger.info("🚨 ALERT TRIGGERED: %s - %s", symbol, alert["note"])
-            await alerts_collection.update_one(
-                {"_id": alert["_id"]},
-                {
-                    "$set": {
-                        "status": "TRIGGERED",
-                        "triggered_at": datetime.now(timezone.utc),
-                    }
-                },
-            )
+    env = {
+        "CLOSE": float(last_row["Close"]),
+        "RSI": float(last_row.get("RSI_14", 50)),
+        "VOLUME": float(last_row["Volume"]),
+        "SMA20": float(last_row.get("SMA_20", 0)),
+    }
+    alert_engine.evaluate(symbol, env["CLOSE"], env)
+    await alert_engine.flush()
+
+
+async def _on_ticks(messages):
+    """Satu pembacaan stream untuk trigger TP/SL dan alert."""
+    await trigger_engine.process_messages(messages)
+    await alert_engine.process_messages(messages)
 
 
 async def run_watcher():
     logger.info("🚀 AI TRADING WATCHER (MongoDB Version) STARTED")
+    engine_tasks = [
+        asyncio.create_task(trigger_engine.listen_sync()),
+        asyncio.create_task(alert_engine.listen_sync()),
+        asyncio.create_task(follow_stream(_on_ticks)),
+    ]
     try:
         while True:
+            # Fallback polling untuk simbol tanpa tick live
             await check_positions()
             # Cek setiap 30 detik
             await asyncio.sleep(30)
     finally:
+        for task in engine_tasks:
+            task.cancel()
         # PENTING: Tutup semua resource saat stop
         await exchange_manager.close_all()
 